@@ -0,0 +1,49 @@
+""" 基准测试公共模块.
+在项目根目录下执行: python -m benchmarks.<模块名>
+"""
+import logging
+import os
+import sys
+import time
+import typing as t
+
+sys.path.insert(0,
+                os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from lesoon_common import LesoonFlask  # noqa:E402
+
+
+class BenchConfig:
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    CACHE_TYPE = 'SimpleCache'
+    JWT_SECRET_KEY = 'U1NDUxNjQtNDgyMC00NjZiLTlkODgtMm'
+    JWT_ACCESS_TOKEN_EXPIRES = 3600
+
+
+def create_app(**config: t.Any) -> LesoonFlask:
+    LesoonFlask.config_path = f'{__name__}.BenchConfig'
+    config_cls = type('Config', (BenchConfig,), config)
+    app = LesoonFlask(__name__, config=config_cls)
+    app.logger.setLevel(logging.CRITICAL)
+    return app
+
+
+def bench(fn: t.Callable, number: int = 1000, repeat: int = 3) -> float:
+    """返回单次调用的最佳耗时(微秒)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1e6
+
+
+def report(title: str, rows: t.List[t.Tuple[str, float]], unit: str = 'us'):
+    print(f'\n== {title}')
+    baseline = rows[0][1] if rows else 0
+    for name, value in rows:
+        ratio = f'x{baseline / value:.2f}' if value else '-'
+        print(f'  {name:<40} {value:>12.2f} {unit}  {ratio}')
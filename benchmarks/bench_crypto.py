@@ -0,0 +1,49 @@
+""" token加解密后端对比基准测试.
+python -m benchmarks.bench_crypto
+"""
+import json
+from datetime import datetime
+from datetime import timedelta
+
+from benchmarks.base import bench
+from benchmarks.base import BenchConfig
+from benchmarks.base import report
+from benchmarks.bench_jwt import USER_INFO
+from lesoon_common.utils.crypto import BACKENDS
+from lesoon_common.utils.keyring import Keyring
+
+CLAIMS = {
+    'sub': '1',
+    'type': 'access',
+    'fresh': False,
+    'jti': 'c0b5b2c0-5cfa-4d2c-9f8a-6b6f0e0c1d2e',
+    'userInfo': USER_INFO,
+}
+
+
+def bench_backends(number: int = 2000):
+    """TokenUser大小的payload在各后端下的签名/加密/解密/验签耗时."""
+    exp = datetime.utcnow() + timedelta(hours=1)
+    claims = dict(CLAIMS, exp=exp)
+    results: dict = {}
+    for name in BACKENDS:
+        keyring = Keyring(BenchConfig.JWT_SECRET_KEY, backend=name)
+        secret = keyring.current.secret
+        jws_token = keyring.sign(claims)
+        jwe_token = keyring.encrypt(jws_token)
+        verify = keyring.backend.verify
+        operations = {
+            'sign': lambda: keyring.sign(claims),
+            'encrypt': lambda: keyring.encrypt(jws_token),
+            'decrypt': lambda: keyring.decrypt(jwe_token),
+            'verify': lambda: json.loads(verify(jws_token, secret, ['HS256'])),
+        }
+        for operation, fn in operations.items():
+            results.setdefault(operation, []).append(
+                (name, bench(fn, number=number)))
+    for operation, rows in results.items():
+        report(f'crypto backend: {operation}', rows)
+
+
+if __name__ == '__main__':
+    bench_backends()
@@ -0,0 +1,36 @@
+""" dataclass构造基准测试.
+python -m benchmarks.bench_dataclass
+"""
+import tracemalloc
+
+from benchmarks.base import bench
+from benchmarks.base import report
+from benchmarks.bench_jwt import USER_INFO
+from lesoon_common.dataclass.user import TokenUser
+
+
+def _memory(fn, number: int = 10000) -> float:
+    """构造number个实例的平均内存占用(字节)."""
+    tracemalloc.start()
+    objs = [fn() for _ in range(number)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    return size / number
+
+
+def bench_token_user(number: int = 5000):
+    """从token claims构造TokenUser."""
+    methods = (
+        ('TokenUser.load', lambda: TokenUser.load(USER_INFO)),
+        ('TokenUser.from_trusted', lambda: TokenUser.from_trusted(USER_INFO)),
+    )
+    report('TokenUser construction',
+           [(title, bench(fn, number=number)) for title, fn in methods])
+    report('TokenUser memory per instance',
+           [(title, _memory(fn)) for title, fn in methods],
+           unit='B ')
+
+
+if __name__ == '__main__':
+    bench_token_user()
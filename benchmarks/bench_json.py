@@ -0,0 +1,99 @@
+""" json编解码基准测试.
+对比flask默认JSONEncoder/JSONDecoder(标准库)与LesoonJsonEncoder/LesoonJsonDecoder
+(`lesoon_common.utils.codec`)处理典型分页返回体及请求体的耗时.
+python -m benchmarks.bench_json
+"""
+import json
+from decimal import Decimal
+from urllib import parse
+
+from flask.json import JSONDecoder
+from flask.json import JSONEncoder
+
+from benchmarks.base import bench
+from benchmarks.base import report
+from lesoon_common.response import Response
+from lesoon_common.utils import codec
+from lesoon_common.utils.req import convert_dict
+from lesoon_common.wrappers import LesoonJsonDecoder
+from lesoon_common.wrappers import LesoonJsonEncoder
+
+
+class StdlibJsonEncoder(JSONEncoder):
+    """改造前的LesoonJsonEncoder."""
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return str(o)
+        return super().default(o)
+
+
+def page_payload(size: int) -> dict:
+    """schema序列化后的分页返回体: 字符串id, 日期字符串, Decimal金额, 嵌套明细."""
+    rows = [{
+        'id':
+            str(1000000000000000000 + i),
+        'orderNo':
+            f'SO2021{i:08d}',
+        'customerName':
+            f'客户{i}',
+        'status':
+            i % 3,
+        'amount':
+            Decimal(f'{i}.50'),
+        'remark':
+            None if i % 2 else '备注信息',
+        'createTime':
+            '2021-01-01 08:00:00',
+        'updateTime':
+            '2021-01-02 09:30:00',
+        'items': [{
+            'skuNo': f'SKU{j}',
+            'qty': j,
+            'price': Decimal('9.90')
+        } for j in range(3)],
+    } for i in range(size)]
+    return Response.success(result=rows, total=size * 50)
+
+
+def bench_encode(number: int = 200):
+    for size in (20, 100, 1000):
+        payload = page_payload(size)
+        rows = []
+        for name, cls in (('stdlib', StdlibJsonEncoder), (codec.BACKEND,
+                                                          LesoonJsonEncoder)):
+            encoder = cls(ensure_ascii=True, sort_keys=True)
+            rows.append((name,
+                         bench(lambda: encoder.encode(payload),
+                               number=max(number * 20 // size, 5))))
+        report(f'encode page payload rows={size}', rows)
+
+
+def bench_decode(number: int = 200):
+    for size in (20, 1000):
+        text = json.dumps(page_payload(size), default=str)
+        rows = []
+        for name, cls in (('stdlib', JSONDecoder), (codec.BACKEND,
+                                                    LesoonJsonDecoder)):
+            decoder = cls()
+            rows.append((name,
+                         bench(lambda: decoder.decode(text),
+                               number=max(number * 20 // size, 5))))
+        report(f'decode request body rows={size}', rows)
+
+
+def bench_convert_dict(number: int = 20000):
+    param = ('%7B%22status%22%3A%20%5B1%2C%202%5D%2C%20%22createTime%22%3A'
+             '%20%7B%22%24range%22%3A%20%5B%222021-01-01%22%2C%20null%5D%7D%7D')
+    report('convert_dict where', [
+        ('stdlib',
+         bench(lambda: json.loads(parse.unquote_plus(param)), number=number)),
+        (f'convert_dict({codec.BACKEND})',
+         bench(lambda: convert_dict(param), number=number)),
+    ])
+
+
+if __name__ == '__main__':
+    bench_encode()
+    bench_decode()
+    bench_convert_dict()
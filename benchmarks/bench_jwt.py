@@ -0,0 +1,110 @@
+""" token校验基准测试.
+python -m benchmarks.bench_jwt
+"""
+from flask_jwt_extended import create_access_token
+
+from benchmarks.base import bench
+from benchmarks.base import create_app
+from benchmarks.base import report
+from lesoon_common.dataclass.user import TokenUser
+from lesoon_common.utils.jwt import _decode_jwt_from_request
+from lesoon_common.utils.jwt import create_internal_auth
+from lesoon_common.utils.jwt import create_token
+from lesoon_common.utils.jwt import TokenProvider
+
+USER_INFO = {
+    'id': 1,
+    'userId': 1,
+    'companyId': 1,
+    'loginName': 'bench',
+    'userName': 'bench',
+    'email': 'bench@lesoon.com',
+}
+
+
+def bench_repeated_token(number: int = 2000):
+    """同一token重复请求时单次校验的cpu耗时."""
+    rows = []
+    for title, cache_enable in (('no cache', False), ('token cache', True)):
+        app = create_app(JWT_TOKEN_CACHE_ENABLE=cache_enable)
+        with app.app_context():
+            token = create_access_token(
+                identity='1', additional_claims={'userInfo': USER_INFO})
+        with app.test_request_context(headers={'token': token}):
+            cost = bench(lambda: _decode_jwt_from_request(None, False),
+                         number=number)
+            rows.append((title, cost))
+            token_cache = app.extensions['jwt_token_cache']
+            if token_cache is not None:
+                print(f'token cache stats: {token_cache.stats()}')
+    report('repeated token decode (per request)', rows)
+    print(f'  cpu saved per request: {rows[0][1] - rows[1][1]:.2f} us')
+
+
+def bench_service_token(number: int = 2000):
+    """系统间调用token的签发与复用."""
+    app = create_app()
+    user = TokenUser.load(USER_INFO)
+    provider = TokenProvider()
+    with app.app_context():
+        rows = [
+            ('create_token', bench(lambda: create_token(user), number=number)),
+            ('TokenProvider.get_token',
+             bench(lambda: provider.get_token(user), number=number)),
+        ]
+    report('service token per outbound call', rows)
+    print(f'  provider stats: {provider.stats()}')
+
+
+def bench_compact_claims(number: int = 2000):
+    """完整/紧凑格式用户信息的token大小及解析耗时(不使用缓存)."""
+    user = TokenUser.load(USER_INFO)
+    sizes, rows = [], []
+    for title, compact in (('userInfo', False), ('compact', True)):
+        app = create_app(JWT_TOKEN_CACHE_ENABLE=False,
+                         JWT_USER_CACHE_ENABLE=False)
+        with app.app_context():
+            token = create_access_token(identity='1',
+                                        additional_claims=TokenUser.to_claims(
+                                            user, compact=compact))
+        sizes.append((title, len(token)))
+        with app.test_request_context(headers={'token': token}):
+
+            def decode():
+                jwt_data = _decode_jwt_from_request(None, False)[1]
+                return TokenUser.from_claims(jwt_data)
+
+            rows.append((title, bench(decode, number=number)))
+    report('token header size', sizes, unit='B ')
+    report('token decode + user load (per request)', rows)
+
+
+def bench_internal_auth(number: int = 2000):
+    """服务间调用: jwe token与内部认证请求头的校验耗时(不使用缓存)."""
+    app = create_app(JWT_TOKEN_CACHE_ENABLE=False,
+                     JWT_USER_CACHE_ENABLE=False,
+                     JWT_INTERNAL_AUTH_ENABLE=True,
+                     JWT_INTERNAL_AUTH_SECRET='internal-secret',
+                     JWT_INTERNAL_AUTH_SOURCES=['127.0.0.0/8'])
+    user = TokenUser.load(USER_INFO)
+    with app.app_context():
+        token = create_token(user)
+        internal_headers = create_internal_auth(user)
+    rows = []
+    for title, headers in (('jwe token', {
+            'token': token
+    }), ('internal auth', internal_headers)):
+        with app.test_request_context(headers=headers,
+                                      environ_base={'REMOTE_ADDR': '127.0.0.1'
+                                                   }):
+            cost = bench(lambda: _decode_jwt_from_request(None, False),
+                         number=number)
+            rows.append((title, cost))
+    report('service-to-service auth (per request)', rows)
+
+
+if __name__ == '__main__':
+    bench_repeated_token()
+    bench_service_token()
+    bench_compact_claims()
+    bench_internal_auth()
@@ -0,0 +1,203 @@
+""" 查询条件编译基准测试.
+python -m benchmarks.bench_query
+"""
+import os
+import tempfile
+from datetime import datetime
+from datetime import timedelta
+
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import ForeignKey
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import relationship
+
+from benchmarks.base import bench
+from benchmarks.base import create_app
+from benchmarks.base import report
+from lesoon_common.extensions import db
+from lesoon_common.utils.filter import encode_cursor
+from lesoon_common.wrappers import LesoonQuery
+from lesoon_common.wrappers.alchemy import build_count_query
+
+
+class BenchOrder(db.Model):  # type:ignore
+    __tablename__ = 'bench_order'
+    id = Column(Integer, primary_key=True)
+    bill_no = Column(String(32), index=True)
+    status = Column(Integer)
+    amount = Column(Integer)
+    remarks = Column(String(255))
+    create_time = Column(DateTime, nullable=False, index=True)
+    lines = relationship('BenchOrderLine')
+
+
+class BenchOrderLine(db.Model):  # type:ignore
+    __tablename__ = 'bench_order_line'
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('bench_order.id'), index=True)
+    sku = Column(String(32))
+
+
+WHERE = {
+    'billNo': {
+        '$like': 'SO2021'
+    },
+    'status': [1, 2, 3],
+    'amount': {
+        '$gte': 100
+    },
+    'createTime': {
+        '$range': ['2021-01-01', '2021-12-31 23:59:59']
+    },
+    'remarks': {
+        '$null': False
+    },
+}
+
+
+def bench_apply_where(number: int = 2000):
+    """apply_where构造查询的耗时(不执行sql)."""
+    app = create_app()
+    with app.app_context():
+
+        def uncached():
+            LesoonQuery.where_plans.clear()
+            return BenchOrder.query.apply_where(WHERE)
+
+        rows = [
+            ('no plan cache', bench(uncached, number=number)),
+            ('plan cache',
+             bench(lambda: BenchOrder.query.apply_where(WHERE), number=number)),
+        ]
+    report('apply_where (per request)', rows)
+
+
+def seed_orders(rows: int = 100000):
+    db.create_all()
+    start = datetime(2021, 1, 1)
+    db.session.execute(BenchOrder.__table__.insert(), [{
+        'bill_no': f'SO{i:08d}',
+        'status': i % 4,
+        'amount': i % 1000,
+        'remarks': None if i % 3 else 'remarks',
+        'create_time': start + timedelta(seconds=i)
+    } for i in range(rows)])
+    db.session.commit()
+
+
+def bench_paginate(rows: int = 100000, per_page: int = 20, number: int = 20):
+    """深分页: offset分页与游标分页的耗时."""
+    app = create_app()
+    with app.test_request_context():
+        seed_orders(rows)
+        sort = {'createTime': 'desc'}
+        page = rows // per_page - 1
+        # 定位到与offset分页相同的深度
+        last = BenchOrder.query.apply_sort(sort).offset((page - 1) * per_page -
+                                                        1).first()
+        cursor = encode_cursor([last.create_time, last.id])
+
+        def offset():
+            return BenchOrder.query.apply_sort(sort).paginate(if_page=True,
+                                                              page=page,
+                                                              per_page=per_page)
+
+        def offset_has_next():
+            return BenchOrder.query.apply_sort(sort).paginate(if_page=True,
+                                                              page=page,
+                                                              per_page=per_page,
+                                                              has_next=True)
+
+        def keyset():
+            return BenchOrder.query.paginate(if_page=True,
+                                             per_page=per_page,
+                                             keyset=True,
+                                             cursor=cursor,
+                                             sort=sort)
+
+        assert [o.id for o in offset().items] == [o.id for o in keyset().items]
+        results = [
+            ('offset + count', bench(offset, number=number)),
+            ('offset + has_next', bench(offset_has_next, number=number)),
+            ('keyset', bench(keyset, number=number)),
+        ]
+    report(f'paginate page {page} of {rows} rows', results)
+
+
+def bench_count(rows: int = 100000, number: int = 20):
+    """总计查询: Query.count()与build_count_query."""
+    app = create_app()
+    with app.test_request_context():
+        seed_orders(rows)
+        db.session.execute(BenchOrderLine.__table__.insert(), [{
+            'order_id': i % rows + 1,
+            'sku': f'SKU{i:08d}'
+        } for i in range(rows * 2)])
+        db.session.commit()
+
+        queries = {
+            'all':
+                lambda: BenchOrder.query.order_by(BenchOrder.create_time.desc()
+                                                 ),
+            'where + eager load':
+                lambda: BenchOrder.query.options(joinedload(BenchOrder.lines)).
+                apply_where({
+                    'status': [1, 2]
+                }).order_by(BenchOrder.create_time.desc()),
+            'where + join':
+                lambda: BenchOrder.query.join(BenchOrderLine).apply_where(
+                    {'status': [1, 2]}),
+        }
+        for name, query in queries.items():
+            assert query().order_by(None).count() == build_count_query(
+                query()).scalar()
+            results = [
+                ('Query.count',
+                 bench(lambda: query().order_by(None).count(), number=number)),
+                ('build_count_query',
+                 bench(lambda: build_count_query(query()).scalar(),
+                       number=number)),
+            ]
+            report(f'count {name} ({rows} rows)', results)
+
+
+def bench_parallel_count(rows: int = 100000, number: int = 20):
+    """
+    分页查询与COUNT串行/并行执行(sqlite文件库).
+    sqlite在进程内执行查询, 仅在多核机器上能体现并行的收益;
+    mysql等独立部署的数据库由服务端执行, 并行收益不受客户端核数限制.
+    """
+    with tempfile.TemporaryDirectory() as path:
+        app = create_app(
+            SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(path, "bench.db")}'
+        )
+        with app.test_request_context():
+            seed_orders(rows)
+
+            def paginate(parallel):
+                return BenchOrder.query.apply_where({
+                    'remarks': {
+                        '$null': False
+                    }
+                }).order_by(BenchOrder.amount).paginate(if_page=True,
+                                                        page=10,
+                                                        per_page=20,
+                                                        parallel_count=parallel)
+
+            results = [
+                ('serial', bench(lambda: paginate(False), number=number)),
+                ('parallel', bench(lambda: paginate(True), number=number)),
+            ]
+            db.session.remove()
+            db.get_engine(app).dispose()
+    report(f'paginate + count of {rows} rows', results)
+
+
+if __name__ == '__main__':
+    bench_apply_where()
+    bench_paginate()
+    bench_count()
+    bench_parallel_count()
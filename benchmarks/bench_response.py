@@ -0,0 +1,68 @@
+""" 返回体编码基准测试.
+对比`success_response`(构造Response后由jsonify编码)与`success_json_response`
+(直接编码, flag使用缓存)的单次编码耗时及完整请求的吞吐量.
+python -m benchmarks.bench_response
+"""
+from flask import jsonify
+
+from benchmarks.base import bench
+from benchmarks.base import create_app
+from benchmarks.base import report
+from benchmarks.bench_json import page_payload
+from lesoon_common.code import ResponseCode
+from lesoon_common.response import error_json_response
+from lesoon_common.response import error_response
+from lesoon_common.response import success_json_response
+from lesoon_common.response import success_response
+
+
+def bench_encode(number: int = 2000):
+    app = create_app()
+    for size in (0, 20, 100):
+        rows = page_payload(size)['rows'] if size else None
+        with app.test_request_context():
+            report(f'encode success rows={size}', [
+                ('success_response + jsonify',
+                 bench(
+                     lambda: jsonify(success_response(result=rows, total=size)),
+                     number=number)),
+                ('success_json_response',
+                 bench(lambda: success_json_response(result=rows, total=size),
+                       number=number)),
+            ])
+    with app.test_request_context():
+        code = ResponseCode.ReqParamError
+        report('encode error', [
+            ('error_response + jsonify',
+             bench(lambda: jsonify(error_response(code=code)), number=number)),
+            ('error_json_response',
+             bench(lambda: error_json_response(code=code), number=number)),
+        ])
+
+
+def bench_requests(size: int = 20, number: int = 2000):
+    """完整请求(test_client)的吞吐量."""
+    app = create_app()
+    rows = page_payload(size).get('rows')
+
+    @app.route('/dict')
+    def dict_view():
+        return success_response(result=rows, total=size)
+
+    @app.route('/fast')
+    def fast_view():
+        return success_json_response(result=rows, total=size)
+
+    client = app.test_client()
+    assert client.get('/dict').data == client.get('/fast').data
+    costs = [(url, bench(lambda: client.get(url), number=number))
+             for url in ('/dict', '/fast')]
+    report(f'request rows={size}', costs)
+    for url, cost in costs:
+        print(f'  {url:<40} {1e6 / cost:>12.0f} req/s')
+
+
+if __name__ == '__main__':
+    bench_encode()
+    bench_requests(0)
+    bench_requests(20)
@@ -0,0 +1,58 @@
+""" 查询结果行容器内存基准测试.
+对比报表查询(非模型实体)结果转换为AttributeDict与RowView的内存占用及耗时.
+python -m benchmarks.bench_rows
+"""
+import gc
+import tracemalloc
+
+from benchmarks.base import bench
+from benchmarks.base import create_app
+from benchmarks.base import report
+from benchmarks.bench_query import BenchOrder
+from benchmarks.bench_query import seed_orders
+from lesoon_common.extensions import db
+from lesoon_common.utils.base import AttributeDict
+from lesoon_common.utils.model import row_to_dict
+
+
+def _retained(fn) -> float:
+    """fn返回结果的内存占用(字节)."""
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_rows(rows: int = 100000):
+    app = create_app()
+    with app.test_request_context():
+        seed_orders(rows)
+        query = db.session.query(BenchOrder.id, BenchOrder.bill_no,
+                                 BenchOrder.status, BenchOrder.amount,
+                                 BenchOrder.remarks, BenchOrder.create_time)
+        result = query.all()
+
+        def attribute_dict():
+            # 改造前的row_to_dict
+            return [AttributeDict(row._mapping) for row in result]
+
+        def tuples():
+            return [tuple(row) for row in result]
+
+        assert row_to_dict(result) == attribute_dict()
+        methods = (
+            ('AttributeDict', attribute_dict),
+            ('RowView', lambda: row_to_dict(result)),
+            ('tuple (baseline)', tuples),
+        )
+        memory = [(title, _retained(fn) / 1024 / 1024) for title, fn in methods]
+        cost = [(title, bench(fn, number=3) / 1000) for title, fn in methods]
+    report(f'row container memory, {rows} rows x 6 columns', memory, unit='MB')
+    report(f'row container build time, {rows} rows', cost, unit='ms')
+
+
+if __name__ == '__main__':
+    bench_rows()
@@ -0,0 +1,134 @@
+""" schema构造及序列化基准测试.
+对比每次构造schema与从实例池获取的耗时, marshmallow与编译的dump函数的序列化耗时,
+以及批量导入时驼峰键名转换的耗时.
+python -m benchmarks.bench_schema
+"""
+from datetime import datetime
+
+import marshmallow as ma
+
+from benchmarks.base import bench
+from benchmarks.base import create_app
+from benchmarks.base import report
+from benchmarks.bench_jwt import USER_INFO
+from benchmarks.bench_query import BenchOrder
+from benchmarks.bench_query import seed_orders
+from lesoon_common.dataclass.user import TokenUser
+from lesoon_common.model import SqlaCamelAutoSchema
+from lesoon_common.schema import schema_pool
+from lesoon_common.utils.str import camelcase
+
+
+class BenchOrderCamelSchema(SqlaCamelAutoSchema):
+
+    class Meta(SqlaCamelAutoSchema.Meta):
+        model = BenchOrder
+
+
+class PerRecordOrderSchema(BenchOrderCamelSchema):
+    """改造前的pre_load: 逐条逐键调用camelcase."""
+
+    @ma.pre_load
+    def camelcase_dict_keys(self, data, **kwargs):
+        if isinstance(data, dict):
+            return {camelcase(k): v for k, v in data.items()}
+        return data
+
+
+class CompiledOrderSchema(BenchOrderCamelSchema):
+
+    class Meta(BenchOrderCamelSchema.Meta):
+        compile_dump = True
+
+
+def bench_construct(number: int = 2000):
+    app = create_app()
+    with app.test_request_context():
+        orders = [
+            BenchOrder(id=i,
+                       bill_no=f'SO{i:08d}',
+                       status=1,
+                       amount=i,
+                       create_time=datetime(2021, 1, 1)) for i in range(20)
+        ]
+        report('SqlaCamelAutoSchema construction', [
+            ('BenchOrderCamelSchema(many=True)',
+             bench(lambda: BenchOrderCamelSchema(many=True), number=number)),
+            ('BenchOrderCamelSchema.pooled(many=True)',
+             bench(lambda: BenchOrderCamelSchema.pooled(many=True),
+                   number=number)),
+        ])
+        pooled = BenchOrderCamelSchema.pooled
+        report('construct + dump 20 rows', [
+            ('construct',
+             bench(lambda: BenchOrderCamelSchema(many=True).dump(orders),
+                   number=number)),
+            ('pooled',
+             bench(lambda: pooled(many=True).dump(orders), number=number)),
+        ])
+
+    user = TokenUser.load(USER_INFO)
+    report('TokenUser.json', [
+        ('TokenUser.Schema().dump',
+         bench(lambda: TokenUser.Schema().dump(user), number=number)),
+        ('TokenUser.json (pooled)', bench(user.json, number=number)),
+    ])
+    print(f'schema pool stats: {schema_pool.stats()}')
+
+
+def bench_compiled_dump(number: int = 20):
+    """分页结果(模型实例)的序列化耗时."""
+    app = create_app()
+    with app.test_request_context():
+        seed_orders(1000)
+        for size in (20, 1000):
+            orders = BenchOrder.query.limit(size).all()
+            schema = BenchOrderCamelSchema(many=True)
+            compiled = CompiledOrderSchema(many=True)
+            assert compiled.dump(orders) == schema.dump(orders)
+            report(f'dump {size} rows', [
+                ('marshmallow',
+                 bench(lambda: schema.dump(orders),
+                       number=number * 1000 // size)),
+                ('compiled',
+                 bench(lambda: compiled.dump(orders),
+                       number=number * 1000 // size)),
+            ])
+
+
+def bench_camelcase_load(size: int = 10000, number: int = 5):
+    """批量导入(many=True)的pre_load键名转换及完整load耗时."""
+    app = create_app()
+    with app.test_request_context():
+        data = [{
+            'bill_no': f'SO{i:08d}',
+            'status': i % 4,
+            'amount': i,
+            'remarks': 'remarks',
+            'create_time': '2021-01-01 08:00:00',
+        } for i in range(size)]
+        schema = BenchOrderCamelSchema(many=True, load_instance=False)
+        old = PerRecordOrderSchema(many=True, load_instance=False)
+
+        def per_record():
+            return [old.camelcase_dict_keys(d) for d in data]
+
+        assert schema.camelcase_dict_keys(data, many=True) == per_record()
+        report(f'pre_load camelcase {size} records', [
+            ('camelcase per key', bench(per_record, number=number)),
+            ('camel_keys bulk',
+             bench(lambda: schema.camelcase_dict_keys(data, many=True),
+                   number=number)),
+        ])
+        assert schema.load(data) == old.load(data)
+        report(f'load {size} records', [
+            ('camelcase per key', bench(lambda: old.load(data), number=number)),
+            ('camel_keys bulk', bench(lambda: schema.load(data),
+                                      number=number)),
+        ])
+
+
+if __name__ == '__main__':
+    bench_construct()
+    bench_compiled_dump()
+    bench_camelcase_load()
@@ -0,0 +1,68 @@
+""" 不分页大结果集返回基准测试.
+python -m benchmarks.bench_stream
+"""
+import time
+import tracemalloc
+
+from flask import json
+
+from benchmarks.base import create_app
+from benchmarks.bench_query import BenchOrder
+from benchmarks.bench_query import seed_orders
+from lesoon_common import success_response
+from lesoon_common.model import SqlaAutoSchema
+from lesoon_common.utils.stream import export_response
+
+
+class BenchOrderSchema(SqlaAutoSchema):
+
+    class Meta(SqlaAutoSchema.Meta):
+        model = BenchOrder
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    elapsed = (time.perf_counter() - start) * 1e3
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, size
+
+
+def bench_stream(rows: int = 50000, chunk_size: int = 1000):
+    """ifPage=0: 全部加载后返回与流式返回的耗时及内存峰值."""
+    app = create_app()
+    with app.test_request_context():
+        seed_orders(rows)
+        schema = BenchOrderSchema()
+
+        def load_all():
+            items = BenchOrder.query.all()
+            body = json.dumps(
+                success_response(result=schema.dump(items, many=True),
+                                 total=len(items)))
+            return len(body)
+
+        def stream():
+            response = BenchOrder.query.stream(schema, chunk_size=chunk_size)
+            return sum(len(part) for part in response.response)
+
+        def export(export_format):
+            response = export_response(BenchOrder.query,
+                                       schema,
+                                       export_format,
+                                       chunk_size=chunk_size)
+            return sum(len(part) for part in response.response)
+
+        print(f'\n== ifPage=0 of {rows} rows')
+        for name, fn in (('all + dump', load_all), ('stream', stream),
+                         ('export ndjson', lambda: export('ndjson')),
+                         ('export csv', lambda: export('csv'))):
+            elapsed, peak, size = _measure(fn)
+            print(f'  {name:<20} {elapsed:>10.1f} ms  peak {peak:>8.1f} MB  '
+                  f'body {size / 1024 / 1024:.1f} MB')
+
+
+if __name__ == '__main__':
+    bench_stream()
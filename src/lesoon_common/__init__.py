@@ -12,8 +12,10 @@ from .extensions import mg
 from .globals import current_user
 from .globals import request
 from .response import ClientResponse
+from .response import error_json_response
 from .response import error_response
 from .response import Response
+from .response import success_json_response
 from .response import success_response
 from .utils.jwt import jwt_required
 from .wrappers import LesoonQuery
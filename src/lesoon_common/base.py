@@ -23,6 +23,7 @@ from lesoon_common.extensions import mg
 from lesoon_common.extensions import toolbar
 from lesoon_common.response import error_response
 from lesoon_common.utils.str import camelcase
+from lesoon_common.wrappers import LesoonJsonDecoder
 from lesoon_common.wrappers import LesoonJsonEncoder
 from lesoon_common.wrappers import LesoonRequest
 from lesoon_common.wrappers import LesoonTestClient
@@ -104,6 +105,9 @@ class LesoonFlask(Flask):
     # json encoder
     json_encoder = LesoonJsonEncoder
 
+    # json decoder
+    json_decoder = LesoonJsonDecoder
+
     def __init__(
         self,
         import_name=__package__,
@@ -1,11 +1,15 @@
+import dataclasses
 import typing as t
 from dataclasses import field
+from functools import lru_cache
 from functools import partial
 
 from marshmallow import Schema
 from marshmallow_dataclass import dataclass
 
 from lesoon_common.schema import CamelSchema
+from lesoon_common.schema import get_schema
+from lesoon_common.utils.str import camelcase
 
 # 覆盖生成的Schema基类为CamelSchema
 dataclass = partial(dataclass, base_schema=CamelSchema)  # type:ignore
@@ -20,11 +24,67 @@ class BaseDataClass:
 
     @classmethod
     def load(cls, data, **kwargs):
-        return cls.Schema().load(data, **kwargs)
+        return get_schema(cls.Schema).load(data, **kwargs)
+
+    @classmethod
+    def from_trusted(cls, data: t.Mapping[str, t.Any]):
+        """
+        从可信数据(如已校验签名的token)直接构造实例, 跳过Schema的校验及类型转换.
+        键名支持驼峰及下划线, 缺少必填字段或包含嵌套dataclass字段时回退至`load`.
+        """
+        plan = _trusted_plan(cls)
+        if plan is None:
+            return cls.load(data)
+        args = []
+        for name, key, default, factory in plan:
+            value = data.get(key, _MISSING)
+            if value is _MISSING:
+                value = data.get(name, _MISSING)
+            if value is _MISSING:
+                if factory is not _MISSING:
+                    value = factory()
+                elif default is _MISSING:
+                    return cls.load(data)
+                else:
+                    value = default
+            args.append(value)
+        # 按字段顺序初始化, 同类实例的__dict__可共享键(PEP 412)
+        return cls(*args)
 
     @classmethod
     def dump(cls, data, **kwargs):
-        return cls.Schema().dump(data, **kwargs)
+        return get_schema(cls.Schema).dump(data, **kwargs)
 
     def json(self, **kwargs):
-        return self.Schema().dump(self, **kwargs)
+        return get_schema(self.Schema).dump(self, **kwargs)
+
+
+_MISSING = dataclasses.MISSING
+
+
+def _is_nested(tp: t.Any) -> bool:
+    return dataclasses.is_dataclass(tp) or any(
+        _is_nested(arg) for arg in getattr(tp, '__args__', None) or ())
+
+
+@lru_cache(maxsize=None)
+def _trusted_plan(cls: type) -> t.Optional[t.List[tuple]]:
+    """
+    预计算`from_trusted`的字段构造计划 [(属性名, 驼峰键名, 默认值, 默认值工厂)].
+    包含嵌套字段时返回None.
+    """
+    plan = []
+    for f in dataclasses.fields(cls):
+        if not f.init:
+            continue
+        if 'marshmallow_field' in f.metadata or _is_nested(f.type):
+            return None
+        default, factory = f.default, f.default_factory  # type:ignore
+        if default is _MISSING and factory is _MISSING:
+            load_default = f.metadata.get('load_default', _MISSING)
+            if callable(load_default):
+                factory = load_default
+            else:
+                default = load_default
+        plan.append((f.name, camelcase(f.name), default, factory))
+    return plan
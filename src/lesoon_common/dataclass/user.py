@@ -1,4 +1,7 @@
+import dataclasses
+import typing as t
 from dataclasses import field
+from functools import lru_cache
 
 import marshmallow as ma
 
@@ -6,6 +9,33 @@ from lesoon_common.dataclass.base import BaseDataClass
 from lesoon_common.dataclass.base import dataclass
 from lesoon_common.utils.str import camelcase
 
+# 完整格式的token用户信息claim
+USER_CLAIM = 'userInfo'
+# 紧凑格式的token用户信息claim
+COMPACT_USER_CLAIM = 'u'
+# 紧凑格式字段名 {属性名: 短键}, id与user_id一致(见dump_process)不单独存放
+# 新增字段时只能追加短键, 已签发的token依赖现有映射
+COMPACT_KEYS = {
+    'company_id': 'ci',
+    'company_code': 'cc',
+    'company_name': 'cn',
+    'system_id': 'si',
+    'login_name': 'ln',
+    'user_name': 'un',
+    'user_id': 'ui',
+    'org_id': 'oi',
+    'email': 'em',
+    'phone_number': 'pn',
+    'icon': 'ic',
+    'employee_attr': 'ea',
+    'if_deleted': 'dl',
+    'if_admin': 'ad',
+    'token_expire': 'te',
+    'version_no': 'vn',
+    'app_version': 'av',
+    'app_type': 'at',
+}
+
 
 @dataclass
 class TokenUser(BaseDataClass):
@@ -145,3 +175,60 @@ class TokenUser(BaseDataClass):
         for k, v in kwargs.items():
             anonymous_user[camelcase(k)] = v
         return cls.load(anonymous_user)
+
+    @classmethod
+    def dump_compact(cls, user: 'TokenUser') -> t.Dict[str, t.Any]:
+        """紧凑格式: 使用短键, 省略与默认值相同的字段."""
+        defaults = _compact_defaults()
+        data = dict()
+        for name, key in COMPACT_KEYS.items():
+            value = getattr(user, name, None)
+            default = defaults.get(name, ma.missing)
+            if value == default and type(value) is type(default):
+                continue
+            data[key] = value
+        return data
+
+    @classmethod
+    def load_compact(cls, data: t.Dict[str, t.Any]) -> 'TokenUser':
+        user_info = {
+            camelcase(name): data[key]
+            for name, key in COMPACT_KEYS.items()
+            if key in data
+        }
+        user_info['id'] = user_info.get('userId', -1)
+        return cls.from_trusted(user_info)
+
+    @classmethod
+    def to_claims(cls,
+                  user: 'TokenUser',
+                  compact: bool = False) -> t.Dict[str, t.Any]:
+        """
+        生成token中的用户信息claims.
+        Args:
+            user: token用户
+            compact: 是否使用紧凑格式
+
+        """
+        if compact:
+            return {COMPACT_USER_CLAIM: cls.dump_compact(user)}
+        return {USER_CLAIM: cls.dump(user)}
+
+    @classmethod
+    def from_claims(cls, jwt_data: t.Dict[str, t.Any]) -> 'TokenUser':
+        """
+        从已校验的token claims中读取用户信息, 兼容完整及紧凑格式.
+        token签名已校验, 使用`from_trusted`跳过Schema校验.
+        """
+        if COMPACT_USER_CLAIM in jwt_data:
+            return cls.load_compact(jwt_data[COMPACT_USER_CLAIM])
+        return cls.from_trusted(jwt_data[USER_CLAIM])
+
+
+@lru_cache(maxsize=None)
+def _compact_defaults() -> t.Dict[str, t.Any]:
+    return {
+        f.name: f.metadata['load_default']
+        for f in dataclasses.fields(TokenUser)
+        if 'load_default' in f.metadata
+    }
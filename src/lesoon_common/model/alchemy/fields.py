@@ -8,9 +8,7 @@ from marshmallow.utils import _iso8601_date_re as date_re  # noqa
 class IntStr(ma.fields.Int, ma.fields.Str):
     default_error_messages = {'invalid': 'Not a valid integer.'}
 
-    def _serialize(self, value: typing.Any, attr: str, obj: typing.Any,
-                   **kwargs):
-        return String._serialize(self, value, attr, obj, **kwargs)
+    _serialize = String._serialize
 
     def _deserialize(self, value: typing.Any, attr: typing.Optional[str],
                      data: typing.Optional[typing.Mapping[str, typing.Any]],
@@ -54,6 +54,10 @@ class SqlaSchema(SQLAlchemySchema, BaseSchema, FixedOperatorSchema):
         else:
             return super().get_attribute(obj, attr, default)
 
+    def dump_guard(self, obj: t.Any) -> bool:
+        """编译的dump函数能否直接读取obj的属性, 见`lesoon_common.utils.compiler`."""
+        return not hasattr(obj, self.Meta.model.__name__)
+
     class Meta(BaseSchema.Meta):
         model: Model = None
         # sqlalchemy-session
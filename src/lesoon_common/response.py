@@ -1,7 +1,16 @@
 import typing as t
 from collections import Mapping
 
+from flask import current_app
+from flask import jsonify
+from flask import Response as FlaskResponse
+
 from lesoon_common.code import ResponseCode
+from lesoon_common.utils import codec
+from lesoon_common.utils.cache import LRUCache
+
+# 写入flag的属性
+_FLAG_ATTRS = frozenset(('msg', 'msg_detail', 'solution'))
 
 
 class ResponseBase:
@@ -25,6 +34,11 @@ class ResponseBase:
             }
 
     """
+    # __dict__中位于flag之前的结果属性, 决定返回体的键顺序
+    result_keys: t.Tuple[str, ...] = ()
+
+    # (返回码, solution, sort_keys): 已编码的flag
+    _flag_cache = LRUCache(maxsize=256)
 
     @classmethod
     def load(cls, data: t.Mapping):
@@ -94,12 +108,100 @@ class ResponseBase:
     def error(cls,
               code: t.Union[ResponseCode, str] = ResponseCode.Error,
               **kwargs) -> dict:
+        code = cls._error_code(code)
+        return cls(code=code, solution=code.solution, **kwargs).to_dict()
+
+    @staticmethod
+    def _error_code(code: t.Union[ResponseCode, str]) -> ResponseCode:
         if isinstance(code, str):
             if ResponseCode.is_exist(code):
-                code = ResponseCode(code)  # type:ignore[call-arg]
+                return ResponseCode(code)  # type:ignore[call-arg]
+            return ResponseCode.Error
+        return code
+
+    @classmethod
+    def _set_result(cls, items: t.Dict[str, t.Any], value: t.Any):
+        """按`result`属性的赋值规则写入items."""
+        raise NotImplementedError()
+
+    @classmethod
+    def _encode_flag(cls, code: ResponseCode, attrs: t.Dict[str, t.Any],
+                     sort_keys: bool) -> bytes:
+        cacheable = attrs.keys() <= {'solution'}
+        if cacheable:
+            key = (code, attrs.get('solution'), sort_keys)
+            encoded = cls._flag_cache.get(key)
+            if encoded is not None:
+                return encoded
+
+        flag = {'retCode': code.code, 'retMsg': code.msg, 'retDetail': code.msg}
+        for k, v in attrs.items():
+            if k == 'msg':
+                flag['retMsg'] = flag['retDetail'] = v
+            elif k == 'msg_detail':
+                flag['retDetail'] = v
             else:
-                code = ResponseCode.Error
-        return cls(code=code, solution=code.solution, **kwargs).to_dict()
+                flag[k] = v
+        encoded = codec.dumps_bytes(flag, sort_keys=sort_keys)
+        if cacheable:
+            cls._flag_cache.set(key, encoded)
+        return encoded
+
+    @classmethod
+    def encode(cls,
+               code: ResponseCode,
+               sort_keys: bool = True,
+               default: t.Optional[t.Callable[[t.Any], t.Any]] = None,
+               **kwargs) -> bytes:
+        """
+        直接编码返回体json, 不构造返回体对象.
+        结果与`to_dict`的编码结果一致(键顺序, 紧凑格式), flag按返回码缓存编码结果,
+        自定义msg/msg_detail时才重新编码.
+
+        Args:
+            code: 返回状态码
+            sort_keys: 是否按键排序, 与应用配置JSON_SORT_KEYS一致
+            default: 不支持类型的转换函数, 见`lesoon_common.utils.codec`
+            **kwargs: 同`__init__`
+
+        """
+        items: t.Dict[str, t.Any] = dict.fromkeys(cls.result_keys)
+        items['flag'] = items['total'] = None
+        flag_attrs = dict()
+        for k, v in kwargs.items():
+            if not v:
+                continue
+            if k == 'result':
+                cls._set_result(items, v)
+            elif k in _FLAG_ATTRS:
+                flag_attrs[k] = v
+            else:
+                items[k] = v
+
+        dumps = codec.dumps_bytes
+        parts = []
+        for k, v in items.items():
+            if k == 'flag':
+                parts.append((k, cls._encode_flag(code, flag_attrs, sort_keys)))
+            elif v:
+                parts.append((k, dumps(v, default=default,
+                                       sort_keys=sort_keys)))
+        if sort_keys:
+            parts.sort()
+        return b'{' + b','.join(dumps(k) + b':' + v for k, v in parts) + b'}'
+
+    @classmethod
+    def success_bytes(cls, result: t.Any = None, **kwargs) -> bytes:
+        """`success`的json编码结果, 参数见`encode`."""
+        return cls.encode(ResponseCode.Success, result=result, **kwargs)
+
+    @classmethod
+    def error_bytes(cls,
+                    code: t.Union[ResponseCode, str] = ResponseCode.Error,
+                    **kwargs) -> bytes:
+        """`error`的json编码结果, 参数见`encode`."""
+        code = cls._error_code(code)
+        return cls.encode(code, solution=code.solution, **kwargs)
 
 
 class Response(ResponseBase):
@@ -114,6 +216,8 @@ class Response(ResponseBase):
             见 `lesoon_common.response.ResponseBase`
     """
 
+    result_keys = ('data', 'rows')
+
     def __init__(self, code: ResponseCode, **kwargs):
         self.data: t.Dict[str, t.Any] = dict()
         self.rows: t.List[dict] = list()
@@ -132,6 +236,15 @@ class Response(ResponseBase):
         else:
             self.data = value
 
+    @classmethod
+    def _set_result(cls, items, value):
+        if isinstance(value, (list, tuple, set)):
+            items['rows'] = list(value)
+        elif isinstance(value, Mapping):
+            items['data'] = dict(value)
+        else:
+            items['data'] = value
+
 
 class ClientResponse(ResponseBase):
     """
@@ -144,6 +257,8 @@ class ClientResponse(ResponseBase):
            见 `lesoon_common.response.ResponseBase`
     """
 
+    result_keys = ('body',)
+
     def __init__(self, code: ResponseCode, **kwargs):
         self.body: t.Any = None
         super().__init__(code=code, **kwargs)
@@ -156,6 +271,44 @@ class ClientResponse(ResponseBase):
     def result(self, value: t.Any):
         self.body = value
 
+    @classmethod
+    def _set_result(cls, items, value):
+        items['body'] = value
+
+
+def _json_response(encode: t.Callable[..., bytes],
+                   to_dict: t.Callable[..., dict], **kwargs) -> FlaskResponse:
+    app = current_app._get_current_object()  # type:ignore[attr-defined]
+    config = app.config
+    if config['JSONIFY_PRETTYPRINT_REGULAR'] or app.debug:
+        # 缩进输出不走快速路径
+        return jsonify(to_dict(**kwargs))
+    body = encode(sort_keys=config['JSON_SORT_KEYS'],
+                  default=app.json_encoder().default,
+                  **kwargs)
+    # 与jsonify一致, 结尾换行
+    return app.response_class(body + b'\n', mimetype=config['JSONIFY_MIMETYPE'])
+
+
+def success_json_response(result: t.Any = None, **kwargs) -> FlaskResponse:
+    """
+    `success_response`的快速路径, 直接返回已编码的json响应.
+    响应内容与`jsonify(success_response(...))`一致(使用orjson时逐字节一致).
+    """
+    return _json_response(Response.success_bytes,
+                          Response.success,
+                          result=result,
+                          **kwargs)
+
+
+def error_json_response(code: t.Union[ResponseCode, str] = ResponseCode.Error,
+                        **kwargs) -> FlaskResponse:
+    """`error_response`的快速路径, 见`success_json_response`."""
+    return _json_response(Response.error_bytes,
+                          Response.error,
+                          code=code,
+                          **kwargs)
+
 
 success_response = Response.success
 error_response = Response.error
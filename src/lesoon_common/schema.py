@@ -1,9 +1,85 @@
 import typing as t
 
 import marshmallow as ma
+from marshmallow.utils import is_collection
 
+from lesoon_common.utils.cache import LRUCache
+from lesoon_common.utils.compiler import compile_dump
+from lesoon_common.utils.str import cached_camelcase
 from lesoon_common.utils.str import camelcase
 
+# schema实例池最大条目数
+SCHEMA_POOL_SIZE = 512
+
+SchemaType = t.TypeVar('SchemaType', bound=ma.Schema)
+
+
+def _freeze(value: t.Any) -> t.Any:
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    return frozenset(value)
+
+
+class SchemaPool:
+    """
+    schema实例池.
+    构造schema时marshmallow需复制声明的字段并逐个绑定(含CamelSchema的驼峰转换),
+    实例池按(schema类, many, only, exclude, partial)缓存已绑定的实例.
+
+    同一实例在多个线程间共享, 使用时不能修改实例状态(如context),
+    SqlaSchema按instance参数load时也会临时修改实例状态, 此时请直接构造实例.
+
+    Attributes:
+        cache: 已绑定的实例, 命中率见`stats`
+
+    """
+
+    def __init__(self, maxsize: int = SCHEMA_POOL_SIZE):
+        self.cache = LRUCache(maxsize=maxsize)
+
+    def get(self,
+            schema_cls: t.Type[SchemaType],
+            many: bool = False,
+            only: t.Optional[t.Sequence[str]] = None,
+            exclude: t.Sequence[str] = (),
+            partial: t.Union[bool, t.Sequence[str]] = False) -> SchemaType:
+        """
+        获取已绑定的schema实例, 参数同schema的构造参数.
+        """
+        key = (schema_cls, many, _freeze(only), _freeze(exclude),
+               _freeze(partial))
+        schema = self.cache.get(key)
+        if schema is None:
+            # 并发未命中时可能重复构造, 后写入的实例覆盖先写入的, 不影响使用
+            schema = schema_cls(many=many,
+                                only=only,
+                                exclude=exclude,
+                                partial=partial)
+            self.cache.set(key, schema)
+        return schema
+
+    def stats(self) -> t.Dict[str, t.Any]:
+        return self.cache.stats()
+
+    def clear(self):
+        self.cache.clear()
+
+
+schema_pool = SchemaPool()
+
+
+def get_schema(schema_cls: t.Type[SchemaType],
+               many: bool = False,
+               only: t.Optional[t.Sequence[str]] = None,
+               exclude: t.Sequence[str] = (),
+               partial: t.Union[bool, t.Sequence[str]] = False) -> SchemaType:
+    """从默认实例池获取schema实例, 见`SchemaPool.get`."""
+    return schema_pool.get(schema_cls,
+                           many=many,
+                           only=only,
+                           exclude=exclude,
+                           partial=partial)
+
 
 class BaseSchema(ma.Schema):
 
@@ -19,17 +95,97 @@ class BaseSchema(ma.Schema):
         ordered = True
         # 时间格式
         datetimeformat = '%Y-%m-%d %H:%M:%S'
+        # 是否使用编译的dump函数, 见`lesoon_common.utils.compiler`
+        compile_dump = False
+
+    def dump(self, obj: t.Any, *, many: t.Optional[bool] = None):
+        dump = self._compiled_dump()
+        if dump is None:
+            return super().dump(obj, many=many)
+        return dump(obj, self.many if many is None else bool(many))
+
+    def _compiled_dump(self) -> t.Optional[t.Callable[[t.Any, bool], t.Any]]:
+        if not getattr(self.Meta, 'compile_dump', False):
+            return None
+        try:
+            return self.__dict__['_dump']
+        except KeyError:
+            # 首次dump时编译, 无法编译时为None(使用marshmallow)
+            dump = self.__dict__['_dump'] = compile_dump(self)
+            return dump
+
+    @classmethod
+    def pooled(cls: t.Type[SchemaType],
+               many: bool = False,
+               only: t.Optional[t.Sequence[str]] = None,
+               exclude: t.Sequence[str] = (),
+               partial: t.Union[bool, t.Sequence[str]] = False) -> SchemaType:
+        """
+        从实例池获取已绑定的实例, 用于代替在视图函数中构造schema.
+        示例: UserSchema.pooled(many=True).dump(users)
+        """
+        return get_schema(cls,
+                          many=many,
+                          only=only,
+                          exclude=exclude,
+                          partial=partial)
 
 
 class CamelSchema(BaseSchema):
+
+    @classmethod
+    def camel_keys(cls) -> t.Dict[str, str]:
+        """
+        键名到驼峰键名的映射, 包含字段名(或声明的data_key)及其驼峰形式,
+        每个schema类只计算一次.
+        """
+        keys = cls.__dict__.get('_camel_keys')
+        if keys is None:
+            keys = dict()
+            for name, field_obj in cls._declared_fields.items():
+                key = field_obj.data_key or name
+                camel = camelcase(key)
+                keys[key] = keys[camel] = camel
+            cls._camel_keys = keys
+        return keys
+
+    @classmethod
+    def camel_key(cls, key: str) -> str:
+        """单个键名转换为驼峰, 未声明的键名使用有缓存的`camelcase`."""
+        return cls.camel_keys().get(key) or cached_camelcase(key)
+
     # 将序列化/反序列化的列名调整成驼峰命名
     def on_bind_field(self, field_name: str,
                       field_obj: ma.fields.Field) -> None:
-        field_obj.data_key = camelcase(field_obj.data_key or field_name)
+        field_obj.data_key = self.camel_key(field_obj.data_key or field_name)
 
-    @ma.pre_load
-    def camelcase_dict_keys(self, data: t.Any, **kwargs):
-        new_data = data
+    @ma.pre_load(pass_many=True)
+    def camelcase_dict_keys(self, data: t.Any, many: bool, **kwargs):
+        if many and is_collection(data):
+            return self._camelcase_many(data)
         if isinstance(data, dict):
-            new_data = {camelcase(k): v for k, v in data.items()}
+            keys = self.camel_keys()
+            return {
+                keys.get(k) or cached_camelcase(k): v for k, v in data.items()
+            }
+        return data
+
+    def _camelcase_many(self, data: t.Iterable[t.Any]) -> t.List[t.Any]:
+        """
+        批量转换, 相邻记录的键相同(批量导入的常见情况)时复用上一条记录转换后的键,
+        每条记录只需按值重建字典.
+        """
+        camel_key = self.camel_key
+        new_data = []
+        last_keys: t.Optional[tuple] = None
+        new_keys: t.List[str] = []
+        for item in data:
+            if not isinstance(item, dict):
+                new_data.append(item)
+                continue
+            item_keys = tuple(item)
+            if item_keys != last_keys:
+                last_keys = item_keys
+                new_keys = [camel_key(k) for k in item_keys]
+            new_data.append(dict(zip(new_keys, item.values())))
         return new_data
@@ -2,6 +2,7 @@ import random
 import string
 import time
 import typing as t
+from collections.abc import Mapping
 
 
 def generate_id(size: int = 18) -> str:
@@ -44,3 +45,65 @@ class AttributeDict(dict):
 
     def __setattr__(self, key, value):
         self[key] = value
+
+
+class RowView(Mapping):
+    """
+    只读的查询结果行, 支持属性及键名访问.
+    值保存在元组中, 同一查询结果的所有行共享同一个键名索引(键名: 位置),
+    每行只占用一个两槽位对象及值元组, 内存占用接近原始元组.
+
+    Attributes:
+        _index: 键名索引, {键名: 位置}
+        _values: 行的值
+
+    """
+    __slots__ = ('_index', '_values')
+
+    def __init__(self, index: t.Dict[str, int], values: t.Sequence[t.Any]):
+        self._index = index
+        self._values = values
+
+    @classmethod
+    def build_index(cls, keys: t.Iterable[str]) -> t.Dict[str, int]:
+        """根据列名生成键名索引, 列名重复时保留第一个."""
+        index: t.Dict[str, int] = dict()
+        for position, key in enumerate(keys):
+            index.setdefault(key, position)
+        return index
+
+    def __getitem__(self, key: str) -> t.Any:
+        return self._values[self._index[key]]
+
+    def __getattr__(self, key: str) -> t.Any:
+        if key in RowView.__slots__:
+            # 槽位未赋值(如反序列化过程中), 避免递归
+            raise AttributeError(key)
+        try:
+            return self._values[self._index[key]]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __contains__(self, key: t.Any) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> t.Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getstate__(self) -> tuple:
+        return self._index, self._values
+
+    def __setstate__(self, state: tuple):
+        self._index, self._values = state
+
+    def __repr__(self) -> str:
+        return f'RowView({dict(self)!r})'
+
+    def to_dict(self) -> AttributeDict:
+        """转换为可修改的AttributeDict."""
+        values = self._values
+        return AttributeDict(
+            (key, values[position]) for key, position in self._index.items())
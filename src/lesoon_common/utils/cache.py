@@ -0,0 +1,128 @@
+""" 进程内缓存工具模块. """
+import sys
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+
+def _default_getsizeof(key: t.Any, value: t.Any) -> int:
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    线程安全的LRU缓存.
+    同时支持条目数量上限, 内存占用上限以及条目级别的过期时间.
+
+    Attributes:
+        maxsize: 最大条目数, 小于等于0表示不限制
+        maxbytes: 最大内存占用(近似值,单位字节), 小于等于0表示不限制
+        getsizeof: 计算条目内存占用的函数, 入参为(key, value)
+        hits: 命中次数
+        misses: 未命中次数(包括已过期的条目)
+
+    """
+
+    def __init__(self,
+                 maxsize: int = 1024,
+                 maxbytes: int = 0,
+                 getsizeof: t.Optional[t.Callable[[t.Any, t.Any], int]] = None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.getsizeof = getsizeof or _default_getsizeof
+        self.hits = 0
+        self.misses = 0
+        self.currbytes = 0
+        # key: (value, expires, size)
+        self._data: t.Dict[t.Any, tuple] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: t.Any) -> bool:
+        return self.get(key, _missing) is not _missing
+
+    def get(self, key: t.Any, default: t.Any = None) -> t.Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires, _ = item
+            if expires is not None and expires <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)  # type:ignore[attr-defined]
+            self.hits += 1
+            return value
+
+    def set(self,
+            key: t.Any,
+            value: t.Any,
+            expires: t.Optional[float] = None) -> bool:
+        """
+        写入缓存.
+        Args:
+            key: 缓存键
+            value: 缓存值
+            expires: 过期时间戳(秒), None表示不过期
+
+        Returns:
+            是否写入成功, 单个条目超出内存上限时不写入
+
+        """
+        size = self.getsizeof(key, value)
+        if 0 < self.maxbytes < size:
+            return False
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires, size)
+            self.currbytes += size
+            self._evict()
+        return True
+
+    def pop(self, key: t.Any, default: t.Any = None) -> t.Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.currbytes = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> t.Dict[str, t.Any]:
+        """缓存统计信息."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._data),
+            'bytes': self.currbytes,
+            'maxsize': self.maxsize,
+            'maxbytes': self.maxbytes,
+        }
+
+    def _remove(self, key: t.Any) -> t.Any:
+        value, _, size = self._data.pop(key)
+        self.currbytes -= size
+        return value
+
+    def _evict(self):
+        # 已过期条目在读取时淘汰, 此处只按最近最少使用淘汰
+        while self._data and self._over_limit():
+            self._remove(next(iter(self._data)))
+
+    def _over_limit(self) -> bool:
+        return ((0 < self.maxsize < len(self._data)) or
+                (0 < self.maxbytes < self.currbytes))
+
+
+_missing = object()
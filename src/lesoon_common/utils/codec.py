@@ -0,0 +1,94 @@
+""" json编解码模块.
+安装orjson时使用orjson编解码, 否则使用标准库json, 两者结果语义一致:
+    - Decimal编码为字符串
+    - datetime/date交由default处理(如flask的JSONEncoder编码为http日期),
+      不使用orjson内置的iso格式, 业务日期格式仍由schema的datetimeformat决定
+    - 非字符串的字典键转为字符串
+orjson不支持的输入(如超过64位的整数)自动回退到标准库.
+"""
+import json
+import typing as t
+from decimal import Decimal
+
+from lesoon_common.utils.base import RowView
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# 当前使用的编解码后端
+BACKEND = 'orjson' if orjson else 'json'
+
+if orjson:
+    _OPTION = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME |
+               orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+def encode_default(o: t.Any) -> t.Any:
+    """未指定default时使用, 处理Decimal及RowView."""
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, RowView):
+        return o.to_dict()
+    raise TypeError(f'Object of type {type(o).__name__} '
+                    f'is not JSON serializable')
+
+
+def _stdlib_dumps(obj: t.Any, default: t.Callable[[t.Any], t.Any],
+                  sort_keys: bool) -> str:
+    return json.dumps(obj,
+                      default=default,
+                      sort_keys=sort_keys,
+                      ensure_ascii=False,
+                      separators=(',', ':'))
+
+
+def dumps_bytes(obj: t.Any,
+                default: t.Optional[t.Callable[[t.Any], t.Any]] = None,
+                sort_keys: bool = False) -> bytes:
+    """
+    编码为utf-8的json字节串(紧凑格式).
+    Args:
+        obj: 待编码对象
+        default: 不支持类型的转换函数, 默认为`encode_default`
+        sort_keys: 是否按键排序
+
+    Raises:
+        TypeError: 存在无法编码的对象
+
+    """
+    default = default or encode_default
+    if orjson is not None:
+        option = _OPTION | orjson.OPT_SORT_KEYS if sort_keys else _OPTION
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # 超出orjson支持范围时回退, 无法编码的对象由标准库再次抛出异常
+            pass
+    return _stdlib_dumps(obj, default, sort_keys).encode('utf-8')
+
+
+def dumps(obj: t.Any,
+          default: t.Optional[t.Callable[[t.Any], t.Any]] = None,
+          sort_keys: bool = False) -> str:
+    """编码为json字符串(紧凑格式), 参数见`dumps_bytes`."""
+    if orjson is None:
+        return _stdlib_dumps(obj, default or encode_default, sort_keys)
+    return dumps_bytes(obj, default, sort_keys).decode('utf-8')
+
+
+def loads(s: t.Union[str, bytes, bytearray]) -> t.Any:
+    """
+    解码json.
+    Raises:
+        json.JSONDecodeError: 格式不正确
+
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(s)
+        except ValueError:
+            # orjson不接受NaN/Infinity等标准库支持的写法, 回退后语义一致
+            pass
+    return json.loads(s)
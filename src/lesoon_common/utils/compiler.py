@@ -0,0 +1,181 @@
+""" schema序列化编译模块.
+为schema实例生成专用的dump函数: 按字段顺序直接读取属性并内联常用字段
+(String/IntStr, Integer/Float, DateTime/Date, Raw)的转换, 省去marshmallow逐对象逐字段的
+serialize/get_value/get_attribute调用. 结果与`Schema.dump`一致(返回dict而非OrderedDict,
+键顺序相同).
+
+无法编译的部分回退到marshmallow:
+    - 存在pre_dump/post_dump处理器, 或自定义get_attribute且未提供dump_guard的schema不编译
+    - 覆盖了serialize/get_value, 或attribute为点分路径的字段逐字段调用`Field.serialize`
+    - 带__getitem__的对象(dict, Row等)及dump_guard不通过的对象整体调用`Schema._serialize`
+"""
+import typing as t
+
+import marshmallow as ma
+from marshmallow import fields as ma_fields
+from marshmallow.decorators import POST_DUMP
+from marshmallow.decorators import PRE_DUMP
+from marshmallow.utils import ensure_text_type
+from marshmallow.utils import missing
+
+DumpFunction = t.Callable[[t.Any, bool], t.Any]
+
+_Field = ma_fields.Field
+_Number = ma_fields.Number
+
+
+def _accessor_guard(
+        schema: ma.Schema
+) -> t.Tuple[bool, t.Optional[t.Callable[[t.Any], bool]]]:
+    """
+    返回(能否编译, 对象校验函数).
+    自定义get_attribute的schema须在同一个类中提供`dump_guard(obj)`,
+    返回True时表示该对象可以直接按属性名读取.
+    """
+    for klass in type(schema).__mro__:
+        if 'get_attribute' in klass.__dict__:
+            if klass is ma.Schema:
+                return True, None
+            if 'dump_guard' in klass.__dict__:
+                return True, schema.dump_guard  # type:ignore[attr-defined]
+            return False, None
+    return False, None  # pragma: no cover
+
+
+def _convert(field: _Field, ref: str, names: t.Dict[str,
+                                                    t.Any]) -> t.Optional[str]:
+    """内联的字段值转换表达式, v为已读取且不为None的值, 不能内联时返回None."""
+    serialize = type(field)._serialize
+    if serialize is _Field._serialize:
+        return 'v'
+    if serialize is ma_fields.String._serialize:
+        return 'v if v.__class__ is str else text(v)'
+    if (serialize is _Number._serialize and
+            type(field)._format_num is _Number._format_num and
+            type(field)._to_string is _Number._to_string):
+        names[f'{ref}_num'] = field.num_type  # type:ignore[attr-defined]
+        if field.as_string:  # type:ignore[attr-defined]
+            return f'str({ref}_num(v))'
+        return f'{ref}_num(v)'
+    if serialize is ma_fields.DateTime._serialize:
+        data_format = (
+            field.format or  # type:ignore[attr-defined]
+            field.DEFAULT_FORMAT)  # type:ignore[attr-defined]
+        format_func = field.SERIALIZATION_FUNCS.get(  # type:ignore
+            data_format)
+        if format_func:
+            names[f'{ref}_fmt'] = format_func
+            return f'{ref}_fmt(v)'
+        names[f'{ref}_fmt'] = data_format
+        return f'v.strftime({ref}_fmt)'
+    return None
+
+
+def _field_lines(index: int, attr_name: str, field: _Field,
+                 names: t.Dict[str, t.Any]) -> t.List[str]:
+    ref = f'f{index}'
+    key = field.data_key if field.data_key is not None else attr_name
+    names[ref] = field
+    names[f'{ref}_attr'] = attr_name
+    names[f'{ref}_key'] = key
+
+    check_key = attr_name if field.attribute is None else field.attribute
+    if (type(field).serialize is not _Field.serialize or
+            type(field).get_value is not _Field.get_value or '.' in check_key):
+        # 无法编译的字段
+        return [
+            f'v = {ref}.serialize({ref}_attr, obj, accessor=get_attribute)',
+            'if v is not missing:',
+            f'    ret[{ref}_key] = v',
+        ]
+
+    if not field._CHECK_ATTRIBUTE:
+        return [
+            f'v = {ref}._serialize(None, {ref}_attr, obj)',
+            'if v is not missing:',
+            f'    ret[{ref}_key] = v',
+        ]
+
+    names[f'{ref}_check'] = check_key
+    lines = [f'v = getattr(obj, {ref}_check, missing)']
+    default = field.dump_default
+    if default is not missing:
+        names[f'{ref}_default'] = default
+        call = '()' if callable(default) else ''
+        lines += [
+            'if v is missing:',
+            f'    v = {ref}_default{call}',
+        ]
+    lines.append('if v is not missing:')
+    convert = _convert(field, ref, names)
+    if convert is None:
+        lines += [
+            f'    v = {ref}._serialize(v, {ref}_attr, obj)',
+            '    if v is not missing:',
+            f'        ret[{ref}_key] = v',
+        ]
+    elif convert == 'v':
+        lines.append(f'    ret[{ref}_key] = v')
+    else:
+        lines.append(f'    ret[{ref}_key] = None if v is None else {convert}')
+    return lines
+
+
+def compile_dump(schema: ma.Schema) -> t.Optional[DumpFunction]:
+    """
+    编译schema实例的dump函数.
+    Args:
+        schema: 已绑定字段的schema实例
+
+    Returns:
+        dump(obj, many)函数, 无法编译时返回None
+
+    """
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP):
+        return None
+    compilable, guard = _accessor_guard(schema)
+    if not compilable:
+        return None
+
+    names: t.Dict[str, t.Any] = {
+        'missing': missing,
+        'text': ensure_text_type,
+        'get_attribute': schema.get_attribute,
+        'serialize': schema._serialize,
+        'guard': guard,
+        # 不带__getitem__的类型, 可直接按属性名读取
+        'plain_types': set(),
+    }
+    body = []
+    for index, (attr_name, field) in enumerate(schema.dump_fields.items()):
+        body += _field_lines(index, attr_name, field, names)
+
+    lines = [
+        'def dump_one(obj):',
+        '    cls = obj.__class__',
+        '    if cls not in plain_types:',
+        "        if hasattr(cls, '__getitem__'):",
+        '            return serialize(obj, many=False)',
+        '        plain_types.add(cls)',
+    ]
+    if guard is not None:
+        lines += [
+            '    if not guard(obj):',
+            '        return serialize(obj, many=False)',
+        ]
+    lines.append('    ret = {}')
+    lines += ['    ' + line for line in body]
+    lines += [
+        '    return ret',
+        '',
+        'def dump(obj, many):',
+        '    if many and obj is not None:',
+        '        return [dump_one(o) for o in obj]',
+        '    return dump_one(obj)',
+    ]
+    source = '\n'.join(lines)
+    code = compile(source, f'<compiled dump {type(schema).__name__}>', 'exec')
+    exec(code, names)
+    dump = names['dump']
+    dump.__source__ = source
+    return dump
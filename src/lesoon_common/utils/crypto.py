@@ -0,0 +1,230 @@
+""" token加解密/签名后端模块.
+默认后端基于python-jose, 另提供直接基于cryptography的后端,
+两者生成及解析的token相互兼容, 通过配置`JWT_CRYPTO_BACKEND`选择.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import typing as t
+from calendar import timegm
+from datetime import datetime
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from jose import jwe
+from jose import jws
+from jose import jwt
+from jose.exceptions import JWEError
+from jose.exceptions import JWSError
+from werkzeug.utils import import_string
+
+
+def b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).replace(b'=', b'')
+
+
+def b64decode(data: t.Union[str, bytes]) -> bytes:
+    if isinstance(data, str):
+        data = data.encode('ascii')
+    rem = len(data) % 4
+    if rem > 0:
+        data += b'=' * (4 - rem)
+    return base64.urlsafe_b64decode(data)
+
+
+def _json_segment(data: dict, sort_keys: bool = False) -> bytes:
+    return b64encode(
+        json.dumps(data, separators=(',', ':'),
+                   sort_keys=sort_keys).encode('utf-8'))
+
+
+class CryptoBackend:
+    """
+    token加解密/签名后端接口.
+    jwe固定使用dir直接加密模式, 密钥在加入密钥环时通过`prepare_key`预处理一次.
+    """
+    name = ''
+
+    def prepare_key(self, key_bytes: bytes) -> t.Any:
+        """预处理密钥, 返回值会作为其他方法的key参数."""
+        return key_bytes
+
+    def encrypt(self,
+                plaintext: t.Union[str, bytes],
+                key: t.Any,
+                kid: t.Optional[str] = None,
+                cty: t.Optional[str] = 'JWT') -> str:
+        raise NotImplementedError()
+
+    def decrypt(self, token: t.Union[str, bytes], key: t.Any) -> bytes:
+        raise NotImplementedError()
+
+    def sign(self,
+             claims: dict,
+             key: t.Union[str, bytes],
+             algorithm: str = 'HS256',
+             headers: t.Optional[dict] = None) -> str:
+        raise NotImplementedError()
+
+    def verify(self, token: t.Union[str, bytes], key: t.Union[str, bytes],
+               algorithms: t.Iterable[str]) -> bytes:
+        """校验签名并返回payload, 不校验exp等claims."""
+        raise NotImplementedError()
+
+
+class JoseBackend(CryptoBackend):
+    """基于python-jose的后端."""
+    name = 'jose'
+
+    def encrypt(self, plaintext, key, kid=None, cty='JWT'):
+        return jwe.encrypt(plaintext, key=key, cty=cty, kid=kid).decode()
+
+    def decrypt(self, token, key):
+        return jwe.decrypt(token, key)
+
+    def sign(self, claims, key, algorithm='HS256', headers=None):
+        return jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+    def verify(self, token, key, algorithms):
+        return jws.verify(token, key, list(algorithms))
+
+
+class CryptographyKey:
+    """cryptography后端预处理后的密钥."""
+    __slots__ = ('key_bytes', 'aesgcm')
+
+    def __init__(self, key_bytes: bytes):
+        self.key_bytes = key_bytes
+        self.aesgcm = AESGCM(key_bytes) if len(key_bytes) in (16, 24,
+                                                              32) else None
+
+
+class CryptographyBackend(CryptoBackend):
+    """
+    直接基于cryptography的后端.
+    支持dir + A128GCM/A192GCM/A256GCM的jwe以及HS256/HS384/HS512的jws,
+    其他算法的token交由python-jose处理.
+    """
+    name = 'cryptography'
+
+    GCM_KEY_SIZE = {'A128GCM': 16, 'A192GCM': 24, 'A256GCM': 32}
+    HMAC_DIGEST = {
+        'HS256': hashlib.sha256,
+        'HS384': hashlib.sha384,
+        'HS512': hashlib.sha512
+    }
+
+    def __init__(self):
+        self.fallback = JoseBackend()
+
+    def prepare_key(self, key_bytes):
+        return CryptographyKey(key_bytes)
+
+    def encrypt(self, plaintext, key, kid=None, cty='JWT'):
+        if key.aesgcm is None or len(key.key_bytes) != 32:
+            return self.fallback.encrypt(plaintext, key.key_bytes, kid, cty)
+        if isinstance(plaintext, str):
+            plaintext = plaintext.encode('utf-8')
+
+        header = {'alg': 'dir', 'enc': 'A256GCM'}
+        if cty:
+            header['cty'] = cty
+        if kid:
+            header['kid'] = kid
+        encoded_header = _json_segment(header, sort_keys=True)
+
+        iv = os.urandom(12)
+        encrypted = key.aesgcm.encrypt(iv, plaintext, encoded_header)
+        return b'.'.join(
+            (encoded_header, b'', b64encode(iv), b64encode(encrypted[:-16]),
+             b64encode(encrypted[-16:]))).decode('ascii')
+
+    def decrypt(self, token, key):
+        if isinstance(token, str):
+            token = token.encode('ascii')
+        try:
+            encoded_header, encrypted_key, iv, ciphertext, tag = token.split(
+                b'.')
+            header = json.loads(b64decode(encoded_header))
+        except (ValueError, TypeError, binascii.Error) as e:
+            raise JWEError(f'jwe解析异常:{e}')
+
+        if (header.get('alg') != 'dir' or encrypted_key or header.get('zip') or
+                key.aesgcm is None or
+                self.GCM_KEY_SIZE.get(header.get('enc')) != len(key.key_bytes)):
+            return self.fallback.decrypt(token, key.key_bytes)
+
+        try:
+            return key.aesgcm.decrypt(b64decode(iv),
+                                      b64decode(ciphertext) + b64decode(tag),
+                                      encoded_header)
+        except (InvalidTag, ValueError, binascii.Error):
+            raise JWEError('Invalid JWE Auth Tag')
+
+    def sign(self, claims, key, algorithm='HS256', headers=None):
+        digest = self.HMAC_DIGEST.get(algorithm)
+        if digest is None:
+            return self.fallback.sign(claims, key, algorithm, headers)
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+
+        claims = dict(claims)
+        for time_claim in ('exp', 'iat', 'nbf'):
+            if isinstance(claims.get(time_claim), datetime):
+                claims[time_claim] = timegm(claims[time_claim].utctimetuple())
+
+        header = {'typ': 'JWT', 'alg': algorithm}
+        header.update(headers or {})
+        signing_input = b'.'.join(
+            (_json_segment(header, sort_keys=True), _json_segment(claims)))
+        signature = hmac.new(key, signing_input, digest).digest()
+        return b'.'.join((signing_input, b64encode(signature))).decode('ascii')
+
+    def verify(self, token, key, algorithms):
+        if isinstance(token, str):
+            token = token.encode('ascii')
+        try:
+            signing_input, encoded_signature = token.rsplit(b'.', 1)
+            encoded_header, payload = signing_input.split(b'.', 1)
+            header = json.loads(b64decode(encoded_header))
+            signature = b64decode(encoded_signature)
+        except (ValueError, TypeError, binascii.Error) as e:
+            raise JWSError(f'jws解析异常:{e}')
+
+        algorithm = header.get('alg')
+        if algorithm not in algorithms:
+            raise JWSError('The specified alg value is not allowed')
+        digest = self.HMAC_DIGEST.get(algorithm)
+        if digest is None:
+            return self.fallback.verify(token, key, algorithms)
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+
+        expected = hmac.new(key, signing_input, digest).digest()
+        if not hmac.compare_digest(expected, signature):
+            raise JWSError('Signature verification failed.')
+        return b64decode(payload)
+
+
+BACKENDS: t.Dict[str, t.Type[CryptoBackend]] = {
+    JoseBackend.name: JoseBackend,
+    CryptographyBackend.name: CryptographyBackend,
+}
+
+
+def get_backend(
+        backend: t.Union[str, CryptoBackend, None] = None) -> CryptoBackend:
+    """
+    获取加解密后端.
+    Args:
+        backend: 后端名称(jose/cryptography), 导入路径或后端实例, 默认为jose
+
+    """
+    if isinstance(backend, CryptoBackend):
+        return backend
+    backend = backend or JoseBackend.name
+    backend_cls = BACKENDS.get(backend) or import_string(backend)
+    return backend_cls()
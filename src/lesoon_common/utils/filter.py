@@ -0,0 +1,318 @@
+""" 查询过滤条件(where)解析模块.
+sqlalchemy及mongoengine的过滤条件编译共用此模块的解析及限制校验.
+
+where格式(键为驼峰或下划线字段名):
+    {
+        "userName": "lesoon",                   # 等于, 值为None时为空判断
+        "status": [1, 2],                       # 列表值等同于$in
+        "age": {"$gte": 18, "$lt": 60},
+        "createTime": {"$range": ["2021-01-01", null]},
+        "loginName": {"$like": "les"},          # 前缀匹配
+        "remarks": {"$null": true}
+    }
+"""
+import json
+import typing as t
+from datetime import date
+
+from flask import current_app
+
+from lesoon_common.exceptions import RequestError
+from lesoon_common.utils.crypto import b64decode
+from lesoon_common.utils.crypto import b64encode
+
+# 单个where最多字段数
+WHERE_FIELDS_LIMIT = 50
+# $in/$nin最多值个数
+WHERE_VALUES_LIMIT = 1000
+
+OP_EQ = '$eq'
+OP_NE = '$ne'
+OP_IN = '$in'
+OP_NIN = '$nin'
+OP_GT = '$gt'
+OP_GTE = '$gte'
+OP_LT = '$lt'
+OP_LTE = '$lte'
+OP_RANGE = '$range'
+OP_LIKE = '$like'
+OP_NULL = '$null'
+
+# 比较类操作符
+COMPARE_OPS = (OP_EQ, OP_NE, OP_GT, OP_GTE, OP_LT, OP_LTE)
+# 值为列表的操作符
+MULTI_OPS = (OP_IN, OP_NIN)
+OPERATORS = frozenset(COMPARE_OPS + MULTI_OPS + (OP_RANGE, OP_LIKE, OP_NULL))
+
+_SCALAR_TYPES = (str, int, float, bool)
+
+
+class Condition(t.NamedTuple):
+    """
+    单个过滤条件.
+
+    Attributes:
+        field: 字段名(原始键名)
+        op: 操作符
+        value: 条件值
+        shape: 条件值的结构特征, 与(field, op)一起决定编译结果,
+            如$null的真假, $range的上下界是否存在
+
+    """
+    field: str
+    op: str
+    value: t.Any
+    shape: t.Any = None
+
+    @property
+    def key(self) -> tuple:
+        return self.field, self.op, self.shape
+
+
+def _error(msg: str) -> RequestError:
+    return RequestError(msg=msg)
+
+
+def _check_scalar(field: str, value: t.Any):
+    if value is not None and not isinstance(value, _SCALAR_TYPES):
+        raise _error(f'过滤条件{field}的值类型不支持')
+
+
+def _check_values(field: str, values: t.Any,
+                  max_values: int) -> t.Tuple[t.Any, ...]:
+    if not isinstance(values, (list, tuple)):
+        raise _error(f'过滤条件{field}的值须为列表')
+    if len(values) > max_values:
+        raise _error(f'过滤条件{field}的值个数超出上限{max_values}')
+    for value in values:
+        _check_scalar(field, value)
+    return tuple(values)
+
+
+def _parse_op(field: str, op: str, value: t.Any, max_values: int) -> Condition:
+    if op not in OPERATORS:
+        raise _error(f'过滤条件{field}不支持操作符{op}')
+
+    if op in MULTI_OPS:
+        return Condition(field, op, _check_values(field, value, max_values))
+    if op == OP_RANGE:
+        bounds = _check_values(field, value, 2)
+        if len(bounds) != 2:
+            raise _error(f'过滤条件{field}的{op}须为[起始值,结束值]')
+        return Condition(field, op, bounds,
+                         (bounds[0] is not None, bounds[1] is not None))
+    if op == OP_NULL:
+        return Condition(field, op, None, bool(value))
+    if op == OP_LIKE:
+        if not isinstance(value, str) or not value:
+            raise _error(f'过滤条件{field}的{op}须为非空字符串')
+        return Condition(field, op, value)
+
+    _check_scalar(field, value)
+    if value is None and op in (OP_EQ, OP_NE):
+        # 与None比较转换为空判断
+        return Condition(field, OP_NULL, None, op == OP_EQ)
+    return Condition(field, op, value)
+
+
+def parse_where(
+        where: t.Optional[t.Mapping[str, t.Any]],
+        max_fields: int = WHERE_FIELDS_LIMIT,
+        max_values: int = WHERE_VALUES_LIMIT) -> t.Tuple[Condition, ...]:
+    """
+    解析where并校验限制.
+    Args:
+        where: 过滤条件
+        max_fields: 最多字段数
+        max_values: $in/$nin最多值个数
+
+    Returns:
+        按(字段,操作符)排序的条件, 相同结构的where得到相同的key序列
+
+    Raises:
+        RequestError: 格式不合法或超出限制
+
+    """
+    if not where:
+        return tuple()
+    if not isinstance(where, t.Mapping):
+        raise _error('过滤条件须为json对象')
+    if len(where) > max_fields:
+        raise _error(f'过滤条件字段数超出上限{max_fields}')
+
+    conditions = []
+    for field, value in where.items():
+        if isinstance(value, t.Mapping):
+            if not value:
+                raise _error(f'过滤条件{field}为空')
+            for op, op_value in value.items():
+                conditions.append(_parse_op(field, op, op_value, max_values))
+        elif isinstance(value, (list, tuple)):
+            conditions.append(_parse_op(field, OP_IN, value, max_values))
+        else:
+            conditions.append(_parse_op(field, OP_EQ, value, max_values))
+    conditions.sort(key=lambda c: (c.field, c.op))
+    return tuple(conditions)
+
+
+def where_shape(conditions: t.Sequence[Condition]) -> tuple:
+    """where结构特征, 用作编译结果的缓存键."""
+    return tuple(condition.key for condition in conditions)
+
+
+def schema_key(schema: t.Any) -> t.Optional[tuple]:
+    """
+    schema字段映射特征, 用作编译结果的缓存键.
+    同一schema类的实例可能因only/exclude及data_key映射到不同的字段, 按实际映射区分.
+    """
+    if schema is None:
+        return None
+    return tuple((name, field.data_key, field.attribute)
+                 for name, field in schema.fields.items())
+
+
+def escape_like(value: str, escape: str = '\\') -> str:
+    """转义like匹配中的通配符."""
+    return (value.replace(escape, escape * 2).replace('%',
+                                                      escape + '%').replace(
+                                                          '_', escape + '_'))
+
+
+# 单个sort最多字段数
+SORT_FIELDS_LIMIT = 5
+
+# 无索引排序的处理方式
+# 不检查
+SORT_POLICY_IGNORE = 'ignore'
+# 记录告警日志后继续排序
+SORT_POLICY_WARN = 'warn'
+# 拒绝请求
+SORT_POLICY_REJECT = 'reject'
+SORT_POLICIES = (SORT_POLICY_IGNORE, SORT_POLICY_WARN, SORT_POLICY_REJECT)
+
+_SORT_DIRECTIONS = {'asc': False, 'desc': True, 1: False, -1: True}
+
+
+def _parse_direction(field: str, direction: t.Any) -> bool:
+    if isinstance(direction, str):
+        direction = direction.lower()
+    if isinstance(direction, bool) or direction not in _SORT_DIRECTIONS:
+        raise _error(f'排序字段{field}的排序方向不正确:{direction}')
+    return _SORT_DIRECTIONS[direction]
+
+
+def parse_sort(
+        sort: t.Union[str, t.Mapping[str, t.Any], None],
+        max_fields: int = SORT_FIELDS_LIMIT
+) -> t.Tuple[t.Tuple[str, bool], ...]:
+    """
+    解析sort并校验限制.
+    Args:
+        sort: 排序条件, 支持{"createTime": "desc", "id": 1}
+            或"createTime desc,id asc"(方向缺省为asc)
+        max_fields: 最多字段数
+
+    Returns:
+        ((字段名, 是否倒序), ...)
+
+    Raises:
+        RequestError: 格式不合法或超出限制
+
+    """
+    if not sort:
+        return tuple()
+    if isinstance(sort, str):
+        items = []
+        for part in sort.split(','):
+            words = part.split()
+            if not words or len(words) > 2:
+                raise _error(f'排序条件格式不正确:{sort}')
+            items.append((words[0], words[1] if len(words) == 2 else 'asc'))
+    elif isinstance(sort, t.Mapping):
+        items = list(sort.items())
+    else:
+        raise _error('排序条件须为json对象或字符串')
+
+    if len(items) > max_fields:
+        raise _error(f'排序字段数超出上限{max_fields}')
+    return tuple((field, _parse_direction(field, direction))
+                 for field, direction in items)
+
+
+def is_index_prefix(fields: t.Sequence[t.Any],
+                    indexes: t.Iterable[t.Sequence[t.Any]]) -> bool:
+    """fields是否为某个索引的前缀, 即排序可以直接使用该索引."""
+    fields = tuple(fields)
+    return any(tuple(index[:len(fields)]) == fields for index in indexes)
+
+
+def check_sort_index(fields: t.Sequence[str], covered: bool, policy: str):
+    """
+    按策略处理没有索引可用的排序.
+    Args:
+        fields: 排序字段
+        covered: 是否有可用的索引(或在白名单内)
+        policy: ignore/warn/reject
+
+    """
+    if covered or policy == SORT_POLICY_IGNORE:
+        return
+    msg = f'排序字段{",".join(fields)}没有可用的索引'
+    if policy == SORT_POLICY_REJECT:
+        raise _error(msg)
+    current_app.logger.warning(msg)
+
+
+# 分页游标最大长度
+CURSOR_LENGTH_LIMIT = 1024
+
+
+def _cursor_default(value: t.Any) -> str:
+    if isinstance(value, date):
+        return value.isoformat()
+    # Decimal, ObjectId等
+    return str(value)
+
+
+def encode_cursor(values: t.Sequence[t.Any]) -> str:
+    """
+    将排序字段值编码为游标.
+    Args:
+        values: 最后一条记录的排序字段值(含主键), 不能为None
+
+    Raises:
+        RequestError: 排序字段值为None
+
+    """
+    if any(value is None for value in values):
+        raise _error('游标分页的排序字段不能为空值')
+    data = json.dumps(list(values),
+                      separators=(',', ':'),
+                      default=_cursor_default)
+    return b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, size: int) -> t.List[t.Any]:
+    """
+    解析游标.
+    Args:
+        cursor: `encode_cursor`生成的游标
+        size: 排序字段个数(含主键)
+
+    Raises:
+        RequestError: 游标不合法或与排序字段不匹配
+
+    """
+    if len(cursor) > CURSOR_LENGTH_LIMIT:
+        raise _error(f'分页游标长度超出上限{CURSOR_LENGTH_LIMIT}')
+    try:
+        values = json.loads(b64decode(cursor))
+    except (ValueError, TypeError):
+        raise _error('分页游标格式不正确')
+    if not isinstance(values, list) or len(values) != size:
+        raise _error('分页游标与排序条件不匹配')
+    for value in values:
+        if value is None:
+            raise _error('分页游标格式不正确')
+        _check_scalar('cursor', value)
+    return values
@@ -0,0 +1,139 @@
+""" 集群内部服务间认证模块.
+受信任来源的服务间调用可通过请求头携带HMAC签名的紧凑身份信息代替jwe token,
+省去token解密及jws校验的开销.
+
+请求头格式: base64url(json({"iat":签发时间戳,"u":紧凑格式用户信息})).base64url(签名)
+"""
+import hmac
+import ipaddress
+import json
+import time
+import typing as t
+
+from flask_jwt_extended.exceptions import JWTDecodeError
+from jwt import ExpiredSignatureError
+
+from lesoon_common.dataclass.user import COMPACT_KEYS
+from lesoon_common.dataclass.user import COMPACT_USER_CLAIM
+from lesoon_common.dataclass.user import TokenUser
+from lesoon_common.exceptions import ConfigError
+from lesoon_common.utils.cache import LRUCache
+from lesoon_common.utils.crypto import b64decode
+from lesoon_common.utils.crypto import b64encode
+
+# 内部认证的jwt_location
+INTERNAL_LOCATION = 'internal'
+
+
+class InternalAuth:
+    """
+    服务间内部认证.
+
+    Attributes:
+        header: 携带身份信息的请求头
+        sources: 受信任来源网段, 仅接受来自这些地址的内部认证请求头
+        ttl: 签名有效期(秒)
+
+    """
+
+    def __init__(self,
+                 secret: t.Union[str, bytes],
+                 header: str = 'X-Internal-Auth',
+                 sources: t.Iterable[str] = (),
+                 ttl: int = 60):
+        if not secret:
+            raise ConfigError('开启内部认证须配置JWT_INTERNAL_AUTH_SECRET')
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.header = header
+        # 直接从wsgi environ读取请求头, 省去构造Headers对象
+        self.environ_key = 'HTTP_' + header.upper().replace('-', '_')
+        self.sources = [
+            ipaddress.ip_network(source, strict=False) for source in sources
+        ]
+        self.ttl = ttl
+        # remote_addr: 是否受信任
+        self._trusted = LRUCache(maxsize=1024)
+
+    @classmethod
+    def from_config(cls, config: t.Mapping) -> 'InternalAuth':
+        return cls(secret=config['JWT_INTERNAL_AUTH_SECRET'],
+                   header=config['JWT_INTERNAL_AUTH_HEADER'],
+                   sources=config['JWT_INTERNAL_AUTH_SOURCES'],
+                   ttl=config['JWT_INTERNAL_AUTH_TTL'])
+
+    def is_trusted(self, remote_addr: t.Optional[str]) -> bool:
+        if not remote_addr:
+            return False
+        trusted = self._trusted.get(remote_addr)
+        if trusted is None:
+            try:
+                address = ipaddress.ip_address(remote_addr)
+            except ValueError:
+                trusted = False
+            else:
+                trusted = any(address in source for source in self.sources)
+            self._trusted.set(remote_addr, trusted)
+        return trusted
+
+    def sign(self,
+             user: t.Optional[TokenUser] = None,
+             issued_at: t.Optional[int] = None) -> str:
+        """
+        生成内部认证请求头的值.
+        Args:
+            user: 调用方用户, 为空时使用`TokenUser.new()`
+            issued_at: 签发时间戳, 默认为当前时间
+
+        """
+        user = user or TokenUser.new()
+        payload = {
+            'iat': int(time.time()) if issued_at is None else issued_at,
+            COMPACT_USER_CLAIM: TokenUser.dump_compact(user)
+        }
+        encoded = b64encode(
+            json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        return b'.'.join((encoded, b64encode(self._digest(encoded)))).decode()
+
+    def verify(self, value: str) -> t.Tuple[dict, dict]:
+        """
+        校验内部认证请求头, 返回与jwt一致的(jwt_header, jwt_data).
+        Raises:
+            JWTDecodeError: 格式或签名错误
+            ExpiredSignatureError: 签名已过期
+
+        """
+        try:
+            encoded, signature = value.encode('ascii').split(b'.')
+            valid = hmac.compare_digest(self._digest(encoded),
+                                        b64decode(signature))
+        except (ValueError, TypeError, UnicodeError):
+            valid = False
+        if not valid:
+            raise JWTDecodeError('内部认证签名校验失败')
+
+        payload = json.loads(b64decode(encoded))
+        iat = payload['iat']
+        user_info = payload[COMPACT_USER_CLAIM]
+        jwt_header = {'alg': 'HS256', 'typ': INTERNAL_LOCATION}
+        jwt_data = {
+            'iat': iat,
+            'exp': iat + self.ttl,
+            # 签名唯一, 作为jti用于current_user缓存
+            'jti': signature.decode(),
+            'type': 'access',
+            'fresh': False,
+            'sub': str(user_info.get(COMPACT_KEYS['user_id'], -1)),
+            COMPACT_USER_CLAIM: user_info,
+        }
+        now = time.time()
+        if iat > now + self.ttl:
+            raise JWTDecodeError('内部认证签发时间无效')
+        if jwt_data['exp'] <= now:
+            error = ExpiredSignatureError('Signature has expired')
+            error.jwt_header = jwt_header
+            error.jwt_data = jwt_data
+            raise error
+        return jwt_header, jwt_data
+
+    def _digest(self, encoded: bytes) -> bytes:
+        return hmac.digest(self.secret, encoded, 'sha256')
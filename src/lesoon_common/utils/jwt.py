@@ -1,17 +1,27 @@
 """ jwt工具类.
 重写flask_jwt_extended部分模块以支持定制化操作
 """
+import copy
+import dataclasses
 import os
+import threading
+import time
 import typing as t
 import uuid
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
+from functools import lru_cache
+from functools import partial
 from functools import wraps
 
 from flask import _app_ctx_stack
 from flask import _request_ctx_stack
 from flask import current_app
+from flask import has_app_context
 from flask import request
 from flask_jwt_extended.config import _Config
 from flask_jwt_extended.exceptions import NoAuthorizationError
@@ -21,6 +31,7 @@ from flask_jwt_extended.internal_utils import has_user_lookup
 from flask_jwt_extended.internal_utils import user_lookup
 from flask_jwt_extended.internal_utils import verify_token_not_blocklisted
 from flask_jwt_extended.internal_utils import verify_token_type
+from flask_jwt_extended.tokens import _decode_jwt
 from flask_jwt_extended.utils import decode_token
 from flask_jwt_extended.utils import get_jwt
 from flask_jwt_extended.utils import get_unverified_jwt_headers
@@ -29,10 +40,13 @@ from flask_jwt_extended.view_decorators import _decode_jwt_from_headers
 from flask_jwt_extended.view_decorators import _decode_jwt_from_json
 from flask_jwt_extended.view_decorators import _decode_jwt_from_query_string
 from flask_jwt_extended.view_decorators import _verify_token_is_fresh
-from jose import jwe
-from jose import jwt
 from werkzeug.utils import import_string
 
+from lesoon_common.utils.cache import LRUCache
+from lesoon_common.utils.internal_auth import INTERNAL_LOCATION
+from lesoon_common.utils.internal_auth import InternalAuth
+from lesoon_common.utils.keyring import Keyring
+
 if t.TYPE_CHECKING:
     from lesoon_common.dataclass.user import TokenUser
 
@@ -41,7 +55,16 @@ config = _Config()
 
 
 def get_token():
-    token = getattr(_request_ctx_stack.top, 'token', None)
+    """
+    当前请求的token, 可作为Authorization转发给其他服务.
+    内部认证请求的签名请求头不能转发且有效期很短, 首次获取时按当前用户签发(复用)jwe token,
+    见`token_provider`.
+    """
+    ctx = _request_ctx_stack.top
+    token = getattr(ctx, 'token', None)
+    if token is None and getattr(ctx, 'jwt_location',
+                                 None) == INTERNAL_LOCATION:
+        token = ctx.token = token_provider.get_token(get_current_user())
     if token is None:
         raise RuntimeError(
             'You must call `@jwt_required()` or `verify_jwt_in_request()` '
@@ -49,31 +72,152 @@ def get_token():
     return token
 
 
-def create_token(user: t.Optional['TokenUser'] = None):
-    """生成系统间调用token."""
+@lru_cache(maxsize=None)
+def _load_keyring(config_path: str) -> Keyring:
+    return Keyring.from_config(import_string(config_path))
+
+
+def get_keyring() -> Keyring:
+    """
+    获取jwt密钥环.
+    应用上下文中返回`LesoonJwt.init_app`时创建的密钥环,
+    否则根据`LesoonFlask.config_path`配置创建(仅创建一次).
+    """
+    if has_app_context() and 'jwt_keyring' in current_app.extensions:
+        return current_app.extensions['jwt_keyring']
+    from lesoon_common.base import LesoonFlask
+    return _load_keyring(LesoonFlask.config_path)
+
+
+@lru_cache(maxsize=None)
+def _load_config(config_path: str) -> t.Any:
+    return import_string(config_path)
+
+
+def _mint_token(user: t.Optional['TokenUser'] = None) -> t.Tuple[str, float]:
+    """签发token, 返回(token, 过期时间戳)."""
     from lesoon_common.dataclass.user import TokenUser
     from lesoon_common.base import LesoonFlask
 
-    config = import_string(LesoonFlask.config_path)
+    config = _load_config(LesoonFlask.config_path)
 
-    secret_key = config.JWT_SECRET_KEY
+    keyring = get_keyring()
     expires_delta = config.JWT_ACCESS_TOKEN_EXPIRES
+    if not isinstance(expires_delta, timedelta):
+        expires_delta = timedelta(seconds=expires_delta)
 
     user: TokenUser = user or TokenUser.new()
 
     now = datetime.now(timezone.utc)
+    expires = now + expires_delta
 
     token_data = {
         'iat': now,
-        'exp': now + timedelta(seconds=expires_delta),
+        'exp': expires,
         'jti': str(uuid.uuid4()),
-        'userInfo': TokenUser.dump(user),
         'type': 'access',
         'sub': str(user.id),
     }
-    return jwe.encrypt(jwt.encode(token_data, secret_key),
-                       key=secret_key,
-                       cty='JWT').decode()
+    token_data.update(
+        TokenUser.to_claims(user,
+                            compact=getattr(config, 'JWT_COMPACT_CLAIMS',
+                                            False)))
+    token = keyring.encrypt(keyring.sign(token_data))
+    return token, expires.timestamp()
+
+
+def create_token(user: t.Optional['TokenUser'] = None):
+    """生成系统间调用token, 每次调用都会重新签发."""
+    return _mint_token(user)[0]
+
+
+@lru_cache(maxsize=None)
+def _load_internal_auth(config_path: str) -> InternalAuth:
+    config = import_string(config_path)
+    return InternalAuth(secret=getattr(config, 'JWT_INTERNAL_AUTH_SECRET',
+                                       None),
+                        header=getattr(config, 'JWT_INTERNAL_AUTH_HEADER',
+                                       'X-Internal-Auth'),
+                        ttl=getattr(config, 'JWT_INTERNAL_AUTH_TTL', 60))
+
+
+def create_internal_auth(
+        user: t.Optional['TokenUser'] = None) -> t.Dict[str, str]:
+    """
+    生成服务间内部认证请求头, 仅被调用方开启内部认证且调用方为受信任来源时有效.
+    Returns:
+        {请求头: 签名后的身份信息}
+
+    """
+    if has_app_context() and current_app.extensions.get('jwt_internal_auth'):
+        internal_auth = current_app.extensions['jwt_internal_auth']
+    else:
+        from lesoon_common.base import LesoonFlask
+        internal_auth = _load_internal_auth(LesoonFlask.config_path)
+    return {internal_auth.header: internal_auth.sign(user)}
+
+
+class TokenProvider:
+    """
+    系统间调用token提供者.
+    按用户身份缓存已签发的token, 在token过期前`refresh_ahead`秒重新签发,
+    适用于批量任务等需要频繁调用其他服务的场景.
+
+    Attributes:
+        refresh_ahead: 提前刷新时间(秒), 超过token有效期一半时按一半计算
+        minted: 签发token次数
+        reused: 复用token次数
+
+    """
+
+    def __init__(self, refresh_ahead: int = 300, maxsize: int = 1024):
+        self.refresh_ahead = refresh_ahead
+        self.minted = 0
+        self.reused = 0
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _identity(user: t.Optional['TokenUser']) -> t.Optional[tuple]:
+        if user is None:
+            return None
+        return tuple(
+            getattr(user, f.name, None) for f in dataclasses.fields(user))
+
+    def get_token(self, user: t.Optional['TokenUser'] = None) -> str:
+        """
+        获取token, 相同身份的用户复用同一token.
+        Args:
+            user: token用户, 为空时使用`TokenUser.new()`
+
+        """
+        identity = self._identity(user)
+        with self._lock:
+            token = self._cache.get(identity)
+            if token is not None:
+                self.reused += 1
+                return token
+
+            now = time.time()
+            token, expires = _mint_token(user)
+            refresh_ahead = min(self.refresh_ahead, (expires - now) / 2)
+            self._cache.set(identity, token, expires=expires - refresh_ahead)
+            self.minted += 1
+            return token
+
+    def stats(self) -> t.Dict[str, int]:
+        return {
+            'minted': self.minted,
+            'reused': self.reused,
+            'size': len(self._cache)
+        }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+token_provider = TokenProvider()
 
 
 def get_current_user() -> 'TokenUser':
@@ -102,15 +246,44 @@ def set_current_user(user: 'TokenUser'):
     _app_ctx_stack.top.jwt_user = user
 
 
+def revoke_token(jwt_data: t.Optional[dict] = None):
+    """
+    吊销token, 需开启JWT_REVOCATION_ENABLE.
+    Args:
+        jwt_data: 已解析的token, 默认为当前请求的token
+
+    """
+    revocation = current_app.extensions.get('jwt_revocation')
+    if revocation is None:
+        raise RuntimeError('未开启token吊销(JWT_REVOCATION_ENABLE)')
+    jwt_data = jwt_data or get_jwt()
+    revocation.revoke(jwt_data['jti'], expires=jwt_data.get('exp'))
+
+
 def _load_user(jwt_header, jwt_data):
+    """
+    加载当前用户.
+    同一token(jti)的user_lookup结果缓存至token过期, 每个请求得到缓存对象的副本,
+    请求内对用户的修改(如跨公司调用时修改company_id)不影响其他请求.
+    """
     if not has_user_lookup():
         return None
 
+    user_cache = current_app.extensions.get('jwt_user_cache')
+    jti = jwt_data.get('jti')
+    if user_cache is not None and jti:
+        user = user_cache.get(jti)
+        if user is not None:
+            return copy.copy(user)
+
     identity = jwt_data[config.identity_claim_key]
     user = user_lookup(jwt_header, jwt_data)
     if user is None:
         error_msg = f'user_lookup returned None for {identity}'
         raise UserLookupError(error_msg, jwt_header, jwt_data)
+
+    if user_cache is not None and jti:
+        user_cache.set(jti, copy.copy(user), expires=jwt_data.get('exp'))
     return user
 
 
@@ -161,7 +334,9 @@ def verify_jwt_in_request(optional=False,
     _request_ctx_stack.top.jwt_header = jwt_header
     _request_ctx_stack.top.jwt = jwt_data
     _request_ctx_stack.top.jwt_location = jwt_location
-    _request_ctx_stack.top.token = orignal_token
+    # 内部认证请求头不能转发, token在首次调用get_token时签发
+    _request_ctx_stack.top.token = (None if jwt_location == INTERNAL_LOCATION
+                                    else orignal_token)
 
     return jwt_header, jwt_data
 
@@ -207,7 +382,84 @@ def jwt_required(optional=False, fresh=False, refresh=False, locations=None):
     return wrapper
 
 
+def _copy_json(value: t.Any) -> t.Any:
+    """复制json结构(dict/list嵌套)的数据, 比copy.deepcopy快."""
+    if isinstance(value, dict):
+        return {k: _copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(v) for v in value]
+    return value
+
+
+def _decode_token(orignal_token: str,
+                  csrf_token: t.Optional[str] = None) -> t.Tuple[dict, dict]:
+    """
+    解密并校验token.
+    校验通过的结果按原始token缓存至token过期(exp),
+    命中缓存时跳过jwe解密以及签名校验, 黑名单及自定义校验仍由调用方每次执行.
+    缓存的claims与headers为多个请求共享, 每次返回其副本.
+
+    Args:
+        orignal_token: 请求中携带的原始token
+        csrf_token: csrf校验值
+
+    Returns:
+        (decoded_token, jwt_header)
+
+    """
+    token_cache = current_app.extensions.get('jwt_token_cache')
+    cache_key = (orignal_token, csrf_token)
+    if token_cache is not None:
+        cached = token_cache.get(cache_key)
+        if cached is not None:
+            return _copy_json(cached[0]), _copy_json(cached[1])
+
+    encoded_token = get_keyring().decrypt(orignal_token)
+    decoded_token = decode_token(encoded_token, csrf_token)
+    jwt_header = get_unverified_jwt_headers(encoded_token)
+
+    if token_cache is not None:
+        token_cache.set(cache_key,
+                        (_copy_json(decoded_token), _copy_json(jwt_header)),
+                        expires=decoded_token.get('exp'))
+    return decoded_token, jwt_header
+
+
+def _decode_internal_auth() -> t.Optional[t.Tuple[str, dict, dict]]:
+    """
+    读取内部认证请求头, 未开启内部认证, 请求头不存在或来源不受信任时返回None.
+    """
+    internal_auth = current_app.extensions.get('jwt_internal_auth')
+    if internal_auth is None:
+        return None
+    environ = request.environ
+    value = environ.get(internal_auth.environ_key)
+    if not value or not internal_auth.is_trusted(environ.get('REMOTE_ADDR')):
+        return None
+    jwt_header, decoded_token = internal_auth.verify(value)
+    return value, decoded_token, jwt_header
+
+
 def _decode_jwt_from_request(locations, fresh, refresh=False):
+    internal = None if refresh else _decode_internal_auth()
+    if internal is not None:
+        orignal_token, decoded_token, jwt_header = internal
+        jwt_location = INTERNAL_LOCATION
+    else:
+        orignal_token, decoded_token, jwt_header, jwt_location = \
+            _decode_jwt_from_locations(locations, refresh)
+
+    # Additional verifications provided by this extension
+    verify_token_type(decoded_token, refresh)
+    if fresh:
+        _verify_token_is_fresh(jwt_header, decoded_token)
+    verify_token_not_blocklisted(jwt_header, decoded_token)
+    custom_verification_for_token(jwt_header, decoded_token)
+
+    return orignal_token, decoded_token, jwt_header, jwt_location
+
+
+def _decode_jwt_from_locations(locations, refresh=False):
     # Figure out what locations to look for the JWT in this request
     if isinstance(locations, str):
         locations = [locations]
@@ -243,10 +495,8 @@ def _decode_jwt_from_request(locations, fresh, refresh=False):
     for location, get_encoded_token_function in get_encoded_token_functions:
         try:
             orignal_token, csrf_token = get_encoded_token_function()
-            encoded_token = jwe.decrypt(orignal_token, config.decode_key)
-            decoded_token = decode_token(encoded_token, csrf_token)
+            decoded_token, jwt_header = _decode_token(orignal_token, csrf_token)
             jwt_location = location
-            jwt_header = get_unverified_jwt_headers(encoded_token)
             break
         except NoAuthorizationError as e:
             errors.append(str(e))
@@ -264,11 +514,134 @@ def _decode_jwt_from_request(locations, fresh, refresh=False):
         else:
             raise NoAuthorizationError(errors[0])
 
-    # Additional verifications provided by this extension
-    verify_token_type(decoded_token, refresh)
-    if fresh:
-        _verify_token_is_fresh(jwt_header, decoded_token)
-    verify_token_not_blocklisted(jwt_header, decoded_token)
-    custom_verification_for_token(jwt_header, decoded_token)
-
     return orignal_token, decoded_token, jwt_header, jwt_location
+
+
+class VerifiedToken(t.NamedTuple):
+    """批量校验结果, 校验失败时claims/header为空, error为异常对象."""
+    token: str
+    claims: t.Optional[dict] = None
+    header: t.Optional[dict] = None
+    error: t.Optional[Exception] = None
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None
+
+
+_executors: t.Dict[t.Tuple[str, int], Executor] = dict()
+_executors_lock = threading.Lock()
+
+
+def _get_executor(kind: str, max_workers: int) -> Executor:
+    """获取(复用)批量校验的线程池/进程池."""
+    with _executors_lock:
+        executor = _executors.get((kind, max_workers))
+        if executor is None:
+            if kind == 'thread':
+                executor = ThreadPoolExecutor(max_workers=max_workers)
+            elif kind == 'process':
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+            else:
+                raise RuntimeError(f'不支持的执行器类型:{kind}')
+            _executors[(kind, max_workers)] = executor
+        return executor
+
+
+def _verify_token(token: str, keyring: Keyring, decode_key: t.Any,
+                  options: dict) -> tuple:
+    """
+    解密并校验token, 不依赖flask上下文, 可在子进程中执行.
+    Returns:
+        (decoded_token, jwt_header, error)
+
+    """
+    try:
+        encoded_token = keyring.decrypt(token)
+        jwt_header = get_unverified_jwt_headers(encoded_token)
+        secret = decode_key or keyring.get(jwt_header.get('kid')).secret
+        decoded_token = _decode_jwt(encoded_token=encoded_token,
+                                    secret=secret,
+                                    csrf_value=None,
+                                    allow_expired=False,
+                                    **options)
+        return decoded_token, jwt_header, None
+    except Exception as e:
+        return None, None, e
+
+
+def verify_tokens(tokens: t.Sequence[str],
+                  refresh: bool = False,
+                  max_workers: t.Optional[int] = None,
+                  executor: t.Optional[str] = None) -> t.List[VerifiedToken]:
+    """
+    批量校验token, 无需请求上下文(需要应用上下文).
+    jwe解密及签名校验可分发至线程池/进程池执行,
+    token类型, 黑名单以及自定义校验在当前进程中执行.
+
+    Args:
+        tokens: 原始token列表
+        refresh: 是否要求为refresh token
+        max_workers: 并发数, 默认为配置`JWT_BATCH_WORKERS`, 0表示在当前线程中执行
+        executor: 执行器类型 thread/process, 默认为配置`JWT_BATCH_EXECUTOR`
+
+    Returns:
+        与tokens顺序一致的校验结果列表
+
+    """
+    app_config = current_app.config
+    if max_workers is None:
+        max_workers = app_config['JWT_BATCH_WORKERS']
+    token_cache = current_app.extensions.get('jwt_token_cache')
+
+    results: t.List[tuple] = [()] * len(tokens)
+    pending = []
+    for i, token in enumerate(tokens):
+        cached = None
+        if token_cache is not None:
+            cached = token_cache.get((token, None))
+        if cached is not None:
+            results[i] = (*cached, None)
+        else:
+            pending.append(i)
+
+    if pending:
+        verify = partial(
+            _verify_token,
+            keyring=get_keyring(),
+            decode_key=config.decode_key if config.is_asymmetric else None,
+            options={
+                'algorithms': config.decode_algorithms,
+                'audience': config.decode_audience,
+                'identity_claim_key': config.identity_claim_key,
+                'issuer': config.decode_issuer,
+                'leeway': config.leeway,
+                'verify_aud': config.decode_audience is not None,
+            })
+        pending_tokens = [tokens[i] for i in pending]
+        if (max_workers and
+                len(pending_tokens) >= app_config['JWT_BATCH_THRESHOLD']):
+            pool = _get_executor(executor or app_config['JWT_BATCH_EXECUTOR'],
+                                 max_workers)
+            chunksize = max(1, len(pending_tokens) // (max_workers * 4))
+            decoded = pool.map(verify, pending_tokens, chunksize=chunksize)
+        else:
+            decoded = map(verify, pending_tokens)
+
+        for i, (decoded_token, jwt_header, error) in zip(pending, decoded):
+            results[i] = (decoded_token, jwt_header, error)
+            if error is None and token_cache is not None:
+                token_cache.set((tokens[i], None), (decoded_token, jwt_header),
+                                expires=decoded_token.get('exp'))
+
+    verified = []
+    for token, (decoded_token, jwt_header, error) in zip(tokens, results):
+        if error is None:
+            try:
+                verify_token_type(decoded_token, refresh)
+                verify_token_not_blocklisted(jwt_header, decoded_token)
+                custom_verification_for_token(jwt_header, decoded_token)
+            except Exception as e:
+                decoded_token, jwt_header, error = None, None, e
+        verified.append(VerifiedToken(token, decoded_token, jwt_header, error))
+    return verified
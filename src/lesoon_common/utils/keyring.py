@@ -0,0 +1,131 @@
+""" jwt密钥环模块.
+支持通过kid(key id)轮换密钥: 新签发的token使用当前密钥并在header中携带kid,
+解密时根据kid直接定位密钥, 无需逐个密钥尝试解密.
+"""
+import hashlib
+import json
+import typing as t
+
+from jose.exceptions import JWEError
+
+from lesoon_common.utils.crypto import CryptoBackend
+from lesoon_common.utils.crypto import get_backend
+from lesoon_common.utils.safe import base64url_decode
+
+
+class JwtKey:
+    """
+    已预处理的密钥.
+
+    Attributes:
+        kid: 密钥id
+        secret: 原始密钥, 用于jws签名/校验
+        key_bytes: 字节形式的密钥
+        prepared: 加解密后端预处理后的密钥, 用于jwe加解密
+    """
+    __slots__ = ('kid', 'secret', 'key_bytes', 'prepared')
+
+    def __init__(self,
+                 secret: t.Union[str, bytes],
+                 kid: t.Optional[str] = None):
+        self.secret = secret
+        self.key_bytes = secret.encode() if isinstance(secret, str) else secret
+        self.kid = kid or self.derive_kid(self.key_bytes)
+        self.prepared: t.Any = self.key_bytes
+
+    @staticmethod
+    def derive_kid(key_bytes: bytes) -> str:
+        """未指定kid时根据密钥摘要生成."""
+        return hashlib.sha256(key_bytes).hexdigest()[:8]
+
+    def __repr__(self):
+        return f'<JwtKey kid={self.kid}>'
+
+
+class Keyring:
+    """
+    jwt密钥环.
+
+    Attributes:
+        current: 当前签发token使用的密钥
+        keys: 所有可用于解密的密钥, {kid: JwtKey}
+        backend: 加解密后端, 见`lesoon_common.utils.crypto`
+    """
+
+    def __init__(self,
+                 secret: t.Union[str, bytes, None],
+                 kid: t.Optional[str] = None,
+                 secret_keys: t.Union[t.Mapping[str, str], t.Iterable[str],
+                                      None] = None,
+                 backend: t.Union[str, CryptoBackend, None] = None):
+        self.backend = get_backend(backend)
+        self.keys: t.Dict[str, JwtKey] = dict()
+        self.current: t.Optional[JwtKey] = None
+        if isinstance(secret_keys, t.Mapping):
+            for _kid, _secret in secret_keys.items():
+                self.add(JwtKey(_secret, kid=_kid))
+        else:
+            for _secret in secret_keys or ():
+                self.add(JwtKey(_secret))
+        if secret:
+            self.current = self.add(JwtKey(secret, kid=kid))
+
+    @classmethod
+    def from_config(cls, config: t.Any) -> 'Keyring':
+        """
+        根据配置创建密钥环.
+        Args:
+            config: 应用配置, 支持`flask.Config`或配置对象
+
+        """
+        if isinstance(config, t.Mapping):
+            get = config.get
+        else:
+            get = lambda key: getattr(config, key, None)  # noqa:E731
+        return cls(secret=get('JWT_SECRET_KEY'),
+                   kid=get('JWT_SECRET_KEY_ID'),
+                   secret_keys=get('JWT_SECRET_KEYS'),
+                   backend=get('JWT_CRYPTO_BACKEND'))
+
+    def add(self, key: JwtKey) -> JwtKey:
+        key.prepared = self.backend.prepare_key(key.key_bytes)
+        self.keys[key.kid] = key
+        return key
+
+    def get(self, kid: t.Optional[str] = None) -> JwtKey:
+        """
+        根据kid获取密钥, kid为空时(旧token)返回当前密钥.
+        """
+        key = self.keys.get(kid) if kid else self.current  # type:ignore
+        if key is None:
+            raise JWEError(f'未知的密钥id:{kid}')
+        return key
+
+    @staticmethod
+    def get_kid(token: t.Union[str, bytes]) -> t.Optional[str]:
+        """读取jwe/jws header中的kid."""
+        if isinstance(token, bytes):
+            token = token.decode()
+        try:
+            header = json.loads(base64url_decode(token.split('.', 1)[0]))
+        except (ValueError, TypeError) as e:
+            raise JWEError(f'token header解析异常:{e}')
+        return header.get('kid') if isinstance(header, dict) else None
+
+    def encrypt(self, payload: t.Union[str, bytes]) -> str:
+        """使用当前密钥加密."""
+        key = self.get()
+        return self.backend.encrypt(payload, key.prepared, kid=key.kid)
+
+    def decrypt(self, token: t.Union[str, bytes]) -> bytes:
+        """根据token header中的kid选择密钥解密."""
+        key = self.get(self.get_kid(token))
+        return self.backend.decrypt(token, key.prepared)
+
+    def sign(self, claims: dict, algorithm: str = 'HS256') -> str:
+        """使用当前密钥签名, header中携带kid."""
+        key = self.get()
+        return self.backend.sign(claims,
+                                 key.secret,
+                                 algorithm=algorithm,
+                                 headers={'kid': key.kid})
@@ -3,7 +3,7 @@ import typing as t
 from sqlalchemy.engine.default import DefaultExecutionContext
 from sqlalchemy.engine.row import Row
 
-from lesoon_common.utils.base import AttributeDict
+from lesoon_common.utils.base import RowView
 
 
 def get_distribute_id() -> int:
@@ -20,5 +20,13 @@ def get_current_id(context: DefaultExecutionContext) -> int:
     return context.get_current_parameters()['id']
 
 
-def row_to_dict(rows: t.List[Row]) -> t.List[AttributeDict]:
-    return [AttributeDict(row._mapping) for row in rows]
+def row_to_dict(rows: t.Iterable[Row]) -> t.List[RowView]:
+    """
+    将同一查询结果的Row转换为RowView, 所有行共享第一行生成的键名索引.
+    RowView只读, 需要修改时使用`RowView.to_dict`.
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    if not rows:
+        return []
+    index = RowView.build_index(rows[0]._fields)
+    return [RowView(index, tuple(row)) for row in rows]
@@ -1,8 +1,8 @@
-import json
 import typing as t
 from urllib import parse
 
 from lesoon_common.exceptions import ParseError
+from lesoon_common.utils import codec
 
 
 def convert_dict(param: t.Optional[str] = None,
@@ -11,12 +11,12 @@ def convert_dict(param: t.Optional[str] = None,
         try:
             # 特殊字符转义处理
             param = parse.unquote_plus(param)
-            _param = json.loads(param)
+            _param = codec.loads(param)
             if not isinstance(_param, dict):
                 return {}
             else:
                 return _param
-        except (json.JSONDecodeError, TypeError, Exception):
+        except (ValueError, TypeError, Exception):
             if silent:
                 return param
             raise ParseError(f'参数无法序列化 {param}')
@@ -0,0 +1,276 @@
+""" token吊销模块.
+本地维护已吊销jti的布隆过滤器并定期从存储刷新, 请求校验时只有布隆过滤器命中的jti
+才查询权威存储, 未吊销的token(绝大多数请求)无需访问外部存储.
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import typing as t
+
+from werkzeug.utils import import_string
+
+
+class BloomFilter:
+    """
+    布隆过滤器.
+
+    Attributes:
+        capacity: 预计元素数量
+        error_rate: 元素数量未超过capacity时的期望误判率
+        num_bits: 位数组长度
+        num_hashes: 哈希函数个数
+        count: 已加入的元素数量
+
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError('capacity须大于0, error_rate须在(0,1)之间')
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(
+            8, int(-capacity * math.log(error_rate) / (math.log(2)**2)))
+        self.num_hashes = max(
+            1, int(round(self.num_bits / capacity * math.log(2))))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        for index in self._indexes(item):
+            if not bits[index >> 3] & (1 << (index & 7)):
+                return False
+        return True
+
+    def add(self, item: str):
+        bits = self._bits
+        for index in self._indexes(item):
+            bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def update(self, items: t.Iterable[str]):
+        for item in items:
+            self.add(item)
+
+    def estimated_error_rate(self) -> float:
+        """根据当前元素数量估算的误判率."""
+        return (1 - math.exp(
+            -self.num_hashes * self.count / self.num_bits))**self.num_hashes
+
+    def _indexes(self, item: str) -> t.Iterator[int]:
+        # 双重哈希: h1 + i * h2
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+
+class RevocationStore:
+    """
+    已吊销token的权威存储接口.
+    实现类需支持多进程共享(如数据库,redis), 内置实现仅用于测试及单机部署.
+    """
+
+    def revoke(self, jti: str, expires: t.Optional[float] = None):
+        """
+        吊销token.
+        Args:
+            jti: token唯一标识
+            expires: token过期时间戳(秒), 过期后可从存储中清除
+
+        """
+        raise NotImplementedError()
+
+    def is_revoked(self, jti: str) -> bool:
+        raise NotImplementedError()
+
+    def revoked(self) -> t.Iterable[str]:
+        """所有未过期的已吊销jti, 用于重建布隆过滤器."""
+        raise NotImplementedError()
+
+
+class MemoryRevocationStore(RevocationStore):
+    """进程内存储."""
+
+    def __init__(self):
+        # jti: expires
+        self._data: t.Dict[str, t.Optional[float]] = dict()
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires=None):
+        with self._lock:
+            self._data[jti] = expires
+
+    def is_revoked(self, jti):
+        if jti not in self._data:
+            return False
+        expires = self._data.get(jti)
+        return expires is None or expires > time.time()
+
+    def revoked(self):
+        now = time.time()
+        with self._lock:
+            return [
+                jti for jti, expires in self._data.items()
+                if expires is None or expires > now
+            ]
+
+
+class FileRevocationStore(MemoryRevocationStore):
+    """
+    文件存储, 每行一条json记录{"jti":..,"exp":..}.
+    文件修改后重新加载, 可供同一主机上的多个进程共享.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._mtime: t.Optional[float] = None
+
+    def revoke(self, jti, expires=None):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'jti': jti, 'exp': expires}) + '\n')
+            self._data[jti] = expires
+
+    def is_revoked(self, jti):
+        self._reload()
+        return super().is_revoked(jti)
+
+    def revoked(self):
+        self._reload()
+        return super().revoked()
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        data = dict()
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                data[record['jti']] = record.get('exp')
+        with self._lock:
+            self._data = data
+            self._mtime = mtime
+
+
+class TokenRevocation:
+    """
+    token吊销校验.
+    布隆过滤器每隔refresh_interval秒在校验时从存储重建一次,
+    其他进程的吊销操作最迟在下次重建后生效; 本进程的吊销立即生效.
+
+    Attributes:
+        store: 权威存储
+        refresh_interval: 布隆过滤器重建间隔(秒)
+        checks: 校验次数
+        store_checks: 布隆过滤器命中后查询存储的次数
+        false_positives: 布隆过滤器命中但存储中不存在的次数
+
+    """
+
+    def __init__(self,
+                 store: t.Optional[RevocationStore] = None,
+                 capacity: int = 100000,
+                 error_rate: float = 0.001,
+                 refresh_interval: float = 60):
+        self.store = store or MemoryRevocationStore()
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.checks = 0
+        self.store_checks = 0
+        self.false_positives = 0
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: t.Mapping) -> 'TokenRevocation':
+        store = config['JWT_REVOCATION_STORE']
+        if store == 'memory':
+            store = MemoryRevocationStore()
+        elif store == 'file':
+            store = FileRevocationStore(config['JWT_REVOCATION_FILE'])
+        elif isinstance(store, str):
+            store = import_string(store)()
+        return cls(store=store,
+                   capacity=config['JWT_REVOCATION_CAPACITY'],
+                   error_rate=config['JWT_REVOCATION_ERROR_RATE'],
+                   refresh_interval=config['JWT_REVOCATION_REFRESH_INTERVAL'])
+
+    def refresh(self):
+        """从存储重建布隆过滤器, 元素超出预计数量时按实际数量扩容."""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        revoked = list(self.store.revoked())
+        bloom = BloomFilter(max(self.capacity,
+                                len(revoked) * 2), self.error_rate)
+        bloom.update(revoked)
+        self.bloom = bloom
+        self.refreshed_at = time.time()
+
+    def revoke(self, jti: str, expires: t.Optional[float] = None):
+        # 与重建互斥, 避免新增的jti丢失在被替换的旧过滤器中
+        with self._lock:
+            self.store.revoke(jti, expires)
+            self.bloom.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        self._refresh_if_due()
+        self.checks += 1
+        if jti not in self.bloom:
+            return False
+        self.store_checks += 1
+        if self.store.is_revoked(jti):
+            return True
+        self.false_positives += 1
+        return False
+
+    def stats(self) -> t.Dict[str, t.Any]:
+        """校验统计信息."""
+        negatives = self.checks - self.store_checks + self.false_positives
+        return {
+            'checks':
+                self.checks,
+            'store_checks':
+                self.store_checks,
+            'false_positives':
+                self.false_positives,
+            'false_positive_rate':
+                self.false_positives / negatives if negatives else 0.0,
+            'estimated_false_positive_rate':
+                self.bloom.estimated_error_rate(),
+            'size':
+                len(self.bloom),
+            'refreshed_at':
+                self.refreshed_at,
+        }
+
+    def _refresh_if_due(self):
+        if time.time() - self.refreshed_at < self.refresh_interval:
+            return
+        # 仅一个线程负责重建, 其他线程继续使用旧的过滤器
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if time.time() - self.refreshed_at >= self.refresh_interval:
+                self._refresh()
+        finally:
+            self._lock.release()
@@ -1,5 +1,9 @@
 """ 基础工具模块."""
 import re
+from functools import lru_cache
+
+# cached_camelcase缓存条目数
+CAMELCASE_CACHE_SIZE = 4096
 
 
 def camelcase(udl_str: str, upper: bool = False):
@@ -17,6 +21,12 @@ def camelcase(udl_str: str, upper: bool = False):
     return first_word + ''.join(i.title() for i in parts)
 
 
+@lru_cache(maxsize=CAMELCASE_CACHE_SIZE)
+def cached_camelcase(udl_str: str) -> str:
+    """有缓存的`camelcase`(小驼峰), 用于键名取值范围有限的场景."""
+    return camelcase(udl_str)
+
+
 def udlcase(hump_str: str):
     """
     驼峰转下划线格式
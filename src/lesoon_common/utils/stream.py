@@ -0,0 +1,228 @@
+""" 流式返回模块.
+不分页的大结果集逐批读取(服务端游标)并分批序列化, 返回体增量写出,
+内存占用取决于批大小而非结果集大小.
+"""
+import csv
+import io
+import typing as t
+import unicodedata
+from itertools import chain
+from itertools import islice
+from urllib.parse import quote
+
+from flask import current_app
+from flask import json
+from flask import Response as FlaskResponse
+from flask import stream_with_context
+
+from lesoon_common.code import ResponseCode
+from lesoon_common.response import Response
+
+# 默认批大小
+CHUNK_SIZE = 1000
+
+
+def chunked(iterable: t.Iterable[t.Any],
+            size: int = CHUNK_SIZE) -> t.Iterator[t.List[t.Any]]:
+    """将可迭代对象按size分批."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_chunks(query: t.Any,
+                chunk_size: int = CHUNK_SIZE) -> t.Iterator[t.List[t.Any]]:
+    """
+    分批读取查询结果.
+    Args:
+        query: 查询对象, 提供`iter_chunks`方法时(如LesoonQuery)使用服务端游标读取,
+            否则视为普通可迭代对象
+        chunk_size: 批大小
+
+    """
+    if hasattr(query, 'iter_chunks'):
+        return query.iter_chunks(chunk_size)
+    return chunked(query, chunk_size)
+
+
+def iter_dump(query: t.Any,
+              schema: t.Any,
+              chunk_size: int = CHUNK_SIZE) -> t.Iterator[t.List[t.Any]]:
+    """分批读取并序列化查询结果."""
+    for chunk in iter_chunks(query, chunk_size):
+        yield schema.dump(chunk, many=True)
+
+
+def iter_envelope(query: t.Any,
+                  schema: t.Any,
+                  chunk_size: int = CHUNK_SIZE,
+                  **kwargs) -> t.Iterator[str]:
+    """
+    增量生成与`success_response`一致的返回体json.
+    结果写入rows, total为写出的记录数; 键顺序按JSON_SORT_KEYS配置,
+    没有记录时与`Response.to_dict`相同, 不写出rows及total.
+
+    Args:
+        query: 查询对象
+        schema: 序列化schema
+        chunk_size: 批大小
+        **kwargs: 返回体的额外键值对, 见`Response`
+
+    """
+    chunks = iter_dump(query, schema, chunk_size)
+    first = next(chunks, None)
+    if not first:
+        yield json.dumps(
+            Response(code=ResponseCode.Success, **kwargs).to_dict())
+        return
+
+    # 使用占位的rows/total确定各键在返回体中的位置
+    envelope = Response(code=ResponseCode.Success,
+                        **dict(kwargs, result=[None], total=1)).to_dict()
+    keys = sorted(envelope) if current_app.config['JSON_SORT_KEYS'] else list(
+        envelope)
+    total = 0
+    for index, key in enumerate(keys):
+        yield ('{' if index == 0 else ',') + json.dumps(key) + ':'
+        if key == 'rows':
+            yield '['
+            for rows in chain((first,), chunks):
+                if total:
+                    yield ','
+                yield json.dumps(rows)[1:-1]
+                total += len(rows)
+            yield ']'
+        elif key == 'total':
+            # total总在rows之后
+            yield str(total)
+        else:
+            yield json.dumps(envelope[key])
+    yield '}'
+
+
+def stream_response(query: t.Any,
+                    schema: t.Any,
+                    chunk_size: int = CHUNK_SIZE,
+                    **kwargs) -> FlaskResponse:
+    """
+    流式返回查询结果, 用于不分页的大结果集.
+    生成过程中保持请求上下文, 数据库会话在返回结束后才释放.
+
+    Args:
+        query: 查询对象, 如LesoonQuery
+        schema: 序列化schema
+        chunk_size: 批大小
+        **kwargs: 返回体的额外键值对
+
+    """
+    return FlaskResponse(stream_with_context(
+        iter_envelope(query, schema, chunk_size, **kwargs)),
+                         mimetype='application/json')
+
+
+# 导出格式
+EXPORT_NDJSON = 'ndjson'
+EXPORT_CSV = 'csv'
+EXPORT_MIMETYPES = {
+    EXPORT_NDJSON: 'application/x-ndjson',
+    EXPORT_CSV: 'text/csv',
+}
+
+
+def _json_encoder() -> t.Callable[[t.Any], str]:
+    """按应用json配置创建的编码函数, 逐条编码时复用同一个encoder."""
+    encoder = current_app.json_encoder(
+        ensure_ascii=current_app.config['JSON_AS_ASCII'],
+        sort_keys=current_app.config['JSON_SORT_KEYS'])
+    return encoder.encode
+
+
+def iter_ndjson(query: t.Any,
+                schema: t.Any,
+                chunk_size: int = CHUNK_SIZE) -> t.Iterator[str]:
+    """每行一条json记录, 键为schema的data_key(驼峰)."""
+    encode = _json_encoder()
+    for rows in iter_dump(query, schema, chunk_size):
+        yield ''.join(encode(row) + '\n' for row in rows)
+
+
+def _csv_value(value: t.Any) -> t.Any:
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def iter_csv(query: t.Any,
+             schema: t.Any,
+             chunk_size: int = CHUNK_SIZE,
+             bom: bool = True) -> t.Iterator[str]:
+    """
+    csv格式, 首行为schema的data_key(驼峰).
+    Args:
+        bom: 是否写出utf-8 BOM, 使Excel正确识别中文
+
+    """
+    columns = [
+        field.data_key or name for name, field in schema.dump_fields.items()
+    ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield ('\ufeff' if bom else '') + buffer.getvalue()
+    for rows in iter_dump(query, schema, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [_csv_value(row.get(column)) for column in columns] for row in rows)
+        yield buffer.getvalue()
+
+
+def _filename_options(filename: str) -> t.Dict[str, str]:
+    """
+    Content-Disposition的文件名参数.
+    非ascii文件名(如中文)使用RFC 5987的filename*, 并附带ascii的filename兼容旧客户端,
+    响应头只能包含latin-1字符.
+    """
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode(
+            'ascii', 'ignore').decode('ascii')
+        quoted = quote(filename, safe="!#$&+^`|~")
+        return {'filename': simple, 'filename*': f"UTF-8''{quoted}"}
+    return {'filename': filename}
+
+
+def export_response(query: t.Any,
+                    schema: t.Any,
+                    export_format: str = EXPORT_NDJSON,
+                    chunk_size: int = CHUNK_SIZE,
+                    filename: t.Optional[str] = None) -> FlaskResponse:
+    """
+    流式导出查询结果.
+    Args:
+        query: 查询对象, 如LesoonQuery, LesoonQuerySet
+        schema: 序列化schema
+        export_format: 导出格式 ndjson/csv
+        chunk_size: 批大小
+        filename: 下载文件名, 指定时以附件形式返回
+
+    """
+    if export_format == EXPORT_NDJSON:
+        body = iter_ndjson(query, schema, chunk_size)
+    elif export_format == EXPORT_CSV:
+        body = iter_csv(query, schema, chunk_size)
+    else:
+        raise ValueError(f'不支持的导出格式:{export_format}')
+
+    response = FlaskResponse(stream_with_context(body),
+                             mimetype=EXPORT_MIMETYPES[export_format])
+    if filename:
+        response.headers.set('Content-Disposition', 'attachment',
+                             **_filename_options(filename))
+    return response
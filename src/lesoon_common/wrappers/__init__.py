@@ -1,5 +1,7 @@
 from .alchemy import LesoonQuery
+from .alchemy import LesoonPagination
 from .flask import LesoonDebugTool
+from .flask import LesoonJsonDecoder
 from .flask import LesoonJsonEncoder
 from .flask import LesoonRequest
 from .flask import LesoonTestClient
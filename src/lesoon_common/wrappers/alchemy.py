@@ -1,15 +1,581 @@
 """ sqlalchemy自定义封装模块. """
+import hashlib
+import re
+import threading
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from datetime import datetime
+from functools import lru_cache
 
 from flask_sqlalchemy import BaseQuery
 from flask_sqlalchemy import Pagination
+from sqlalchemy import and_
+from sqlalchemy import bindparam
+from sqlalchemy import func
+from sqlalchemy import inspect
+from sqlalchemy import or_
+from sqlalchemy import true
+from sqlalchemy import types as sqltypes
+from sqlalchemy import UniqueConstraint
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import SingletonThreadPool
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement
 
 from lesoon_common.code import ResponseCode
 from lesoon_common.exceptions import RequestError
 from lesoon_common.globals import request
+from lesoon_common.utils import filter as where_filter
+from lesoon_common.utils import stream
+from lesoon_common.utils.cache import LRUCache
+from lesoon_common.utils.str import camelcase
+
+# 单个条件的参数绑定 [(参数名, 取值函数)], 取值函数入参为条件值
+_Binds = t.List[t.Tuple[str, t.Callable[[t.Any], t.Any]]]
+# 排序键 ((列属性, 是否倒序), ...), 含主键
+_SortKeys = t.Tuple[t.Tuple[t.Any, bool], ...]
+
+# 分页总计方式
+# 精确COUNT
+COUNT_EXACT = 'exact'
+# 精确COUNT并按(模型, 查询条件)缓存
+COUNT_CACHED = 'cached'
+# 根据执行计划估算, 结果标记为近似值
+COUNT_ESTIMATED = 'estimated'
+# 不计算总计, 多查询一条记录判断是否存在下一页
+COUNT_NONE = 'none'
+COUNT_STRATEGIES = (COUNT_EXACT, COUNT_CACHED, COUNT_ESTIMATED, COUNT_NONE)
+
+
+@lru_cache(maxsize=None)
+def _model_columns(model: t.Any) -> t.Dict[str, t.Any]:
+    """{驼峰/下划线字段名: 列属性}."""
+    columns = dict()
+    for prop in inspect(model).column_attrs:
+        column = getattr(model, prop.key)
+        columns[prop.key] = column
+        columns[camelcase(prop.key)] = column
+    return columns
+
+
+def _filter_columns(
+        model: t.Any,
+        schema: t.Any = None,
+        allowed: t.Optional[t.Collection[str]] = None) -> t.Dict[str, t.Any]:
+    """
+    {where字段名: 列属性}.
+    指定schema时使用schema字段的data_key, 否则使用列属性名及其驼峰形式;
+    指定allowed时只保留白名单内的字段名.
+    """
+    columns = _model_columns(model)
+    if schema is not None:
+        columns = {
+            field.data_key or name: columns[field.attribute or name]
+            for name, field in schema.fields.items()
+            if (field.attribute or name) in columns
+        }
+    if allowed is not None:
+        columns = {k: v for k, v in columns.items() if k in allowed}
+    return columns
+
+
+def _column_converter(column: t.Any) -> t.Callable[[t.Any], t.Any]:
+    """日期类型的列将字符串条件值转换为日期对象."""
+    column_type = column.type
+    if isinstance(column_type, sqltypes.DateTime):
+        parse: t.Callable[[str], t.Any] = datetime.fromisoformat
+    elif isinstance(column_type, sqltypes.Date):
+        parse = lambda value: datetime.fromisoformat(value).date()  # noqa:E731
+    else:
+        return lambda value: value
+
+    def convert(value):
+        if not isinstance(value, str):
+            return value
+        try:
+            return parse(value)
+        except ValueError:
+            raise RequestError(msg=f'过滤条件{column.key}的日期格式不正确:{value}')
+
+    return convert
+
+
+def _compile_condition(column: t.Any, condition: where_filter.Condition,
+                       name: str) -> t.Tuple[ClauseElement, _Binds]:
+    op = condition.op
+    convert = _column_converter(column)
+    if op == where_filter.OP_NULL:
+        clause = column.is_(None) if condition.shape else column.isnot(None)
+        return clause, []
+    if op in where_filter.MULTI_OPS:
+        param = bindparam(name, expanding=True)
+        clause = column.in_(param) if op == where_filter.OP_IN else \
+            column.not_in(param)
+        return clause, [(name, lambda v: [convert(i) for i in v])]
+    if op == where_filter.OP_LIKE:
+        clause = column.like(bindparam(name), escape='\\')
+        return clause, [(name, lambda v: where_filter.escape_like(v) + '%')]
+    if op == where_filter.OP_RANGE:
+        clauses, binds = [], []
+        has_start, has_end = condition.shape
+        if has_start:
+            clauses.append(column >= bindparam(f'{name}_start'))
+            binds.append((f'{name}_start', lambda v: convert(v[0])))
+        if has_end:
+            clauses.append(column <= bindparam(f'{name}_end'))
+            binds.append((f'{name}_end', lambda v: convert(v[1])))
+        return and_(true(), *clauses), binds
+
+    param = bindparam(name)
+    clause = {
+        where_filter.OP_EQ: column.__eq__,
+        where_filter.OP_NE: column.__ne__,
+        where_filter.OP_GT: column.__gt__,
+        where_filter.OP_GTE: column.__ge__,
+        where_filter.OP_LT: column.__lt__,
+        where_filter.OP_LTE: column.__le__,
+    }[op](param)
+    return clause, [(name, convert)]
+
+
+def compile_where(
+    model: t.Any,
+    conditions: t.Sequence[where_filter.Condition],
+    prefix: str = 'where_',
+    schema: t.Any = None,
+    allowed: t.Optional[t.Collection[str]] = None
+) -> t.Tuple[ClauseElement, t.List[_Binds]]:
+    """
+    将where条件编译为sql表达式, 条件值使用绑定参数, 相同结构的where可复用编译结果.
+    Args:
+        model: 条件字段所属的模型
+        conditions: 解析后的过滤条件
+        prefix: 绑定参数名前缀, 同一查询中多次添加where时须各不相同
+        schema: 用于映射字段名的schema实例, 只能过滤schema中的字段
+        allowed: 允许过滤的字段名白名单
+
+    Returns:
+        (sql表达式, 每个条件的参数绑定)
+
+    Raises:
+        RequestError: 字段不存在或不允许过滤
+
+    """
+    columns = _filter_columns(model, schema, allowed)
+    clauses, binds = [], []
+    for index, condition in enumerate(conditions):
+        column = columns.get(condition.field)
+        if column is None:
+            raise RequestError(msg=f'过滤条件字段不存在:{condition.field}')
+        clause, condition_binds = _compile_condition(column, condition,
+                                                     f'{prefix}{index}')
+        clauses.append(clause)
+        binds.append(condition_binds)
+    return and_(*clauses), binds
+
+
+@lru_cache(maxsize=None)
+def _model_indexes(model: t.Any) -> t.List[t.Tuple[t.Any, ...]]:
+    """
+    模型表上所有索引(含主键及唯一约束)的列.
+    二级索引隐含主键列(InnoDB), 因此按索引列+主键列计算.
+    """
+    table = inspect(model).local_table
+    primary_key = tuple(table.primary_key.columns)
+    indexes = [primary_key]
+    indexes.extend(
+        tuple(index.columns) + primary_key for index in table.indexes)
+    indexes.extend(
+        tuple(constraint.columns) + primary_key
+        for constraint in table.constraints
+        if isinstance(constraint, UniqueConstraint))
+    return indexes
+
+
+def compile_sort(
+        model: t.Any,
+        sort: t.Sequence[t.Tuple[str, bool]],
+        allowed: t.Optional[t.Collection[str]] = None,
+        keyset: bool = False
+) -> t.Tuple[t.List[ClauseElement], bool, _SortKeys]:
+    """
+    将排序条件编译为order_by表达式, 并追加主键以保证排序稳定.
+    Args:
+        model: 排序字段所属的模型
+        sort: 解析后的排序条件
+        allowed: 允许排序的字段白名单
+        keyset: 是否用于游标分页, 游标分页的排序字段不能为可空列
+
+    Returns:
+        (order_by表达式, 是否有可用的索引或均在白名单内, 排序键)
+
+    Raises:
+        RequestError: 排序字段不存在, 或游标分页使用了可空列
+
+    """
+    columns = _model_columns(model)
+    clauses, sort_columns, keys = [], [], []
+    for field, desc in sort:
+        attr = columns.get(field)
+        if attr is None:
+            raise RequestError(msg=f'排序字段不存在:{field}')
+        column = attr.property.columns[0]
+        if keyset and column.nullable:
+            # 空值无法与游标比较, 会被跳过
+            raise RequestError(msg=f'游标分页的排序字段不能为可空列:{field}')
+        clauses.append(attr.desc() if desc else attr.asc())
+        sort_columns.append(column)
+        keys.append((attr, desc))
+
+    mapper = inspect(model)
+    for pk in mapper.primary_key:
+        if pk not in sort_columns:
+            attr = getattr(model, mapper.get_property_by_column(pk).key)
+            clauses.append(attr)
+            keys.append((attr, False))
+
+    if allowed is not None:
+        covered = all(field in allowed for field, _ in sort)
+    else:
+        covered = where_filter.is_index_prefix(sort_columns,
+                                               _model_indexes(model))
+    return clauses, covered, tuple(keys)
+
+
+def _seek_clause(keys: _SortKeys, values: t.Sequence[t.Any]) -> ClauseElement:
+    """
+    游标分页条件: 排序键在游标之后的记录.
+    (a, b) > (va, vb) 展开为 a >= va and (a > va or (a = va and b > vb)),
+    兼容不同排序方向, 首个条件可直接使用索引范围扫描.
+    """
+    clauses = []
+    for i, (attr, desc) in enumerate(keys):
+        terms = [keys[j][0] == values[j] for j in range(i)]
+        terms.append(attr < values[i] if desc else attr > values[i])
+        clauses.append(and_(*terms))
+    if len(keys) == 1:
+        return clauses[0]
+    first, desc = keys[0]
+    return and_(first <= values[0] if desc else first >= values[0],
+                or_(*clauses))
+
+
+def _row_entity(row: t.Any, model: t.Any) -> t.Any:
+    """查询多个实体时取结果行中的模型实例."""
+    if isinstance(row, Row) and row and isinstance(row[0], model):
+        return row[0]
+    return row
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN语句."""
+    inherit_cache = False
+
+    def __init__(self, statement: t.Any):
+        self.statement = statement
+
+
+@compiles(_Explain)
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN ' + compiler.process(element.statement, **kw)
+
+
+_PG_ROWS = re.compile(r'rows=(\d+)')
+
+
+def estimate_count(query: BaseQuery) -> t.Optional[int]:
+    """
+    根据执行计划估算查询结果行数.
+    Returns:
+        估算行数, 数据库不支持(如sqlite)时返回None
+
+    """
+    model = query.column_descriptions[0]['entity']
+    bind_arguments = {'mapper': inspect(model)}
+    dialect = query.session.get_bind(**bind_arguments).dialect.name
+    if dialect not in ('mysql', 'postgresql'):
+        return None
+
+    result = query.session.execute(_Explain(query.order_by(None).statement),
+                                   bind_arguments=bind_arguments)
+    if dialect == 'mysql':
+        plan = result.mappings().first()
+        if not plan or plan['rows'] is None:
+            return None
+        filtered = plan.get('filtered')
+        filtered = 100 if filtered is None else float(filtered)
+        return int(plan['rows'] * filtered / 100)
+
+    match = _PG_ROWS.search(result.scalar() or '')
+    return int(match.group(1)) if match else None
+
+
+def _count_cache_key(query: BaseQuery, mapper: t.Any) -> str:
+    """按(表名, 查询语句及参数摘要)生成总计缓存键."""
+    dialect = query.session.get_bind(mapper=mapper).dialect
+    compiled = query.statement.compile(dialect=dialect)
+    digest = hashlib.sha1(
+        f'{compiled}{sorted(compiled.params.items())!r}'.encode(
+            'utf-8')).hexdigest()
+    return f'lesoon:count:{mapper.local_table.name}:{digest}'
+
+
+def build_count_query(query: BaseQuery) -> BaseQuery:
+    """
+    生成总计查询, query.scalar()即为总计.
+    去掉排序及预加载, 按查询结构选择代价最小的形式:
+        单实体且无join/group by/distinct/limit: SELECT count(*) FROM .. WHERE ..
+        含join(可能使行数翻倍): SELECT count(*) FROM (SELECT 主键 FROM .. JOIN ..)
+        其他: SELECT count(*) FROM (原查询), 同`Query.count`
+    """
+    query = query.order_by(None).enable_eagerloads(False)
+    descriptions = query.column_descriptions
+    entity = descriptions[0]['entity'] if len(descriptions) == 1 else None
+    mapper = inspect(entity) if entity is not None else None
+    if (mapper is None or descriptions[0]['expr'] is not entity or
+            mapper.inherits is not None or mapper.polymorphic_on is not None or
+            query._statement is not None or query._from_obj or
+            query._group_by_clauses or query._having_criteria or
+            query._distinct or query._limit_clause is not None or
+            query._offset_clause is not None):
+        return query.session.query(func.count()).select_from(query.subquery())
+
+    if query._setup_joins or query._legacy_setup_joins:
+        primary_key = [
+            getattr(entity,
+                    mapper.get_property_by_column(pk).key)
+            for pk in mapper.primary_key
+        ]
+        return query.session.query(func.count()).select_from(
+            query.with_entities(*primary_key).subquery())
+
+    if not query._where_criteria:
+        return query.session.query(func.count()).select_from(entity)
+    if any(mapper.local_table in criteria._from_objects
+           for criteria in query._where_criteria):
+        return query.with_entities(func.count())
+    # 过滤条件未引用实体的表, 通过主键指定FROM; 主键非空, 结果与count(*)一致
+    return query.with_entities(func.count(mapper.primary_key[0]))
+
+
+_count_executor: t.Optional[ThreadPoolExecutor] = None
+_count_executor_lock = threading.Lock()
+
+
+def _get_count_executor(workers: int) -> ThreadPoolExecutor:
+    global _count_executor
+    if _count_executor is None:
+        with _count_executor_lock:
+            if _count_executor is None:
+                _count_executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='lesoon-count')
+    return _count_executor
+
+
+def _execute_count(engine: t.Any, statement: t.Any) -> int:
+    with engine.connect() as connection:
+        return connection.execute(statement).scalar()
+
+
+class LesoonPagination(Pagination):
+    """
+    分页结果.
+    游标分页及has_next模式不执行COUNT, total及pages为None.
+
+    Attributes:
+        approximate: total是否为估算值
+        next_cursor: 下一页游标, 仅游标分页且存在下一页时有值
+    """
+
+    def __init__(self,
+                 query: t.Any,
+                 page: int,
+                 per_page: int,
+                 total: t.Optional[int],
+                 items: t.List[t.Any],
+                 has_next: t.Optional[bool] = None,
+                 next_cursor: t.Optional[str] = None,
+                 approximate: bool = False):
+        super().__init__(query, page, per_page, total, items)
+        self._has_next = has_next
+        self.next_cursor = next_cursor
+        self.approximate = approximate
+
+    @property
+    def meta(self) -> t.Dict[str, t.Any]:
+        """
+        分页信息, 用作返回体的额外键值对.
+        示例: success_response(result=rows, **pagination.meta)
+        """
+        return {
+            'total': self.total,
+            'approximate': self.approximate,
+            'hasNext': self.has_next,
+            'nextCursor': self.next_cursor
+        }
+
+    @property
+    def pages(self) -> t.Optional[int]:  # type:ignore
+        if self.total is None:
+            return None
+        return super().pages
+
+    @property
+    def has_next(self) -> bool:  # type:ignore
+        if self._has_next is not None:
+            return self._has_next
+        return super().has_next
 
 
 class LesoonQuery(BaseQuery):
+    # 单个where最多字段数
+    WHERE_FIELDS_LIMIT = where_filter.WHERE_FIELDS_LIMIT
+    # $in/$nin最多值个数
+    WHERE_VALUES_LIMIT = where_filter.WHERE_VALUES_LIMIT
+    # where编译结果缓存 {(model, where结构, 参数名前缀, schema字段映射, 白名单): 编译结果}
+    where_plans = LRUCache(maxsize=1024)
+    # 单个sort最多字段数
+    SORT_FIELDS_LIMIT = where_filter.SORT_FIELDS_LIMIT
+    # 无索引排序的处理方式 ignore/warn/reject
+    SORT_INDEX_POLICY = where_filter.SORT_POLICY_WARN
+    # sort编译结果缓存 {(model, sort, 白名单, 是否游标分页): 编译结果}
+    sort_plans = LRUCache(maxsize=1024)
+    # 默认分页总计方式 exact/cached/estimated/none
+    COUNT_STRATEGY = COUNT_EXACT
+    # cached方式的总计缓存时间(秒)
+    COUNT_CACHE_TIMEOUT = 60
+    # estimated方式估算行数低于此值时改为精确COUNT
+    COUNT_ESTIMATE_THRESHOLD = 10000
+    # 是否默认在另一个连接上与分页查询并行执行COUNT
+    PARALLEL_COUNT = False
+    # 并行COUNT的线程数
+    COUNT_WORKERS = 4
+    # 流式返回的批大小
+    STREAM_CHUNK_SIZE = stream.CHUNK_SIZE
+
+    def apply_where(self,
+                    where: t.Optional[t.Mapping[str, t.Any]] = None,
+                    model: t.Any = None,
+                    schema: t.Any = None,
+                    allowed: t.Optional[t.Collection[str]] = None):
+        """
+        根据where过滤条件添加查询条件, 格式见`lesoon_common.utils.filter`.
+        默认可以过滤模型的全部列, 条件来自请求参数时应通过schema或allowed限制字段,
+        避免未对外暴露的列(如密码, 令牌)被逐步探测.
+
+        Args:
+            where: 过滤条件, 默认为request.where
+            model: 条件字段所属的模型, 默认为查询的第一个实体
+            schema: 用于映射字段名的`SqlaAutoSchema`实例, 只能过滤schema中的字段(data_key)
+            allowed: 允许过滤的字段名白名单, 字段名须与where中的键一致
+
+        """
+        if where is None:
+            where = request.where  # type:ignore
+        conditions = where_filter.parse_where(
+            where,
+            max_fields=self.__class__.WHERE_FIELDS_LIMIT,
+            max_values=self.__class__.WHERE_VALUES_LIMIT)
+        if not conditions:
+            return self
+
+        model = model or self.column_descriptions[0]['entity']
+        # 按已有条件数区分参数名, 多次apply_where(如join后过滤另一模型)的参数互不覆盖
+        criteria = len(self._where_criteria)
+        prefix = f'where{criteria}_' if criteria else 'where_'
+        allowed = frozenset(allowed) if allowed is not None else None
+        plan_key = (model, where_filter.where_shape(conditions), prefix,
+                    where_filter.schema_key(schema), allowed)
+        plan = self.where_plans.get(plan_key)
+        if plan is None:
+            plan = compile_where(model, conditions, prefix, schema, allowed)
+            self.where_plans.set(plan_key, plan)
+
+        clause, binds = plan
+        params = dict()
+        for condition, condition_binds in zip(conditions, binds):
+            for name, get_value in condition_binds:
+                params[name] = get_value(condition.value)
+        return self.filter(clause.params(params))
+
+    def apply_sort(self,
+                   sort: t.Union[str, t.Mapping[str, t.Any], None] = None,
+                   model: t.Any = None,
+                   allowed: t.Optional[t.Collection[str]] = None,
+                   policy: t.Optional[str] = None):
+        """
+        根据sort排序条件添加排序, 并以主键作为最后的排序字段.
+
+        Args:
+            sort: 排序条件, 默认为request.sort, 格式见`lesoon_common.utils.filter.parse_sort`
+            model: 排序字段所属的模型, 默认为查询的第一个实体
+            allowed: 允许排序的字段白名单, 默认允许能使用索引的排序
+            policy: 排序无法使用索引(或不在白名单内)时的处理方式, 默认为SORT_INDEX_POLICY
+
+        """
+        if sort is None:
+            sort = request.sort  # type:ignore
+        parsed = where_filter.parse_sort(
+            sort, max_fields=self.__class__.SORT_FIELDS_LIMIT)
+        if not parsed:
+            return self
+
+        model = model or self.column_descriptions[0]['entity']
+        clauses, _ = self._sort_plan(model, parsed, allowed, policy)
+        return self.order_by(*clauses)
+
+    def _sort_plan(
+            self,
+            model: t.Any,
+            parsed: t.Tuple[t.Tuple[str, bool], ...],
+            allowed: t.Optional[t.Collection[str]],
+            policy: t.Optional[str],
+            keyset: bool = False) -> t.Tuple[t.List[ClauseElement], _SortKeys]:
+        """获取(缓存的)排序编译结果并按策略检查索引."""
+        allowed = frozenset(allowed) if allowed is not None else None
+        plan_key = (model, parsed, allowed, keyset)
+        plan = self.sort_plans.get(plan_key)
+        if plan is None:
+            plan = compile_sort(model, parsed, allowed, keyset)
+            self.sort_plans.set(plan_key, plan)
+
+        clauses, covered, keys = plan
+        policy = policy or self.__class__.SORT_INDEX_POLICY
+        where_filter.check_sort_index([field for field, _ in parsed], covered,
+                                      policy)
+        return clauses, keys
+
+    def iter_chunks(
+            self,
+            chunk_size: int = stream.CHUNK_SIZE) -> t.Iterator[t.List[t.Any]]:
+        """
+        使用服务端游标分批读取查询结果, 不一次性加载全部记录.
+        批内对象仍受会话的identity map管理, 未修改的对象在批处理完后即可回收.
+        """
+        results = self.execution_options(
+            stream_results=True).yield_per(chunk_size)
+        return stream.chunked(results, chunk_size)
+
+    def stream(self,
+               schema: t.Any,
+               chunk_size: t.Optional[int] = None,
+               **kwargs) -> t.Any:
+        """
+        流式返回全部查询结果, 用于不分页(ifPage=0)的大结果集,
+        见`lesoon_common.utils.stream.stream_response`.
+
+        Args:
+            schema: 序列化schema
+            chunk_size: 批大小, 默认为STREAM_CHUNK_SIZE
+            **kwargs: 返回体的额外键值对
+
+        """
+        return stream.stream_response(
+            self, schema, chunk_size or self.__class__.STREAM_CHUNK_SIZE,
+            **kwargs)
 
     def first_or_404(self, description: t.Optional[str] = None):
         rv = self.first()
@@ -23,26 +589,153 @@ class LesoonQuery(BaseQuery):
         page: t.Optional[int] = None,
         per_page: t.Optional[int] = None,
         count_query: t.Optional[BaseQuery] = None,
-    ):
+        has_next: bool = False,
+        keyset: bool = False,
+        cursor: t.Optional[str] = None,
+        sort: t.Union[str, t.Mapping[str, t.Any], None] = None,
+        count_strategy: t.Optional[str] = None,
+        parallel_count: t.Optional[bool] = None,
+    ) -> LesoonPagination:
         """
         执行分页查询.
 
         Args:
-            if_page: 是否分页
+            if_page: 是否分页, 不分页时加载全部记录, 大结果集应使用`stream`
             page: 页码
             per_page: 页大小
             count_query: 总计查询对象,默认为self.count()
+            has_next: 多查询一条记录判断是否存在下一页, 代替COUNT总计,
+                等同于count_strategy='none'
+            keyset: 是否使用游标分页, 按排序键(含主键)定位下一页, 不使用offset;
+                排序由sort指定且只能使用非空列, 查询本身不应再调用order_by,
+                总是使用has_next模式
+            cursor: 游标分页的上一页游标, 默认为request.cursor, 为空时查询第一页
+            sort: 游标分页的排序条件, 默认为request.sort
+            count_strategy: 总计方式, 默认为COUNT_STRATEGY
+                exact: 精确COUNT
+                cached: 精确COUNT, 结果按(模型, 查询条件)缓存COUNT_CACHE_TIMEOUT秒
+                estimated: 根据执行计划估算, 结果标记为近似值,
+                    数据库不支持或估算值较小时改为精确COUNT
+                none: 同has_next
+            parallel_count: 是否从连接池另取连接与分页查询并行执行COUNT,
+                默认为PARALLEL_COUNT; 并行COUNT看不到当前会话未提交的修改,
+                sqlite内存库等单连接的连接池始终串行执行
 
         """
         page = page or request.page  # type:ignore
         per_page = per_page or request.page_size  # type:ignore
         if_page = if_page or request.if_page  # type:ignore
-        count_query = count_query or self
+        strategy = COUNT_NONE if has_next else (count_strategy or
+                                                self.__class__.COUNT_STRATEGY)
+        if strategy not in COUNT_STRATEGIES:
+            raise ValueError(f'不支持的分页总计方式:{strategy}')
+
+        if if_page and keyset:
+            return self._paginate_keyset(page, per_page, cursor, sort)
 
+        if if_page and strategy == COUNT_NONE:
+            items = self.limit(per_page + 1).offset((page - 1) * per_page).all()
+            return LesoonPagination(self,
+                                    page,
+                                    per_page,
+                                    None,
+                                    items[:per_page],
+                                    has_next=len(items) > per_page)
+
+        if parallel_count is None:
+            parallel_count = self.__class__.PARALLEL_COUNT
+        get_total = self._start_count(count_query or self, strategy,
+                                      parallel_count)
         if if_page:
             items = self.limit(per_page).offset((page - 1) * per_page).all()
         else:
             items = self.all()
-        total = count_query.order_by(None).count()
+        total, approximate = get_total()
+
+        return LesoonPagination(self,
+                                page,
+                                per_page,
+                                total,
+                                items,
+                                approximate=approximate)
+
+    def _start_count(self, count_query: BaseQuery, strategy: str,
+                     parallel: bool) -> t.Callable[[], t.Tuple[int, bool]]:
+        """
+        按总计方式开始计算总计.
+        Returns:
+            获取(总计, 是否为估算值)的函数, 并行时等待COUNT完成
+
+        """
+        if strategy == COUNT_ESTIMATED:
+            estimated = estimate_count(count_query)
+            threshold = self.__class__.COUNT_ESTIMATE_THRESHOLD
+            if estimated is not None and estimated >= threshold:
+                return lambda: (estimated, True)
+
+        query = build_count_query(count_query)
+        mapper = inspect(count_query.column_descriptions[0]['entity'])
+        cache_key = None
+        if strategy == COUNT_CACHED:
+            from lesoon_common.extensions import ca
+            cache_key = _count_cache_key(query, mapper)
+            cached = ca.get(cache_key)
+            if cached is not None:
+                return lambda: (cached, False)
+
+        get_count: t.Callable[[], int] = query.scalar
+        if parallel:
+            engine = query.session.get_bind(mapper=mapper)
+            if not isinstance(engine.pool, (StaticPool, SingletonThreadPool)):
+                future = _get_count_executor(
+                    self.__class__.COUNT_WORKERS).submit(
+                        _execute_count, engine, query.statement)
+                get_count = future.result
+
+        def get_total() -> t.Tuple[int, bool]:
+            total = get_count()
+            if cache_key is not None:
+                from lesoon_common.extensions import ca
+                ca.set(cache_key,
+                       total,
+                       timeout=self.__class__.COUNT_CACHE_TIMEOUT)
+            return total, False
+
+        return get_total
+
+    def _paginate_keyset(self, page: int, per_page: int,
+                         cursor: t.Optional[str],
+                         sort: t.Union[str, t.Mapping[str, t.Any], None]):
+        if cursor is None:
+            cursor = request.cursor  # type:ignore
+        if sort is None:
+            sort = request.sort  # type:ignore
+        parsed = where_filter.parse_sort(
+            sort, max_fields=self.__class__.SORT_FIELDS_LIMIT)
+        model = self.column_descriptions[0]['entity']
+        clauses, keys = self._sort_plan(model, parsed, None, None, keyset=True)
+
+        query = self.order_by(None).order_by(*clauses)
+        if cursor:
+            values = where_filter.decode_cursor(cursor, len(keys))
+            values = [
+                _column_converter(attr)(value)
+                for (attr, _), value in zip(keys, values)
+            ]
+            query = query.filter(_seek_clause(keys, values))
 
-        return Pagination(self, page, per_page, total, items)
+        items = query.limit(per_page + 1).all()
+        has_next = len(items) > per_page
+        items = items[:per_page]
+        next_cursor = None
+        if has_next:
+            last = _row_entity(items[-1], model)
+            next_cursor = where_filter.encode_cursor(
+                [getattr(last, attr.key) for attr, _ in keys])
+        return LesoonPagination(query,
+                                page,
+                                per_page,
+                                None,
+                                items,
+                                has_next=has_next,
+                                next_cursor=next_cursor)
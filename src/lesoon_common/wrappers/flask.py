@@ -6,6 +6,7 @@ from flask import Flask
 from flask.ctx import has_request_context
 from flask.globals import request
 from flask.helpers import make_response
+from flask.json import JSONDecoder
 from flask.json import JSONEncoder
 from flask.templating import render_template_string
 from flask.testing import FlaskClient
@@ -15,10 +16,13 @@ from flask_debugtoolbar import DebugToolbarExtension
 from werkzeug.utils import cached_property
 
 from lesoon_common.code.response import ResponseCode
+from lesoon_common.exceptions import RequestError
 from lesoon_common.exceptions import ServiceError
 from lesoon_common.globals import current_user
 from lesoon_common.response import Response
 from lesoon_common.response import ResponseBase
+from lesoon_common.utils import codec
+from lesoon_common.utils.base import RowView
 from lesoon_common.utils.jwt import get_token
 from lesoon_common.utils.req import convert_dict
 from lesoon_common.utils.str import camelcase
@@ -29,10 +33,16 @@ ResponseType = t.Union[ResponseBase, FlaskResponse]
 class LesoonRequest(Request):
     PAGE_SIZE_DEFAULT = 25
     PAGE_SIZE_LIMIT = 100000
+    # where参数最大长度
+    WHERE_LENGTH_LIMIT = 8192
 
     @cached_property
     def where(self) -> t.Dict[str, t.Any]:
-        where = convert_dict(param=self.args.get('where'))
+        param = self.args.get('where')
+        if param and len(param) > self.__class__.WHERE_LENGTH_LIMIT:
+            raise RequestError(
+                msg=f'where参数长度超出上限{self.__class__.WHERE_LENGTH_LIMIT}')
+        where = convert_dict(param=param)
         return where  # type:ignore
 
     @cached_property
@@ -71,6 +81,11 @@ class LesoonRequest(Request):
             page_size = self.__class__.PAGE_SIZE_LIMIT
         return page_size  # type:ignore
 
+    @cached_property
+    def cursor(self) -> t.Optional[str]:
+        """游标分页的上一页游标."""
+        return self.args.get('cursor') or None
+
     @cached_property
     def user(self):
         return current_user
@@ -194,8 +209,33 @@ class LesoonDebugTool(DebugToolbarExtension):
 
 
 class LesoonJsonEncoder(JSONEncoder):
+    """
+    json编码器.
+    安装orjson时非缩进输出使用`lesoon_common.utils.codec`编码,
+    输出为utf-8紧凑格式(不转义非ascii字符), 其余情况使用标准库.
+    """
 
     def default(self, o: t.Any) -> t.Any:
         if isinstance(o, Decimal):
             return str(o)
+        if isinstance(o, RowView):
+            return o.to_dict()
         return super().default(o)
+
+    def encode(self, o: t.Any) -> str:
+        if self.indent is not None or codec.BACKEND != 'orjson':
+            return super().encode(o)
+        return codec.dumps(o, default=self.default, sort_keys=self.sort_keys)
+
+
+class LesoonJsonDecoder(JSONDecoder):
+    """
+    json解码器.
+    未指定object_hook等自定义解析时使用`lesoon_common.utils.codec`解码.
+    """
+
+    def decode(self, s: str, *args, **kwargs) -> t.Any:
+        if (self.object_hook is None and self.object_pairs_hook is None and
+                self.parse_float is float and self.parse_int is int):
+            return codec.loads(s)
+        return super().decode(s, *args, **kwargs)
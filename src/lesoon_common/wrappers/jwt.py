@@ -4,10 +4,14 @@ import typing as t
 from flask import Flask
 from flask.globals import current_app
 from flask_jwt_extended import JWTManager
-from jose import jwe
+from flask_jwt_extended.config import config
 
 from lesoon_common.code.response import ResponseCode
 from lesoon_common.response import error_response
+from lesoon_common.utils.cache import LRUCache
+from lesoon_common.utils.internal_auth import InternalAuth
+from lesoon_common.utils.keyring import Keyring
+from lesoon_common.utils.revocation import TokenRevocation
 
 
 class LesoonJwt(JWTManager):
@@ -19,7 +23,7 @@ class LesoonJwt(JWTManager):
         def user_lookup_callback(jwt_headers, jwt_data):
             from lesoon_common.dataclass.user import TokenUser
 
-            return TokenUser.load(jwt_data['userInfo'])
+            return TokenUser.from_claims(jwt_data)
 
         def invalid_token_callback(msg):
             return error_response(code=ResponseCode.TokenInValid, msg=msg)
@@ -27,13 +31,110 @@ class LesoonJwt(JWTManager):
         def expired_token_callback(jwt_headers, jwt_data):
             return error_response(code=ResponseCode.TokenExpired)
 
+        # 根据token header中的kid选择jws校验密钥, 以支持密钥轮换
+        def decode_key_callback(jwt_headers, jwt_data):
+            if config.is_asymmetric:
+                return config.decode_key
+            keyring = current_app.extensions['jwt_keyring']
+            return keyring.get(jwt_headers.get('kid')).secret
+
+        def encode_key_callback(identity):
+            if config.is_asymmetric:
+                return config.encode_key
+            return current_app.extensions['jwt_keyring'].get().secret
+
+        # 开启JWT_REVOCATION_ENABLE时校验token是否已吊销
+        def token_in_blocklist_callback(jwt_headers, jwt_data):
+            revocation = current_app.extensions.get('jwt_revocation')
+            if revocation is None or 'jti' not in jwt_data:
+                return False
+            return revocation.is_revoked(jwt_data['jti'])
+
         self._user_lookup_callback = user_lookup_callback
+        self._token_in_blocklist_callback = token_in_blocklist_callback
+        self._decode_key_callback = decode_key_callback
+        self._encode_key_callback = encode_key_callback
         self._invalid_token_callback = invalid_token_callback
         self._expired_token_callback = expired_token_callback
 
+    def init_app(self, app: Flask):
+        super().init_app(app)
+        app.extensions['jwt_keyring'] = Keyring.from_config(app.config)
+        app.extensions['jwt_token_cache'] = self._create_token_cache(app)
+        app.extensions['jwt_user_cache'] = self._create_user_cache(app)
+        app.extensions['jwt_revocation'] = self._create_revocation(app)
+        app.extensions['jwt_internal_auth'] = self._create_internal_auth(app)
+
+    @staticmethod
+    def _create_token_cache(app: Flask) -> t.Optional[LRUCache]:
+        """
+        创建已校验token缓存.
+        内存占用按原始token长度的两倍估算(原始token及解密后的claims).
+        """
+        if not app.config['JWT_TOKEN_CACHE_ENABLE']:
+            return None
+        return LRUCache(maxsize=app.config['JWT_TOKEN_CACHE_SIZE'],
+                        maxbytes=app.config['JWT_TOKEN_CACHE_MAXBYTES'],
+                        getsizeof=lambda key, value: len(key[0]) * 2)
+
+    @staticmethod
+    def _create_user_cache(app: Flask) -> t.Optional[LRUCache]:
+        """
+        创建current_user缓存.
+        以jti为键缓存user_lookup的结果, 自定义user_lookup_loader依赖外部数据时应关闭.
+        """
+        if not app.config['JWT_USER_CACHE_ENABLE']:
+            return None
+        return LRUCache(maxsize=app.config['JWT_USER_CACHE_SIZE'])
+
+    @staticmethod
+    def _create_revocation(app: Flask) -> t.Optional[TokenRevocation]:
+        if not app.config['JWT_REVOCATION_ENABLE']:
+            return None
+        return TokenRevocation.from_config(app.config)
+
+    @staticmethod
+    def _create_internal_auth(app: Flask) -> t.Optional[InternalAuth]:
+        if not app.config['JWT_INTERNAL_AUTH_ENABLE']:
+            return None
+        return InternalAuth.from_config(app.config)
+
     @staticmethod
     def _set_default_configuration_options(app: Flask):
         app.config.setdefault('JWT_ENABLE', False)
+        # 已校验token缓存
+        app.config.setdefault('JWT_TOKEN_CACHE_ENABLE', True)
+        app.config.setdefault('JWT_TOKEN_CACHE_SIZE', 10000)
+        app.config.setdefault('JWT_TOKEN_CACHE_MAXBYTES', 32 * 1024 * 1024)
+        # current_user缓存
+        app.config.setdefault('JWT_USER_CACHE_ENABLE', True)
+        app.config.setdefault('JWT_USER_CACHE_SIZE', 10000)
+        # 批量校验(verify_tokens)的并发数, 0表示不并发
+        app.config.setdefault('JWT_BATCH_WORKERS', 0)
+        # 批量校验的执行器类型 thread/process
+        app.config.setdefault('JWT_BATCH_EXECUTOR', 'thread')
+        # 待校验token数达到该值时才分发至执行器
+        app.config.setdefault('JWT_BATCH_THRESHOLD', 64)
+        # 签发token时使用紧凑格式的用户信息claims
+        app.config.setdefault('JWT_COMPACT_CLAIMS', False)
+        # token吊销
+        app.config.setdefault('JWT_REVOCATION_ENABLE', False)
+        # 吊销存储 memory/file或存储类导入路径
+        app.config.setdefault('JWT_REVOCATION_STORE', 'memory')
+        app.config.setdefault('JWT_REVOCATION_FILE', None)
+        # 布隆过滤器预计容量及误判率
+        app.config.setdefault('JWT_REVOCATION_CAPACITY', 100000)
+        app.config.setdefault('JWT_REVOCATION_ERROR_RATE', 0.001)
+        # 布隆过滤器重建间隔(秒)
+        app.config.setdefault('JWT_REVOCATION_REFRESH_INTERVAL', 60)
+        # 服务间内部认证, 受信任来源可使用HMAC签名的请求头代替token
+        app.config.setdefault('JWT_INTERNAL_AUTH_ENABLE', False)
+        app.config.setdefault('JWT_INTERNAL_AUTH_SECRET', None)
+        app.config.setdefault('JWT_INTERNAL_AUTH_HEADER', 'X-Internal-Auth')
+        # 受信任来源ip或网段, 如['10.0.0.0/8']
+        app.config.setdefault('JWT_INTERNAL_AUTH_SOURCES', [])
+        # 签名有效期(秒)
+        app.config.setdefault('JWT_INTERNAL_AUTH_TTL', 60)
         app.config.setdefault('JWT_ACCESS_TOKEN_EXPIRES',
                               datetime.timedelta(days=30))
         app.config.setdefault('JWT_ACCESS_COOKIE_NAME', 'token')
@@ -78,6 +179,12 @@ class LesoonJwt(JWTManager):
         app.config.setdefault('JWT_REFRESH_TOKEN_EXPIRES',
                               datetime.timedelta(days=30))
         app.config.setdefault('JWT_SECRET_KEY', None)
+        # 当前密钥id, 为空时根据密钥摘要生成
+        app.config.setdefault('JWT_SECRET_KEY_ID', None)
+        # 轮换下来仍可用于解密的密钥, {kid: secret}或[secret]
+        app.config.setdefault('JWT_SECRET_KEYS', None)
+        # token加解密后端 jose/cryptography或后端类导入路径
+        app.config.setdefault('JWT_CRYPTO_BACKEND', 'jose')
         app.config.setdefault('JWT_SESSION_COOKIE', True)
         app.config.setdefault('JWT_TOKEN_LOCATION',
                               ('headers', 'query_string', 'cookies'))
@@ -92,8 +199,11 @@ class LesoonJwt(JWTManager):
         expires_delta=None,
         headers=None,
     ):
+        keyring = current_app.extensions['jwt_keyring']
+        headers = dict(headers or {})
+        if not config.is_asymmetric:
+            headers.setdefault('kid', keyring.get().kid)
         jwt_token = super()._encode_jwt_from_config(identity, token_type,
                                                     claims, fresh,
                                                     expires_delta, headers)
-        secret = current_app.config.get('JWT_SECRET_KEY')
-        return jwe.encrypt(jwt_token, key=secret, cty='JWT').decode()
+        return keyring.encrypt(jwt_token)
@@ -1,21 +1,443 @@
 """ 第三方类库自定义拓展模块. """
+import re
 import typing as t
+from collections import defaultdict
+from functools import lru_cache
 
+from bson import DBRef
 from flask.globals import current_app
 from flask.globals import request
 from flask_mongoengine import BaseQuerySet
 from flask_mongoengine import Pagination
+from mongoengine.base import BaseDocument
+from mongoengine.base import BaseList
+from mongoengine.errors import ValidationError
+from mongoengine.fields import ListField
+from mongoengine.fields import ReferenceField
 from pymongo.monitoring import CommandListener
 
+from lesoon_common.exceptions import RequestError
 from lesoon_common.globals import request
+from lesoon_common.utils import filter as where_filter
+from lesoon_common.utils import stream
+from lesoon_common.utils.cache import LRUCache
+from lesoon_common.utils.str import camelcase
+from lesoon_common.wrappers.alchemy import LesoonPagination
+
+# 单个条件的编译结果 [(db字段名, mongo操作符, 取值函数)], 取值函数入参为条件值
+_Plan = t.List[t.Tuple[str, str, t.Callable[[t.Any], t.Any]]]
+# 排序键 ((文档字段, 是否倒序), ...), 含主键
+_SortKeys = t.Tuple[t.Tuple[t.Any, bool], ...]
+
+# {where操作符: mongoengine查询操作符}, 用于prepare_query_value
+_QUERY_OPS = {
+    where_filter.OP_EQ: None,
+    where_filter.OP_NE: 'ne',
+    where_filter.OP_GT: 'gt',
+    where_filter.OP_GTE: 'gte',
+    where_filter.OP_LT: 'lt',
+    where_filter.OP_LTE: 'lte',
+    where_filter.OP_IN: 'in',
+    where_filter.OP_NIN: 'nin',
+}
+
+
+def _document_fields(document: t.Any,
+                     schema: t.Any = None) -> t.Dict[str, t.Any]:
+    """
+    {where字段名: 文档字段}.
+    指定schema时使用schema字段的data_key, 否则使用文档属性名及其驼峰形式.
+    """
+    if schema is not None:
+        return {
+            field.data_key or name: document._fields[field.attribute or name]
+            for name, field in schema.fields.items()
+            if (field.attribute or name) in document._fields
+        }
+    fields = dict()
+    for name, field in document._fields.items():
+        fields[name] = field
+        fields[camelcase(name)] = field
+    return fields
+
+
+def _field_converter(field: t.Any, op: t.Optional[str]) -> t.Callable:
+    """
+    使用文档字段的prepare_query_value转换条件值, 如日期字符串,ObjectId.
+    值格式不正确时抛出RequestError.
+    """
+
+    def convert(value):
+        if value is None:
+            return None
+        try:
+            prepared = field.prepare_query_value(op, value)
+        except (ValueError, TypeError, ValidationError):
+            # 如IntField的int('abc'), ObjectIdField的非法id
+            prepared = None
+        if prepared is None:
+            raise RequestError(msg=f'过滤条件{field.name}的值格式不正确:{value}')
+        return prepared
+
+    return convert
+
+
+def _compile_condition(field: t.Any,
+                       condition: where_filter.Condition) -> _Plan:
+    db_field, op = field.db_field, condition.op
+    if op == where_filter.OP_NULL:
+        null_op = '$eq' if condition.shape else '$ne'
+        return [(db_field, null_op, lambda v: None)]
+    if op == where_filter.OP_LIKE:
+        # 锚定前缀的正则可以使用索引
+        return [(db_field, '$regex', lambda v: '^' + re.escape(v))]
+    if op == where_filter.OP_RANGE:
+        plan: _Plan = []
+        has_start, has_end = condition.shape
+        if has_start:
+            start = _field_converter(field, 'gte')
+            plan.append((db_field, '$gte', lambda v: start(v[0])))
+        if has_end:
+            end = _field_converter(field, 'lte')
+            plan.append((db_field, '$lte', lambda v: end(v[1])))
+        return plan
+
+    # 其余where操作符与mongo操作符同名
+    convert = _field_converter(field, _QUERY_OPS[op])
+    if op in where_filter.MULTI_OPS:
+        return [(db_field, op, lambda v: [convert(i) for i in v])]
+    return [(db_field, op, convert)]
+
+
+def compile_where(document: t.Any,
+                  conditions: t.Sequence[where_filter.Condition],
+                  schema: t.Any = None) -> t.List[_Plan]:
+    """将where条件编译为mongo查询的构造计划, 相同结构的where可复用."""
+    fields = _document_fields(document, schema)
+    plans = []
+    for condition in conditions:
+        field = fields.get(condition.field)
+        if field is None:
+            raise RequestError(msg=f'过滤条件字段不存在:{condition.field}')
+        plans.append(_compile_condition(field, condition))
+    return plans
+
+
+def build_query(conditions: t.Sequence[where_filter.Condition],
+                plans: t.Sequence[_Plan]) -> t.Dict[str, t.Any]:
+    """根据编译计划及条件值生成pymongo查询, 同一字段的重复操作符使用$and合并."""
+    query: t.Dict[str, t.Any] = dict()
+    and_query = []
+    for condition, plan in zip(conditions, plans):
+        for db_field, mongo_op, get_value in plan:
+            value = get_value(condition.value)
+            ops = query.setdefault(db_field, dict())
+            if mongo_op in ops:
+                and_query.append({db_field: {mongo_op: value}})
+            else:
+                ops[mongo_op] = value
+    if and_query:
+        query['$and'] = and_query
+    return query
+
+
+@lru_cache(maxsize=None)
+def _document_indexes(document: t.Any) -> t.List[t.Tuple[str, ...]]:
+    """文档集合上所有索引(含_id)的db字段名."""
+    indexes = [('_id',)]
+    for spec in document._meta.get('index_specs') or []:
+        indexes.append(tuple(db_field for db_field, _ in spec['fields']))
+    return indexes
+
+
+def compile_sort(document: t.Any,
+                 sort: t.Sequence[t.Tuple[str, bool]],
+                 schema: t.Any = None,
+                 allowed: t.Optional[t.Collection[str]] = None,
+                 keyset: bool = False) -> t.Tuple[t.List[str], bool, _SortKeys]:
+    """
+    将排序条件编译为order_by参数, 并追加主键以保证排序稳定.
+    Args:
+        document: 文档类
+        sort: 解析后的排序条件
+        schema: 用于映射字段名的schema实例
+        allowed: 允许排序的字段白名单
+        keyset: 是否用于游标分页, 游标分页的排序字段须为主键或必填字段
+
+    Returns:
+        (order_by参数, 是否有可用的索引或均在白名单内, 排序键)
+
+    Raises:
+        RequestError: 排序字段不存在, 或游标分页使用了非必填字段
+
+    """
+    fields = _document_fields(document, schema)
+    id_field = document._fields[document._meta['id_field']]
+    keys, db_fields, sort_keys = [], [], []
+    for field_name, desc in sort:
+        field = fields.get(field_name)
+        if field is None:
+            raise RequestError(msg=f'排序字段不存在:{field_name}')
+        if keyset and field is not id_field and not field.required:
+            # 缺失或为null的值无法与游标比较, 会被跳过
+            raise RequestError(msg=f'游标分页的排序字段须为必填字段:{field_name}')
+        keys.append(('-' if desc else '+') + field.name)
+        db_fields.append(field.db_field)
+        sort_keys.append((field, desc))
+
+    if id_field.db_field not in db_fields:
+        keys.append('+' + id_field.name)
+        sort_keys.append((id_field, False))
+
+    if allowed is not None:
+        covered = all(field_name in allowed for field_name, _ in sort)
+    else:
+        covered = where_filter.is_index_prefix(db_fields,
+                                               _document_indexes(document))
+    return keys, covered, tuple(sort_keys)
+
+
+def _seek_query(keys: _SortKeys,
+                values: t.Sequence[t.Any]) -> t.Dict[str, t.Any]:
+    """
+    游标分页条件: 排序键在游标之后的文档.
+    首个排序字段附加范围条件, 使查询可直接使用索引范围扫描.
+    """
+    clauses = []
+    for i, (field, desc) in enumerate(keys):
+        clause = {keys[j][0].db_field: values[j] for j in range(i)}
+        clause[field.db_field] = {'$lt' if desc else '$gt': values[i]}
+        clauses.append(clause)
+    if len(clauses) == 1:
+        return clauses[0]
+    first, desc = keys[0]
+    return {
+        first.db_field: {
+            '$lte' if desc else '$gte': values[0]
+        },
+        '$or': clauses
+    }
+
+
+def _reference_fields(
+    document: t.Any,
+    fields: t.Optional[t.Collection[str]] = None
+) -> t.List[t.Tuple[str, t.Any, bool]]:
+    """文档的引用字段 [(字段名, 被引用的文档类, 是否为列表)]."""
+    references = []
+    for name, field in document._fields.items():
+        if fields is not None and name not in fields:
+            continue
+        if isinstance(field, ReferenceField):
+            references.append((name, field.document_type, False))
+        elif isinstance(field, ListField) and isinstance(
+                field.field, ReferenceField):
+            references.append((name, field.field.document_type, True))
+    return references
+
+
+def _reference_id(value: t.Any) -> t.Any:
+    """未加载的引用值(DBRef或主键)对应的主键, 已加载的文档返回None."""
+    if value is None or isinstance(value, BaseDocument):
+        return None
+    if isinstance(value, DBRef):
+        return value.id
+    return value
+
+
+def dereference(
+        documents: t.Sequence[t.Any],
+        fields: t.Optional[t.Collection[str]] = None) -> t.Sequence[t.Any]:
+    """
+    批量加载文档的引用字段(仅一层).
+    收集所有文档中未加载的引用, 每个被引用的文档类只执行一次$in查询,
+    避免逐个访问引用字段时的N+1查询. 不存在的引用保持原值.
+
+    Args:
+        documents: 同一文档类的文档列表, 如一页查询结果
+        fields: 需要加载的引用字段名, 默认为全部ReferenceField及ListField(ReferenceField)
+
+    """
+    if not documents:
+        return documents
+    references = _reference_fields(type(documents[0]), fields)
+
+    # {被引用的文档类: 主键集合}
+    pending: t.Dict[t.Any, set] = defaultdict(set)
+    for document in documents:
+        for name, document_type, many in references:
+            value = document._data.get(name)
+            for item in (value or () if many else (value,)):
+                ref_id = _reference_id(item)
+                if ref_id is not None:
+                    pending[document_type].add(ref_id)
+    if not pending:
+        return documents
+
+    loaded = {
+        document_type: document_type.objects.in_bulk(list(ids))
+        for document_type, ids in pending.items()
+    }
+    for document in documents:
+        for name, document_type, many in references:
+            value = document._data.get(name)
+            if not value:
+                continue
+            objects = loaded.get(document_type, {})
+            if many:
+                items = BaseList(
+                    [objects.get(_reference_id(item), item) for item in value],
+                    document, name)
+                items._dereferenced = True
+                document._data[name] = items
+            elif _reference_id(value) is not None:
+                document._data[name] = objects.get(_reference_id(value), value)
+    return documents
 
 
 class LesoonQuerySet(BaseQuerySet):
+    # 单个where最多字段数
+    WHERE_FIELDS_LIMIT = where_filter.WHERE_FIELDS_LIMIT
+    # $in/$nin最多值个数
+    WHERE_VALUES_LIMIT = where_filter.WHERE_VALUES_LIMIT
+    # where编译结果缓存 {(document, schema字段映射, where结构): 编译结果}
+    where_plans = LRUCache(maxsize=1024)
+    # 单个sort最多字段数
+    SORT_FIELDS_LIMIT = where_filter.SORT_FIELDS_LIMIT
+    # 无索引排序的处理方式 ignore/warn/reject
+    SORT_INDEX_POLICY = where_filter.SORT_POLICY_WARN
+    # sort编译结果缓存 {(document, schema字段映射, sort, 白名单, 是否游标分页): 编译结果}
+    sort_plans = LRUCache(maxsize=1024)
+
+    def apply_where(self,
+                    where: t.Optional[t.Mapping[str, t.Any]] = None,
+                    schema: t.Any = None):
+        """
+        根据where过滤条件添加查询条件, 格式见`lesoon_common.utils.filter`.
+
+        Args:
+            where: 过滤条件, 默认为request.where
+            schema: 用于映射字段名的`MongoAutoSchema`实例, 默认按文档字段名及其驼峰形式映射
+
+        """
+        if where is None:
+            where = request.where  # type:ignore
+        conditions = where_filter.parse_where(
+            where,
+            max_fields=self.__class__.WHERE_FIELDS_LIMIT,
+            max_values=self.__class__.WHERE_VALUES_LIMIT)
+        if not conditions:
+            return self
+
+        document = self._document
+        plan_key = (document, where_filter.schema_key(schema),
+                    where_filter.where_shape(conditions))
+        plans = self.where_plans.get(plan_key)
+        if plans is None:
+            plans = compile_where(document, conditions, schema)
+            self.where_plans.set(plan_key, plans)
+        return self.filter(__raw__=build_query(conditions, plans))
+
+    def apply_sort(self,
+                   sort: t.Union[str, t.Mapping[str, t.Any], None] = None,
+                   schema: t.Any = None,
+                   allowed: t.Optional[t.Collection[str]] = None,
+                   policy: t.Optional[str] = None):
+        """
+        根据sort排序条件添加排序, 并以主键作为最后的排序字段.
+
+        Args:
+            sort: 排序条件, 默认为request.sort, 格式见`lesoon_common.utils.filter.parse_sort`
+            schema: 用于映射字段名的`MongoAutoSchema`实例, 默认按文档字段名及其驼峰形式映射
+            allowed: 允许排序的字段白名单, 默认允许能使用索引的排序
+            policy: 排序无法使用索引(或不在白名单内)时的处理方式, 默认为SORT_INDEX_POLICY
+
+        """
+        if sort is None:
+            sort = request.sort  # type:ignore
+        parsed = where_filter.parse_sort(
+            sort, max_fields=self.__class__.SORT_FIELDS_LIMIT)
+        if not parsed:
+            return self
+
+        keys, _ = self._sort_plan(parsed, schema, allowed, policy)
+        return self.order_by(*keys)
+
+    def _sort_plan(self,
+                   parsed: t.Tuple[t.Tuple[str, bool], ...],
+                   schema: t.Any,
+                   allowed: t.Optional[t.Collection[str]],
+                   policy: t.Optional[str],
+                   keyset: bool = False) -> t.Tuple[t.List[str], _SortKeys]:
+        """获取(缓存的)排序编译结果并按策略检查索引."""
+        document = self._document
+        allowed = frozenset(allowed) if allowed is not None else None
+        plan_key = (document, where_filter.schema_key(schema), parsed, allowed,
+                    keyset)
+        plan = self.sort_plans.get(plan_key)
+        if plan is None:
+            plan = compile_sort(document, parsed, schema, allowed, keyset)
+            self.sort_plans.set(plan_key, plan)
+
+        keys, covered, sort_keys = plan
+        policy = policy or self.__class__.SORT_INDEX_POLICY
+        where_filter.check_sort_index([field for field, _ in parsed], covered,
+                                      policy)
+        return keys, sort_keys
+
+    def seek(self,
+             cursor: t.Optional[str] = None,
+             sort: t.Union[str, t.Mapping[str, t.Any], None] = None,
+             schema: t.Any = None):
+        """
+        按排序键(含主键)排序并定位到游标之后, 用于游标分页.
+
+        Args:
+            cursor: 上一页游标, 为空时从头开始
+            sort: 排序条件, 默认为request.sort, 只能使用主键或必填字段
+            schema: 用于映射字段名的`MongoAutoSchema`实例
+
+        """
+        queryset, _ = self._seek(cursor, sort, schema)
+        return queryset
+
+    def _seek(self, cursor: t.Optional[str],
+              sort: t.Union[str, t.Mapping[str, t.Any], None], schema: t.Any):
+        if sort is None:
+            sort = request.sort  # type:ignore
+        parsed = where_filter.parse_sort(
+            sort, max_fields=self.__class__.SORT_FIELDS_LIMIT)
+        keys, sort_keys = self._sort_plan(parsed,
+                                          schema,
+                                          None,
+                                          None,
+                                          keyset=True)
+        queryset = self.order_by(*keys)
+        if cursor:
+            values = where_filter.decode_cursor(cursor, len(sort_keys))
+            values = [
+                _field_converter(field, 'gt')(value)
+                for (field, _), value in zip(sort_keys, values)
+            ]
+            queryset = queryset.filter(__raw__=_seek_query(sort_keys, values))
+        return queryset, sort_keys
+
+    def iter_chunks(
+            self,
+            chunk_size: int = stream.CHUNK_SIZE) -> t.Iterator[t.List[t.Any]]:
+        """按批读取查询结果, 不缓存已读取的文档."""
+        return stream.chunked(self.no_cache().batch_size(chunk_size),
+                              chunk_size)
 
     def paginate(self,
                  if_page: t.Optional[bool] = None,
                  page: t.Optional[int] = None,
-                 per_page: t.Optional[int] = None):
+                 per_page: t.Optional[int] = None,
+                 keyset: bool = False,
+                 cursor: t.Optional[str] = None,
+                 sort: t.Union[str, t.Mapping[str, t.Any], None] = None,
+                 schema: t.Any = None,
+                 related: t.Union[bool, t.Collection[str], None] = None):
         """
         执行分页查询.
 
@@ -23,15 +445,55 @@ class LesoonQuerySet(BaseQuerySet):
             if_page: 是否分页
             page: 页码
             per_page: 页大小
+            keyset: 是否使用游标分页, 按排序键(含主键)定位下一页, 不使用skip及count;
+                排序由sort指定且只能使用必填字段, 查询本身不应再调用order_by
+            cursor: 游标分页的上一页游标, 默认为request.cursor, 为空时查询第一页
+            sort: 游标分页的排序条件, 默认为request.sort
+            schema: 游标分页用于映射排序字段名的`MongoAutoSchema`实例
+            related: 批量加载引用字段, 见`dereference`; True为全部引用字段,
+                也可指定字段名; 默认分页时不加载, 不分页时加载全部引用字段
         """
         page = page or request.page  # type:ignore
         per_page = per_page or request.page_size  # type:ignore
         if_page = if_page or request.if_page  # type:ignore
+        if related is None:
+            related = not if_page
+        fields = None if isinstance(related, bool) else related
 
-        if if_page:
-            return Pagination(self, page, per_page)
+        if if_page and keyset:
+            pagination = self._paginate_keyset(page, per_page, cursor, sort,
+                                               schema)
+        elif if_page:
+            pagination = Pagination(self, page, per_page)
         else:
-            return self.select_related()
+            items = list(self)
+            return dereference(items, fields) if related else items
+
+        if related:
+            dereference(pagination.items, fields)
+        return pagination
+
+    def _paginate_keyset(self, page: int, per_page: int,
+                         cursor: t.Optional[str],
+                         sort: t.Union[str, t.Mapping[str, t.Any], None],
+                         schema: t.Any) -> LesoonPagination:
+        if cursor is None:
+            cursor = request.cursor  # type:ignore
+        queryset, sort_keys = self._seek(cursor, sort, schema)
+        items = list(queryset.limit(per_page + 1))
+        has_next = len(items) > per_page
+        items = items[:per_page]
+        next_cursor = None
+        if has_next:
+            next_cursor = where_filter.encode_cursor(
+                [getattr(items[-1], field.name) for field, _ in sort_keys])
+        return LesoonPagination(queryset,
+                                page,
+                                per_page,
+                                None,
+                                items,
+                                has_next=has_next,
+                                next_cursor=next_cursor)
 
 
 class CommandLogger(CommandListener):
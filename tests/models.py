@@ -18,7 +18,7 @@ class User(Model):
     login_name = Column(String, unique=True, nullable=False)
     user_name = Column(String)
     status = Column(Boolean, default=True)
-    create_time = Column(DateTime, default=func.now())
+    create_time = Column(DateTime, nullable=False, default=func.now())
 
 
 class UserExt(Model):
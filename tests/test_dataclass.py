@@ -0,0 +1,43 @@
+import pytest
+from marshmallow import ValidationError
+
+from lesoon_common.dataclass.req import CascadeDeleteParam
+from lesoon_common.dataclass.req import PageParam
+from lesoon_common.dataclass.user import TokenUser
+
+USER_INFO = {
+    'id': 1,
+    'userId': 1,
+    'companyId': 1,
+    'loginName': 'test',
+    'userName': 'test',
+}
+
+
+class TestFromTrusted:
+
+    def test_token_user(self):
+        user = TokenUser.from_trusted(USER_INFO)
+        assert user == TokenUser.load(USER_INFO)
+        assert user.email == ''
+        assert user.employee_attr == '2'
+
+    def test_snake_case_keys(self):
+        page_param = PageParam.from_trusted({'page': 2, 'page_size': 10})
+        assert page_param == PageParam.load({'page': 2, 'pageSize': 10})
+
+    def test_fallback_to_load(self):
+        with pytest.raises(ValidationError):
+            TokenUser.from_trusted({'loginName': 'test'})
+
+        param = CascadeDeleteParam.from_trusted({
+            'pkName':
+                'billNo',
+            'pkValues': ['D1'],
+            'detailTables': [{
+                'entityName': 'bl_purchase_dtl',
+                'refPkName': 'billNo'
+            }]
+        })
+        assert isinstance(param.detail_tables[0],
+                          CascadeDeleteParam.DetailTables)
@@ -1,9 +1,20 @@
+import json
 from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from flask import jsonify
 
 from lesoon_common.response import ClientResponse
+from lesoon_common.response import error_json_response
+from lesoon_common.response import error_response
 from lesoon_common.response import Response
 from lesoon_common.response import ResponseBase
 from lesoon_common.response import ResponseCode
+from lesoon_common.response import success_json_response
+from lesoon_common.response import success_response
+from lesoon_common.utils import codec
 
 
 class TestResponseABC:
@@ -116,3 +127,74 @@ class TestClientResponse:
         result = {'a': 1}
         r = ClientResponse.success(result=result)
         assert r['body'] == result
+
+
+class TestEncode:
+
+    @pytest.mark.parametrize('kwargs', [
+        {},
+        {
+            'result': [{
+                'b': 1,
+                'a': Decimal('1.50')
+            }],
+            'total': 10
+        },
+        {
+            'result': {
+                'id': '1'
+            },
+            'test': 123,
+            'empty': None
+        },
+        {
+            'result': {'a', 'b'},
+            'msg': '自定义信息'
+        },
+        {
+            'result': 'test',
+            'msg_detail': 'detail',
+            'rows': [1]
+        },
+    ])
+    def test_success_bytes(self, kwargs):
+        expected = Response.success(**kwargs)
+        for sort_keys in (True, False):
+            body = Response.success_bytes(sort_keys=sort_keys, **kwargs)
+            assert json.loads(body) == json.loads(
+                json.dumps(expected, default=str))
+            assert body == codec.dumps_bytes(expected, sort_keys=sort_keys)
+
+    @pytest.mark.parametrize('code', [ResponseCode.Error, '4001', 'unknown'])
+    def test_error_bytes(self, code):
+        expected = Response.error(code=code, msg_detail='detail')
+        body = Response.error_bytes(code=code, msg_detail='detail')
+        assert body == codec.dumps_bytes(expected, sort_keys=True)
+
+    def test_client_response(self):
+        expected = ClientResponse.success(result={'a': 1}, total=1)
+        body = ClientResponse.success_bytes(result={'a': 1}, total=1)
+        assert body == codec.dumps_bytes(expected, sort_keys=True)
+
+    def test_flag_cache(self):
+        Response.success_bytes()
+        assert (ResponseCode.Success, None, True) in Response._flag_cache
+        Response.success_bytes(msg='test')
+        assert (ResponseCode.Success, 'test', True) not in Response._flag_cache
+
+    def test_json_response(self, app):
+        result = [{'name': '中文', 'time': datetime(2021, 1, 1)}]
+        response = success_json_response(result=result, total=1)
+        assert response.mimetype == 'application/json'
+        assert response.get_data() == jsonify(
+            success_response(result=result, total=1)).get_data()
+
+        response = error_json_response(code=ResponseCode.ReqError)
+        assert response.get_data() == jsonify(
+            error_response(code=ResponseCode.ReqError)).get_data()
+
+    def test_json_response_pretty(self, app):
+        app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+        response = success_json_response(result={'a': 1})
+        assert response.get_data() == jsonify(
+            success_response(result={'a': 1})).get_data()
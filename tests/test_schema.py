@@ -0,0 +1,145 @@
+import threading
+
+from lesoon_common.dataclass.user import TokenUser
+from lesoon_common.model import fields
+from lesoon_common.schema import CamelSchema
+from lesoon_common.schema import get_schema
+from lesoon_common.schema import SchemaPool
+from tests.models import User
+from tests.models import UserSchema
+
+
+class TestSchemaPool:
+
+    def test_get(self):
+        pool = SchemaPool()
+        schema = pool.get(UserSchema)
+        assert pool.get(UserSchema) is schema
+        assert pool.get(UserSchema, many=True) is not schema
+        assert pool.get(UserSchema, many=True).many
+        assert pool.stats()['hits'] == 2
+        assert pool.stats()['misses'] == 2
+
+    def test_only_exclude(self):
+        pool = SchemaPool()
+        schema = pool.get(UserSchema, only=['id', 'login_name'])
+        assert set(schema.dump_fields) == {'id', 'login_name'}
+        assert pool.get(UserSchema, only=('login_name', 'id')) is schema
+
+        schema = pool.get(UserSchema, exclude=['user_name'])
+        assert 'user_name' not in schema.dump_fields
+        assert pool.get(UserSchema, exclude=['login_name']) is not schema
+
+    def test_partial(self):
+        pool = SchemaPool()
+        assert pool.get(UserSchema, partial=True).partial is True
+        assert pool.get(UserSchema, partial=['login_name']) is pool.get(
+            UserSchema, partial=('login_name',))
+
+    def test_maxsize(self):
+        pool = SchemaPool(maxsize=1)
+        pool.get(UserSchema)
+        pool.get(UserSchema, many=True)
+        assert pool.stats()['size'] == 1
+
+    def test_pooled(self, db):
+        schema = UserSchema.pooled(many=True)
+        assert schema is get_schema(UserSchema, many=True)
+        users = [User(id=1, login_name='a'), User(id=2, login_name='b')]
+        assert schema.dump(users) == UserSchema(many=True).dump(users)
+
+    def test_threads(self):
+        pool = SchemaPool()
+        schemas = []
+
+        def worker():
+            schemas.append(pool.get(UserSchema))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(schemas) == 8
+        assert pool.stats()['size'] == 1
+
+
+class TestDataClassSchema:
+
+    def test_reuse(self):
+        user_info = {
+            'id': 1,
+            'userId': 1,
+            'loginName': 'test',
+            'userName': 'test'
+        }
+        user = TokenUser.load(user_info)
+        assert get_schema(TokenUser.Schema) is get_schema(TokenUser.Schema)
+        assert user.json() == TokenUser.Schema().dump(user)
+        assert TokenUser.dump(user) == user.json()
+
+
+class CamelUserSchema(CamelSchema):
+    user_name = fields.Str()
+    login_name = fields.Str(data_key='account_name')
+    status = fields.Int()
+
+
+class TestCamelSchema:
+
+    def test_camel_keys(self):
+        keys = CamelUserSchema.camel_keys()
+        assert keys['user_name'] == keys['userName'] == 'userName'
+        assert keys['account_name'] == 'accountName'
+        assert CamelUserSchema.camel_keys() is keys
+        assert CamelUserSchema().fields['login_name'].data_key == 'accountName'
+
+    def test_camel_key_fallback(self):
+        assert CamelUserSchema.camel_key('unknown_key') == 'unknownKey'
+
+    def test_load(self):
+        schema = CamelUserSchema()
+        assert schema.load({
+            'user_name': 'a',
+            'accountName': 'b',
+            'status': 1
+        }) == {
+            'user_name': 'a',
+            'login_name': 'b',
+            'status': 1
+        }
+
+    def test_load_many(self):
+        data = [{
+            'user_name': 'a',
+            'status': 1
+        }, {
+            'user_name': 'b',
+            'status': 2
+        }, {
+            'userName': 'c',
+            'account_name': 'd'
+        }]
+        expected = [{
+            'user_name': 'a',
+            'status': 1
+        }, {
+            'user_name': 'b',
+            'status': 2
+        }, {
+            'user_name': 'c',
+            'login_name': 'd'
+        }]
+        assert CamelUserSchema(many=True).load(data) == expected
+        assert CamelUserSchema(many=True).load(iter(data)) == expected
+        assert data[0] == {'user_name': 'a', 'status': 1}
+
+    def test_camelcase_many(self):
+        schema = CamelUserSchema()
+        data = [{'user_name': 1}, 'raw', {'user_name': 2, 'extra_key': 3}]
+        assert schema.camelcase_dict_keys(data, many=True) == [{
+            'userName': 1
+        }, 'raw', {
+            'userName': 2,
+            'extraKey': 3
+        }]
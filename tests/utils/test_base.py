@@ -1,7 +1,17 @@
+import copy
+import json
+import pickle
+from decimal import Decimal
+
 import pytest
+from flask import json as flask_json
 
+from lesoon_common.utils import codec
 from lesoon_common.utils.base import AttributeDict
 from lesoon_common.utils.base import generate_id
+from lesoon_common.utils.base import RowView
+from lesoon_common.utils.model import row_to_dict
+from tests.models import User
 
 
 class TestStrUtil:
@@ -26,3 +36,61 @@ class TestStrUtil:
         assert a.id == 1
         a.b = 2
         assert a.b == 2
+
+
+class TestRowView:
+
+    def test_access(self):
+        index = RowView.build_index(['id', 'name', 'id'])
+        row = RowView(index, (1, 'a', 2))
+        assert row.id == 1
+        assert row['name'] == 'a'
+        assert 'name' in row
+        assert list(row) == ['id', 'name']
+        assert len(row) == 2
+        assert row == {'id': 1, 'name': 'a'}
+        assert row.get('missing') is None
+        with pytest.raises(AttributeError):
+            row.missing
+        with pytest.raises(KeyError):
+            row['missing']
+
+    def test_read_only(self):
+        row = RowView({'id': 0}, (1,))
+        with pytest.raises(AttributeError):
+            row.name = 'a'
+        data = row.to_dict()
+        data.name = 'a'
+        assert data == {'id': 1, 'name': 'a'}
+        assert not hasattr(row, '__dict__')
+
+    def test_pickle(self):
+        row = RowView({'id': 0}, (1,))
+        assert pickle.loads(pickle.dumps(row)) == row
+        assert copy.copy(row) == row
+
+    def test_json(self, app):
+        rows = [RowView({'id': 0, 'amount': 1}, (1, Decimal('1.5')))]
+        assert json.loads(flask_json.dumps(rows)) == [{
+            'id': 1,
+            'amount': '1.5'
+        }]
+        assert json.loads(codec.dumps(rows)) == [{'id': 1, 'amount': '1.5'}]
+
+
+class TestRowToDict:
+
+    def test_row_to_dict(self, db):
+        db.session.add_all([
+            User(id=1, login_name='a', user_name='A'),
+            User(id=2, login_name='b')
+        ])
+        db.session.commit()
+        rows = db.session.query(User.id, User.login_name,
+                                User.user_name).order_by(User.id).all()
+        views = row_to_dict(rows)
+        assert views == [AttributeDict(row._mapping) for row in rows]
+        assert views[0]._index is views[1]._index
+        assert views[0].login_name == 'a'
+        assert views[1]['user_name'] is None
+        assert row_to_dict([]) == []
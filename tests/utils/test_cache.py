@@ -0,0 +1,43 @@
+import time
+
+from lesoon_common.utils.cache import LRUCache
+
+
+class TestLRUCache:
+
+    def test_get_set(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_evict_lru(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert len(cache) == 2
+
+    def test_maxbytes(self):
+        cache = LRUCache(maxsize=0, maxbytes=10, getsizeof=lambda k, v: v)
+        assert cache.set('a', 4)
+        assert cache.set('b', 4)
+        assert cache.set('c', 4)
+        assert 'a' not in cache
+        assert cache.currbytes == 8
+        # 单个条目超出上限时不缓存
+        assert not cache.set('d', 11)
+        assert 'd' not in cache
+
+    def test_expires(self):
+        cache = LRUCache()
+        cache.set('a', 1, expires=time.time() - 1)
+        cache.set('b', 2, expires=time.time() + 60)
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+        assert len(cache) == 1
@@ -0,0 +1,76 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from flask import json as flask_json
+from flask import request
+
+from lesoon_common.utils import codec
+
+
+class TestCodec:
+
+    def test_dumps_decimal(self):
+        data = {'amount': Decimal('1.10'), 'rows': [1, None, 'a']}
+        assert json.loads(codec.dumps(data)) == {
+            'amount': '1.10',
+            'rows': [1, None, 'a']
+        }
+
+    def test_dumps_compact_utf8(self):
+        assert codec.dumps({'name': '中文'}) == '{"name":"中文"}'
+        assert codec.dumps_bytes({'name': '中文'}) == '{"name":"中文"}'.encode()
+
+    def test_dumps_sort_keys(self):
+        assert codec.dumps({'b': 1, 'a': 2}, sort_keys=True) == '{"a":2,"b":1}'
+
+    def test_dumps_non_str_keys(self):
+        assert json.loads(codec.dumps({1: 'a'})) == {'1': 'a'}
+
+    def test_dumps_datetime_uses_default(self):
+        value = datetime(2021, 1, 1, 8, 0, 0)
+        assert codec.dumps(value,
+                           default=lambda o: o.strftime('%Y-%m-%d %H:%M:%S')
+                          ) == '"2021-01-01 08:00:00"'
+
+    def test_dumps_big_int(self):
+        assert codec.dumps(2**70) == str(2**70)
+
+    def test_dumps_unsupported(self):
+        with pytest.raises(TypeError):
+            codec.dumps(object())
+
+    def test_loads(self):
+        assert codec.loads('{"a":[1,2.5,null]}') == {'a': [1, 2.5, None]}
+        assert codec.loads(b'{"a":1}') == {'a': 1}
+        assert codec.loads('[NaN]')[0] != codec.loads('[NaN]')[0]
+
+    def test_loads_invalid(self):
+        with pytest.raises(ValueError):
+            codec.loads('{"a":')
+
+
+class TestFlaskJson:
+
+    def test_encoder(self, app):
+        data = {
+            'amount': Decimal('2.50'),
+            'time': datetime(2021, 1, 1),
+            'name': '中文'
+        }
+        expected = {
+            'amount': '2.50',
+            'time': 'Fri, 01 Jan 2021 00:00:00 GMT',
+            'name': '中文'
+        }
+        assert json.loads(flask_json.dumps(data)) == expected
+        assert json.loads(flask_json.dumps(data, indent=2)) == expected
+
+    def test_decoder(self, app):
+        with app.test_request_context(json={'where': {'id': 1}}):
+            assert request.json == {'where': {'id': 1}}
+        assert flask_json.loads('{"a":1.5}') == {'a': 1.5}
+        assert flask_json.loads('{"a":1.5}', parse_float=Decimal) == {
+            'a': Decimal('1.5')
+        }
@@ -0,0 +1,165 @@
+from datetime import date
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import marshmallow as ma
+import pytest
+
+from lesoon_common.model import fields
+from lesoon_common.model import SqlaCamelAutoSchema
+from lesoon_common.schema import CamelSchema
+from lesoon_common.utils.compiler import compile_dump
+from tests.models import User
+
+
+class ItemSchema(ma.Schema):
+    sku = fields.Str()
+
+
+class OrderSchema(CamelSchema):
+    id = fields.IntStr()
+    bill_no = fields.Str()
+    qty = fields.Int()
+    price = fields.Float(as_string=True)
+    amount = fields.Decimal(as_string=True)
+    enabled = fields.Bool()
+    create_time = fields.DateTime()
+    bill_date = fields.Date()
+    iso_time = fields.DateTime(format='iso')
+    remarks = fields.Str(dump_default='-')
+    source = fields.Str(attribute='origin')
+    item_sku = fields.Str(attribute='item.sku')
+    item = fields.Nested(ItemSchema)
+    extra = fields.Raw()
+    label = fields.Method('get_label')
+
+    def get_label(self, obj):
+        return f'{obj.bill_no}-{obj.qty}'
+
+    class Meta(CamelSchema.Meta):
+        compile_dump = True
+
+
+def _order(i, **kwargs):
+    data = dict(id=i,
+                bill_no=f'SO{i}',
+                qty=i,
+                price=1.5,
+                amount=Decimal('2.50'),
+                enabled=1,
+                create_time=datetime(2021, 1, 1, 8, 0, i),
+                bill_date=date(2021, 1, 1),
+                iso_time=datetime(2021, 1, 1),
+                origin='web',
+                item=SimpleNamespace(sku=f'SKU{i}'),
+                extra={'a': [1]})
+    data.update(kwargs)
+    return SimpleNamespace(**data)
+
+
+def _plain(schema_cls, **kwargs):
+    """不编译的同结构schema."""
+    meta = type('Meta', (schema_cls.Meta,), {'compile_dump': False})
+    return type(schema_cls.__name__, (schema_cls,), {'Meta': meta})(**kwargs)
+
+
+class TestCompileDump:
+
+    def test_dump_identical(self):
+        orders = [
+            _order(1),
+            _order(2, remarks=None, bill_no=None, create_time=None),
+            _order(3, remarks='remarks', enabled=None, qty='4')
+        ]
+        schema = OrderSchema(many=True)
+        assert schema._compiled_dump() is not None
+        expected = _plain(OrderSchema, many=True).dump(orders)
+        result = schema.dump(orders)
+        assert result == expected
+        assert [list(row) for row in result] == [list(row) for row in expected]
+        assert result[0]['createTime'] == '2021-01-01 08:00:01'
+        assert result[0]['id'] == '1'
+        assert result[0]['itemSku'] == 'SKU1'
+        assert result[0]['remarks'] == '-'
+
+    def test_dump_single(self):
+        order = _order(1)
+        assert OrderSchema().dump(order) == _plain(OrderSchema).dump(order)
+        assert OrderSchema(exclude=['label']).dump(None) == _plain(
+            OrderSchema, exclude=['label']).dump(None)
+        assert OrderSchema().dump([order],
+                                  many=True) == _plain(OrderSchema,
+                                                       many=True).dump([order])
+
+    def test_only_exclude(self):
+        order = _order(1)
+        schema = OrderSchema(only=['id', 'bill_no'])
+        assert schema.dump(order) == {'id': '1', 'billNo': 'SO1'}
+        schema = OrderSchema(exclude=['label', 'item'])
+        assert schema.dump(order) == _plain(OrderSchema,
+                                            exclude=['label',
+                                                     'item']).dump(order)
+
+    def test_mapping_fallback(self):
+        rows = [{'id': 1, 'bill_no': 'SO1', 'qty': 1}]
+        schema = OrderSchema(many=True, only=['id', 'bill_no', 'qty'])
+        assert schema.dump(rows) == [{'id': '1', 'billNo': 'SO1', 'qty': 1}]
+
+    def test_not_compilable(self):
+
+        class PreDumpSchema(OrderSchema):
+
+            @ma.pre_dump
+            def upper(self, data, **kwargs):
+                return data
+
+        class AccessorSchema(OrderSchema):
+
+            def get_attribute(self, obj, attr, default):
+                return super().get_attribute(obj, attr, default)
+
+        assert compile_dump(PreDumpSchema()) is None
+        assert compile_dump(AccessorSchema()) is None
+        assert AccessorSchema().dump(_order(1)) == OrderSchema().dump(_order(1))
+
+    def test_opt_in(self):
+        assert CamelSchema()._compiled_dump() is None
+
+
+class UserCompiledSchema(SqlaCamelAutoSchema):
+
+    class Meta(SqlaCamelAutoSchema.Meta):
+        model = User
+        compile_dump = True
+
+
+class TestSqlaCompileDump:
+
+    def test_model(self, db):
+        users = [
+            User(id=i,
+                 login_name=f'user{i}',
+                 status=True,
+                 create_time=datetime(2021, 1, 1)) for i in range(3)
+        ]
+        expected = _plain(UserCompiledSchema, many=True).dump(users)
+        assert UserCompiledSchema(many=True).dump(users) == expected
+        assert expected[0]['createTime'] == '2021-01-01 00:00:00'
+
+    def test_guard(self, db):
+        user = User(id=1, login_name='user1')
+        joined = SimpleNamespace(User=user, extra=1)
+        schema = UserCompiledSchema()
+        assert not schema.dump_guard(joined)
+        assert schema.dump(joined) == _plain(UserCompiledSchema).dump(joined)
+        assert schema.dump(joined)['loginName'] == 'user1'
+
+    @pytest.mark.parametrize('rows', [10, 0])
+    def test_query(self, db, rows):
+        db.session.add_all(
+            [User(id=i, login_name=f'user{i}') for i in range(rows)])
+        db.session.commit()
+        users = User.query.all()
+        assert UserCompiledSchema(many=True).dump(users) == _plain(
+            UserCompiledSchema, many=True).dump(users)
@@ -0,0 +1,95 @@
+import json
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+from jose.exceptions import JWEError
+from jose.exceptions import JWSError
+
+from lesoon_common import LesoonFlask
+from lesoon_common.dataclass.user import TokenUser
+from lesoon_common.utils.crypto import CryptographyBackend
+from lesoon_common.utils.crypto import get_backend
+from lesoon_common.utils.crypto import JoseBackend
+from lesoon_common.utils.jwt import create_token
+from lesoon_common.utils.jwt import verify_jwt_in_request
+from tests.utils.test_jwt import _access_token
+from tests.utils.test_jwt import JwtConfig
+
+SECRET = JwtConfig.JWT_SECRET_KEY
+BACKEND_PAIRS = [(JoseBackend(), CryptographyBackend()),
+                 (CryptographyBackend(), JoseBackend())]
+
+
+class TestCryptoBackend:
+
+    def test_get_backend(self):
+        assert isinstance(get_backend(), JoseBackend)
+        assert isinstance(get_backend('cryptography'), CryptographyBackend)
+        assert isinstance(
+            get_backend('lesoon_common.utils.crypto.CryptographyBackend'),
+            CryptographyBackend)
+        backend = CryptographyBackend()
+        assert get_backend(backend) is backend
+
+    @pytest.mark.parametrize('encoder,decoder', BACKEND_PAIRS)
+    def test_jwe_compatible(self, encoder, decoder):
+        key_bytes = SECRET.encode()
+        token = encoder.encrypt('payload',
+                                encoder.prepare_key(key_bytes),
+                                kid='k1')
+        assert decoder.decrypt(token,
+                               decoder.prepare_key(key_bytes)) == b'payload'
+
+    @pytest.mark.parametrize('encoder,decoder', BACKEND_PAIRS)
+    def test_jws_compatible(self, encoder, decoder):
+        exp = datetime.utcnow() + timedelta(hours=1)
+        token = encoder.sign({
+            'sub': '1',
+            'exp': exp
+        },
+                             SECRET,
+                             headers={'kid': 'k1'})
+        payload = json.loads(decoder.verify(token, SECRET, ['HS256']))
+        assert payload['sub'] == '1'
+        assert isinstance(payload['exp'], int)
+
+    def test_invalid_token(self):
+        backend = CryptographyBackend()
+        key = backend.prepare_key(SECRET.encode())
+        token = backend.encrypt('payload', key)
+        with pytest.raises(JWEError):
+            backend.decrypt(token[:-4] + 'AAAA', key)
+
+        token = backend.sign({'sub': '1'}, SECRET)
+        with pytest.raises(JWSError):
+            backend.verify(token, 'other-secret', ['HS256'])
+        with pytest.raises(JWSError):
+            backend.verify(token, SECRET, ['HS512'])
+
+
+class TestCryptographyApp:
+
+    @pytest.fixture
+    def crypto_app(self, monkeypatch):
+        config = type('CryptoConfig', (JwtConfig,),
+                      {'JWT_CRYPTO_BACKEND': 'cryptography'})
+        monkeypatch.setattr(LesoonFlask, 'config_path',
+                            f'{JwtConfig.__module__}.{JwtConfig.__name__}')
+        app = LesoonFlask(__name__, config=config)
+        with app.app_context():
+            yield app
+
+    def test_access_token(self, crypto_app):
+        assert isinstance(crypto_app.extensions['jwt_keyring'].backend,
+                          CryptographyBackend)
+        token = _access_token()
+        with crypto_app.test_request_context(headers={'token': token}):
+            _, jwt_data = verify_jwt_in_request()
+            assert jwt_data['sub'] == '1'
+
+    def test_create_token(self, crypto_app):
+        token = create_token(TokenUser.new(user_name='test'))
+        with crypto_app.test_request_context(headers={'token': token}):
+            _, jwt_data = verify_jwt_in_request()
+            assert jwt_data['userInfo']['userName'] == 'test'
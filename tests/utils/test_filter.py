@@ -0,0 +1,116 @@
+import pytest
+
+from lesoon_common.exceptions import RequestError
+from lesoon_common.utils.filter import Condition
+from lesoon_common.utils.filter import escape_like
+from lesoon_common.utils.filter import is_index_prefix
+from lesoon_common.utils.filter import parse_sort
+from lesoon_common.utils.filter import parse_where
+from lesoon_common.utils.filter import where_shape
+
+
+class TestParseWhere:
+
+    def test_parse(self):
+        conditions = parse_where({
+            'userName': 'test',
+            'status': [1, 2],
+            'age': {
+                '$gte': 18,
+                '$lt': 60
+            },
+            'createTime': {
+                '$range': ['2021-01-01', None]
+            },
+            'remarks': None
+        })
+        assert conditions == (
+            Condition('age', '$gte', 18),
+            Condition('age', '$lt', 60),
+            Condition('createTime', '$range', ('2021-01-01', None),
+                      (True, False)),
+            Condition('remarks', '$null', None, True),
+            Condition('status', '$in', (1, 2)),
+            Condition('userName', '$eq', 'test'),
+        )
+
+    def test_shape(self):
+        assert where_shape(parse_where({
+            'a': 1,
+            'b': [1]
+        })) == where_shape(parse_where({
+            'b': [2, 3],
+            'a': 2
+        }))
+        assert where_shape(parse_where({'a': {
+            '$null': True
+        }})) != where_shape(parse_where({'a': {
+            '$null': False
+        }}))
+
+    @pytest.mark.parametrize('where', [
+        {
+            'a': {
+                '$regex': '.*'
+            }
+        },
+        {
+            'a': {
+                '$in': 1
+            }
+        },
+        {
+            'a': {
+                '$eq': {
+                    'b': 1
+                }
+            }
+        },
+        {
+            'a': [[1]]
+        },
+        {
+            'a': {
+                '$range': [1]
+            }
+        },
+        {
+            'a': {}
+        },
+        {
+            'a': list(range(1001))
+        },
+        {str(i): i for i in range(51)},
+    ])
+    def test_invalid(self, where):
+        with pytest.raises(RequestError):
+            parse_where(where)
+
+    def test_escape_like(self):
+        assert escape_like('a%b_c\\') == 'a\\%b\\_c\\\\'
+
+
+class TestParseSort:
+
+    def test_parse(self):
+        assert parse_sort({
+            'createTime': 'desc',
+            'id': 1
+        }) == (('createTime', True), ('id', False))
+        assert parse_sort('createTime DESC, id') == (('createTime', True),
+                                                     ('id', False))
+        assert parse_sort('') == ()
+
+    @pytest.mark.parametrize('sort', [{
+        'a': 'up'
+    }, {
+        'a': True
+    }, 'a b c', 'a,,b', {str(i): 1 for i in range(6)}])
+    def test_invalid(self, sort):
+        with pytest.raises(RequestError):
+            parse_sort(sort)
+
+    def test_is_index_prefix(self):
+        assert is_index_prefix(['a'], [('a', 'b')])
+        assert is_index_prefix(['a', 'b'], [('c',), ('a', 'b')])
+        assert not is_index_prefix(['b'], [('a', 'b')])
@@ -0,0 +1,409 @@
+import time
+
+import pytest
+from flask_jwt_extended import create_access_token
+from flask_jwt_extended import get_jwt_request_location
+from flask_jwt_extended.exceptions import JWTDecodeError
+from flask_jwt_extended.exceptions import NoAuthorizationError
+from flask_jwt_extended.exceptions import RevokedTokenError
+from flask_jwt_extended.exceptions import UserLookupError
+from jose import jwe
+from jose import jwt as jose_jwt
+from jwt import ExpiredSignatureError
+from tests.conftest import Config
+
+from lesoon_common import LesoonFlask
+from lesoon_common.dataclass.user import TokenUser
+from lesoon_common.extensions import jwt
+from lesoon_common.globals import current_user
+from lesoon_common.utils.internal_auth import InternalAuth
+from lesoon_common.utils.jwt import create_internal_auth
+from lesoon_common.utils.jwt import create_token
+from lesoon_common.utils.jwt import get_token
+from lesoon_common.utils.jwt import revoke_token
+from lesoon_common.utils.jwt import TokenProvider
+from lesoon_common.utils.jwt import verify_jwt_in_request
+from lesoon_common.utils.jwt import verify_tokens
+from lesoon_common.utils.keyring import Keyring
+from lesoon_common.utils.revocation import BloomFilter
+from lesoon_common.utils.revocation import FileRevocationStore
+from lesoon_common.utils.revocation import TokenRevocation
+
+
+class JwtConfig(Config):
+    JWT_SECRET_KEY = 'U1NDUxNjQtNDgyMC00NjZiLTlkODgtMm'
+    JWT_ACCESS_TOKEN_EXPIRES = 3600
+
+
+@pytest.fixture
+def jwt_app(monkeypatch):
+    monkeypatch.setattr(LesoonFlask, 'config_path',
+                        f'{__name__}.{JwtConfig.__name__}')
+    app = LesoonFlask(__name__, config=JwtConfig)
+    with app.app_context():
+        yield app
+
+
+def _access_token(**claims):
+    user_info = {'id': 1, 'userId': 1, 'loginName': 'test', 'userName': 'test'}
+    user_info.update(claims)
+    return create_access_token(identity='1',
+                               additional_claims={'userInfo': user_info})
+
+
+class TestTokenCache:
+
+    def test_cache_hit(self, jwt_app):
+        token = _access_token()
+        token_cache = jwt_app.extensions['jwt_token_cache']
+        for _ in range(3):
+            with jwt_app.test_request_context(headers={'token': token}):
+                _, jwt_data = verify_jwt_in_request()
+                assert jwt_data['sub'] == '1'
+        assert token_cache.misses == 1
+        assert token_cache.hits == 2
+
+    def test_blocklist_checked_on_hit(self, jwt_app):
+        token = _access_token()
+        with jwt_app.test_request_context(headers={'token': token}):
+            verify_jwt_in_request()
+
+        blocklist_callback = jwt._token_in_blocklist_callback
+        jwt._token_in_blocklist_callback = lambda header, data: True
+        try:
+            with jwt_app.test_request_context(headers={'token': token}):
+                with pytest.raises(RevokedTokenError):
+                    verify_jwt_in_request()
+        finally:
+            jwt._token_in_blocklist_callback = blocklist_callback
+        assert jwt_app.extensions['jwt_token_cache'].hits == 1
+
+    def test_claims_not_shared(self, jwt_app):
+        token = _access_token()
+        with jwt_app.test_request_context(headers={'token': token}):
+            _, jwt_data = verify_jwt_in_request()
+            jwt_data['sub'] = '2'
+            jwt_data['userInfo']['loginName'] = 'changed'
+        with jwt_app.test_request_context(headers={'token': token}):
+            _, jwt_data = verify_jwt_in_request()
+            assert jwt_data['sub'] == '1'
+            assert jwt_data['userInfo']['loginName'] == 'test'
+        assert jwt_app.extensions['jwt_token_cache'].hits == 1
+
+
+class TestCurrentUser:
+
+    def test_load(self, jwt_app):
+        token = _access_token()
+        user_cache = jwt_app.extensions['jwt_user_cache']
+        with jwt_app.test_request_context(headers={'token': token}):
+            verify_jwt_in_request()
+            assert len(user_cache) == 1
+            assert current_user.login_name == 'test'
+            assert isinstance(current_user._get_current_object(), TokenUser)
+
+    def test_memoized_by_jti(self, jwt_app):
+        token = _access_token()
+        users = []
+        for _ in range(2):
+            with jwt_app.test_request_context(headers={'token': token}):
+                verify_jwt_in_request()
+                assert current_user.company_id != 99
+                users.append(current_user._get_current_object())
+                # 请求内的修改不影响其他请求
+                current_user.company_id = 99
+        assert users[0] is not users[1]
+        assert jwt_app.extensions['jwt_user_cache'].hits == 1
+
+        with jwt_app.test_request_context(headers={'token': _access_token()}):
+            verify_jwt_in_request()
+            assert current_user._get_current_object() is not users[0]
+
+    def test_lookup_error(self, jwt_app):
+        user_lookup_callback = jwt._user_lookup_callback
+        jwt._user_lookup_callback = lambda header, data: None
+        try:
+            with jwt_app.test_request_context(
+                    headers={'token': _access_token()}):
+                with pytest.raises(UserLookupError):
+                    verify_jwt_in_request()
+        finally:
+            jwt._user_lookup_callback = user_lookup_callback
+
+
+class TestKeyring:
+    OLD_KEY = 'MTIzNDU2Nzg5MDEyMzQ1Njc4OTAxMjM0'
+
+    def test_kid_header(self, jwt_app):
+        token = _access_token()
+        keyring = jwt_app.extensions['jwt_keyring']
+        assert Keyring.get_kid(token) == keyring.current.kid
+        assert Keyring.get_kid(keyring.decrypt(token)) == keyring.current.kid
+
+    def test_rotation(self):
+        old_app = LesoonFlask(__name__,
+                              config=type(
+                                  'OldConfig', (JwtConfig,), {
+                                      'JWT_SECRET_KEY': self.OLD_KEY,
+                                      'JWT_SECRET_KEY_ID': 'old'
+                                  }))
+        with old_app.app_context():
+            token = _access_token()
+
+        new_app = LesoonFlask(__name__,
+                              config=type(
+                                  'NewConfig', (JwtConfig,), {
+                                      'JWT_SECRET_KEY_ID': 'new',
+                                      'JWT_SECRET_KEYS': {
+                                          'old': self.OLD_KEY
+                                      }
+                                  }))
+        with new_app.test_request_context(headers={'token': token}):
+            _, jwt_data = verify_jwt_in_request()
+            assert jwt_data['sub'] == '1'
+            assert new_app.extensions['jwt_keyring'].current.kid == 'new'
+
+    def test_legacy_token_without_kid(self, jwt_app):
+        claims = {
+            'sub': '1',
+            'type': 'access',
+            'jti': '1',
+            'userInfo': {
+                'loginName': 'test',
+                'userName': 'test'
+            }
+        }
+        token = jwe.encrypt(jose_jwt.encode(claims, JwtConfig.JWT_SECRET_KEY),
+                            key=JwtConfig.JWT_SECRET_KEY,
+                            cty='JWT').decode()
+        with jwt_app.test_request_context(headers={'token': token}):
+            _, jwt_data = verify_jwt_in_request()
+            assert jwt_data['sub'] == '1'
+
+
+class TestTokenProvider:
+
+    def test_reuse(self, jwt_app):
+        provider = TokenProvider()
+        user = TokenUser.new(user_name='provider')
+        token = provider.get_token(user)
+        assert provider.get_token(TokenUser.new(user_name='provider')) == token
+        assert provider.get_token(TokenUser.new(user_name='other')) != token
+        assert provider.stats()['minted'] == 2
+        assert provider.stats()['reused'] == 1
+
+        with jwt_app.test_request_context(headers={'token': token}):
+            verify_jwt_in_request()
+            assert current_user.user_name == 'provider'
+
+    def test_refresh_ahead(self, jwt_app):
+        provider = TokenProvider(
+            refresh_ahead=JwtConfig.JWT_ACCESS_TOKEN_EXPIRES)
+        token = provider.get_token()
+        # 提前刷新时间超过有效期一半时按一半计算, 有效期内仍复用
+        assert provider.get_token() == token
+
+        provider = TokenProvider(refresh_ahead=0)
+        token = provider.get_token()
+        provider._cache.set(None, token, expires=0)
+        assert provider.get_token() != token
+        assert provider.minted == 2
+
+
+class TestVerifyTokens:
+
+    @pytest.mark.parametrize('executor,max_workers', [('thread', 0),
+                                                      ('thread', 2),
+                                                      ('process', 2)])
+    def test_batch(self, jwt_app, executor, max_workers):
+        jwt_app.config['JWT_BATCH_THRESHOLD'] = 1
+        tokens = [_access_token(userId=i) for i in range(4)]
+        tokens.insert(2, 'invalid-token')
+        results = verify_tokens(tokens,
+                                max_workers=max_workers,
+                                executor=executor)
+        assert [r.token for r in results] == tokens
+        assert [r.valid for r in results] == [True, True, False, True, True]
+        assert results[3].claims['userInfo']['userId'] == 2
+        assert results[2].claims is None
+        assert results[2].error is not None
+
+    def test_cached_and_blocklisted(self, jwt_app):
+        token = _access_token()
+        assert verify_tokens([token])[0].valid
+
+        blocklist_callback = jwt._token_in_blocklist_callback
+        jwt._token_in_blocklist_callback = lambda header, data: True
+        try:
+            result = verify_tokens([token])[0]
+        finally:
+            jwt._token_in_blocklist_callback = blocklist_callback
+        assert isinstance(result.error, RevokedTokenError)
+        assert jwt_app.extensions['jwt_token_cache'].hits == 1
+
+
+class TestRevocation:
+
+    @pytest.fixture
+    def revocation_app(self, monkeypatch, tmp_path):
+        config = type(
+            'RevocationConfig', (JwtConfig,), {
+                'JWT_REVOCATION_ENABLE': True,
+                'JWT_REVOCATION_STORE': 'file',
+                'JWT_REVOCATION_FILE': str(tmp_path / 'revoked.jsonl'),
+                'JWT_REVOCATION_CAPACITY': 1000
+            })
+        monkeypatch.setattr(LesoonFlask, 'config_path',
+                            f'{__name__}.{JwtConfig.__name__}')
+        app = LesoonFlask(__name__, config=config)
+        with app.app_context():
+            yield app
+
+    def test_revoke(self, revocation_app):
+        token, other = _access_token(), _access_token()
+        with revocation_app.test_request_context(headers={'token': token}):
+            verify_jwt_in_request()
+            revoke_token()
+        with revocation_app.test_request_context(headers={'token': token}):
+            with pytest.raises(RevokedTokenError):
+                verify_jwt_in_request()
+        with revocation_app.test_request_context(headers={'token': other}):
+            verify_jwt_in_request()
+
+        stats = revocation_app.extensions['jwt_revocation'].stats()
+        assert stats['checks'] == 3
+        assert stats['store_checks'] == 1
+
+    def test_refresh_from_store(self, revocation_app):
+        revocation = revocation_app.extensions['jwt_revocation']
+        revocation.refresh()
+        other = TokenRevocation(
+            FileRevocationStore(revocation_app.config['JWT_REVOCATION_FILE']))
+        other.revoke('shared-jti')
+        assert not revocation.is_revoked('shared-jti')
+        revocation.refresh()
+        assert revocation.is_revoked('shared-jti')
+
+    def test_false_positive(self):
+        revocation = TokenRevocation(capacity=10, error_rate=0.5)
+        for i in range(10):
+            revocation.revoke(f'revoked-{i}')
+        results = [revocation.is_revoked(f'valid-{i}') for i in range(200)]
+        stats = revocation.stats()
+        assert not any(results)
+        assert stats['false_positives'] == stats['store_checks'] > 0
+        assert 0 < stats['false_positive_rate'] < 1
+
+
+class TestBloomFilter:
+
+    def test_membership(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        bloom.update(str(i) for i in range(1000))
+        assert all(str(i) in bloom for i in range(1000))
+        false_positives = sum(1 for i in range(1000, 11000) if str(i) in bloom)
+        assert false_positives / 10000 < 0.03
+        assert len(bloom) == 1000
+
+
+class TestCompactClaims:
+
+    def test_round_trip(self):
+        user = TokenUser.new(user_name='compact', company_id=3, email='a@b')
+        claims = TokenUser.to_claims(user, compact=True)
+        assert claims == {
+            'u': {
+                'ci': 3,
+                'ln': '-',
+                'un': 'compact',
+                'em': 'a@b',
+                'ad': True
+            }
+        }
+        loaded = TokenUser.from_claims(claims)
+        assert loaded == user
+        assert TokenUser.dump(loaded) == TokenUser.dump(user)
+
+    @pytest.mark.parametrize('compact', [True, False])
+    def test_create_token(self, jwt_app, monkeypatch, compact):
+        monkeypatch.setattr(JwtConfig,
+                            'JWT_COMPACT_CLAIMS',
+                            compact,
+                            raising=False)
+        token = create_token(TokenUser.new(user_name='compact'))
+        with jwt_app.test_request_context(headers={'token': token}):
+            _, jwt_data = verify_jwt_in_request()
+            assert ('u' in jwt_data) is compact
+            assert ('userInfo' in jwt_data) is not compact
+            assert current_user.user_name == 'compact'
+
+
+class TestInternalAuth:
+    SECRET = 'internal-secret'
+
+    @pytest.fixture
+    def internal_app(self, monkeypatch):
+        config = type(
+            'InternalConfig', (JwtConfig,), {
+                'JWT_INTERNAL_AUTH_ENABLE': True,
+                'JWT_INTERNAL_AUTH_SECRET': self.SECRET,
+                'JWT_INTERNAL_AUTH_SOURCES': ['10.0.0.0/8']
+            })
+        monkeypatch.setattr(LesoonFlask, 'config_path',
+                            f'{__name__}.{JwtConfig.__name__}')
+        app = LesoonFlask(__name__, config=config)
+        with app.app_context():
+            yield app
+
+    def _request(self, app, headers, remote_addr='10.1.2.3'):
+        return app.test_request_context(
+            headers=headers, environ_base={'REMOTE_ADDR': remote_addr})
+
+    def test_trusted_source(self, internal_app):
+        headers = create_internal_auth(TokenUser.new(user_name='internal'))
+        with self._request(internal_app, headers):
+            verify_jwt_in_request()
+            assert get_jwt_request_location() == 'internal'
+            assert current_user.user_name == 'internal'
+
+    def test_forward_token(self, internal_app):
+        headers = create_internal_auth(TokenUser.new(user_name='internal'))
+        with self._request(internal_app, headers):
+            verify_jwt_in_request()
+            token = get_token()
+            assert token != headers['X-Internal-Auth']
+            assert get_token() == token
+        # 转发的token可以被其他服务(非受信任来源)按jwe token校验
+        with self._request(internal_app, {'token': token},
+                           remote_addr='192.168.1.1'):
+            verify_jwt_in_request()
+            assert get_jwt_request_location() == 'headers'
+            assert current_user.user_name == 'internal'
+
+    def test_untrusted_source(self, internal_app):
+        headers = create_internal_auth()
+        with self._request(internal_app, headers, remote_addr='192.168.1.1'):
+            with pytest.raises(NoAuthorizationError):
+                verify_jwt_in_request()
+
+        headers['token'] = _access_token()
+        with self._request(internal_app, headers, remote_addr='192.168.1.1'):
+            verify_jwt_in_request()
+            assert get_jwt_request_location() == 'headers'
+
+    def test_invalid_signature(self, internal_app):
+        other = InternalAuth(secret='other-secret')
+        headers = {'X-Internal-Auth': other.sign()}
+        with self._request(internal_app, headers):
+            with pytest.raises(JWTDecodeError):
+                verify_jwt_in_request()
+
+    def test_expired(self, internal_app):
+        internal_auth = internal_app.extensions['jwt_internal_auth']
+        headers = {
+            'X-Internal-Auth':
+                internal_auth.sign(issued_at=int(time.time()) - 120)
+        }
+        with self._request(internal_app, headers):
+            with pytest.raises(ExpiredSignatureError):
+                verify_jwt_in_request()
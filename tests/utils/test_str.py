@@ -1,5 +1,6 @@
 import pytest
 
+from lesoon_common.utils.str import cached_camelcase
 from lesoon_common.utils.str import camelcase
 from lesoon_common.utils.str import udlcase
 
@@ -22,6 +23,13 @@ class TestStrUtil:
         with pytest.raises(TypeError):
             camelcase(111)
 
+    def test_cached_camelcase(self):
+        assert cached_camelcase('test_example') == 'testExample'
+        assert cached_camelcase('test_example') == 'testExample'
+        assert cached_camelcase.cache_info().hits >= 1
+        with pytest.raises(TypeError):
+            cached_camelcase(111)
+
     def test_udlcase_empty(self):
         assert udlcase('') == ''
 
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+from flask import jsonify
+
+from lesoon_common.model.alchemy.schema import SqlaCamelAutoSchema
+from lesoon_common.response import success_response
+from lesoon_common.utils import stream
+from tests.models import User
+from tests.models import UserSchema
+
+
+class UserCamelSchema(SqlaCamelAutoSchema):
+
+    class Meta(SqlaCamelAutoSchema.Meta):
+        model = User
+
+
+@pytest.fixture
+def users(db):
+    db.session.add_all([User(login_name=f'user{i}') for i in range(10)])
+    db.session.commit()
+
+
+def test_chunked():
+    assert list(stream.chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(stream.chunked([], 3)) == []
+
+
+def test_iter_chunks(users):
+    chunks = list(User.query.order_by(User.id).iter_chunks(4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert chunks[2][1].login_name == 'user9'
+
+
+def _envelope(response):
+    """返回体及其键顺序."""
+    data = json.loads(response.get_data())
+    return data, list(data)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 100])
+def test_stream_response(users, chunk_size):
+    query = User.query.order_by(User.id)
+    response = query.stream(UserSchema(), chunk_size=chunk_size)
+    assert response.mimetype == 'application/json'
+    expected = jsonify(
+        success_response(result=UserSchema().dump(query.all(), many=True),
+                         total=10))
+    assert _envelope(response) == _envelope(expected)
+
+
+@pytest.mark.parametrize('sort_keys', [True, False])
+def test_stream_extra_keys(app, users, sort_keys):
+    app.config['JSON_SORT_KEYS'] = sort_keys
+    query = User.query.order_by(User.id)
+    response = query.stream(UserSchema(), chunk_size=3, name='test')
+    expected = jsonify(
+        success_response(result=UserSchema().dump(query.all(), many=True),
+                         total=10,
+                         name='test'))
+    assert _envelope(response) == _envelope(expected)
+
+
+def test_stream_empty(db):
+    response = stream.stream_response([], UserSchema(), name='test')
+    expected = jsonify(success_response(result=[], total=0, name='test'))
+    assert _envelope(response) == _envelope(expected)
+    assert 'rows' not in _envelope(response)[0]
+
+
+class TestExport:
+
+    def test_ndjson(self, users):
+        query = User.query.order_by(User.id)
+        response = stream.export_response(query, UserSchema(), chunk_size=3)
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        assert [json.loads(line) for line in lines
+               ] == UserSchema().dump(query.all(), many=True)
+
+    def test_csv(self, users):
+        query = User.query.order_by(User.id)
+        response = stream.export_response(query,
+                                          UserCamelSchema(),
+                                          export_format='csv',
+                                          chunk_size=4,
+                                          filename='用户.csv')
+        assert response.mimetype == 'text/csv'
+        assert response.headers['Content-Disposition'] == (
+            "attachment; filename=.csv; filename*=UTF-8''%E7%94%A8%E6%88%B7.csv"
+        )
+        response.headers['Content-Disposition'].encode('latin-1')
+        lines = response.get_data(as_text=True).splitlines()
+        assert len(lines) == 11
+        columns = lines[0].lstrip('\ufeff').split(',')
+        assert 'loginName' in columns
+        row = dict(zip(columns, lines[1].split(',')))
+        assert row['loginName'] == 'user0'
+        assert row['userName'] == ''
+
+    def test_ascii_filename(self, users):
+        response = stream.export_response(User.query,
+                                          UserSchema(),
+                                          filename='users.ndjson')
+        assert response.headers['Content-Disposition'] == (
+            'attachment; filename=users.ndjson')
+
+    def test_invalid_format(self, users):
+        with pytest.raises(ValueError):
+            stream.export_response(User.query, UserSchema(), 'xml')
@@ -0,0 +1,352 @@
+import logging
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import load_only
+
+from lesoon_common import LesoonFlask
+from lesoon_common.exceptions import RequestError
+from lesoon_common.extensions import ca
+from lesoon_common.wrappers import alchemy
+from lesoon_common.wrappers import LesoonQuery
+from tests.models import User
+from tests.models import UserExt
+from tests.models import UserSchema
+
+
+@pytest.fixture
+def users(db):
+    db.session.add_all([
+        User(login_name=f'user{i}',
+             user_name=f'name_{i}' if i % 2 else None,
+             status=bool(i % 2),
+             create_time=datetime(2021, 1, i + 1)) for i in range(10)
+    ])
+    db.session.commit()
+
+
+class TestApplyWhere:
+
+    def _login_names(self, where):
+        return sorted(u.login_name for u in User.query.apply_where(where))
+
+    def test_operators(self, users):
+        assert self._login_names({'loginName': 'user1'}) == ['user1']
+        assert self._login_names({'loginName': {
+            '$in': ['user1', 'user2']
+        }}) == ['user1', 'user2']
+        assert len(self._login_names({'loginName': {'$nin': ['user1']}})) == 9
+        assert self._login_names({'id': {'$gt': 9}}) == ['user9']
+        assert self._login_names(
+            {'createTime': {
+                '$range': ['2021-01-09', '2021-01-10 00:00:00']
+            }}) == ['user8', 'user9']
+        assert self._login_names({'userName': {'$like': 'name_1'}}) == ['user1']
+        assert len(self._login_names({'user_name': None})) == 5
+        assert len(self._login_names({'userName': {'$null': False}})) == 5
+
+    def test_plan_cached(self, users):
+        LesoonQuery.where_plans.clear()
+        assert self._login_names({'loginName': {'$in': ['user1']}}) == ['user1']
+        assert self._login_names({'loginName': {
+            '$in': ['user2', 'user3']
+        }}) == ['user2', 'user3']
+        assert LesoonQuery.where_plans.stats()['hits'] == 1
+
+    def test_chained(self, db, users):
+        db.session.add_all(
+            [UserExt(user_id=i + 1, address=f'a{i}') for i in range(10)])
+        db.session.commit()
+        query = User.query.join(UserExt, UserExt.user_id == User.id)
+        assert query.apply_where({
+            'loginName': 'user1'
+        }).apply_where({
+            'address': 'a1'
+        }, model=UserExt).one().login_name == 'user1'
+        assert query.apply_where({
+            'loginName': 'user1'
+        }).apply_where({
+            'address': 'a3'
+        }, model=UserExt).all() == []
+        query = User.query.apply_where({
+            'loginName': {
+                '$in': ['user1', 'user2']
+            }
+        }).apply_where({'id': {
+            '$in': [3, 4]
+        }})
+        assert query.one().login_name == 'user2'
+
+    def test_schema(self, users):
+        schema = UserSchema()
+        query = User.query.apply_where({'login_name': 'user1'}, schema=schema)
+        assert query.one().login_name == 'user1'
+        # schema排除的字段及未映射的驼峰字段名
+        for where in ({'status': True}, {'loginName': 'user1'}):
+            with pytest.raises(RequestError):
+                User.query.apply_where(where, schema=schema)
+        # 相同schema类的实例按实际字段映射缓存
+        with pytest.raises(RequestError):
+            User.query.apply_where({'login_name': 'user1'},
+                                   schema=UserSchema(exclude=['login_name']))
+
+    def test_allowed(self, users):
+        query = User.query.apply_where({'loginName': 'user1'},
+                                       allowed=['loginName'])
+        assert query.one().login_name == 'user1'
+        for where in ({'login_name': 'user1'}, {'userName': {'$like': 'n'}}):
+            with pytest.raises(RequestError):
+                User.query.apply_where(where, allowed=['loginName'])
+
+    def test_request_where(self, app, users):
+        with app.test_request_context(
+                query_string={'where': '{"loginName":"user1"}'}):
+            assert User.query.apply_where().one().login_name == 'user1'
+
+    @pytest.mark.parametrize('where', [{
+        'unknown': 1
+    }, {
+        'createTime': {
+            '$gt': 'not a date'
+        }
+    }])
+    def test_invalid(self, users, where):
+        with pytest.raises(RequestError):
+            User.query.apply_where(where).all()
+
+    def test_where_length_limit(self, app):
+        where = '{"loginName":"%s"}' % ('a' * 8192)
+        with app.test_request_context(query_string={'where': where}):
+            with pytest.raises(RequestError):
+                User.query.apply_where()
+
+
+class TestApplySort:
+
+    def _order_by(self, query):
+        return str(query.statement).split('ORDER BY ')[1]
+
+    def test_sort(self, users):
+        query = User.query.apply_sort({'loginName': 'desc'})
+        assert self._order_by(query) == '"user".login_name DESC, "user".id'
+        assert query.first().login_name == 'user9'
+
+        query = User.query.apply_sort('id desc')
+        assert self._order_by(query) == '"user".id DESC'
+
+    def test_index_policy(self, users):
+        with pytest.raises(RequestError):
+            User.query.apply_sort({'userName': 'asc'}, policy='reject')
+        User.query.apply_sort({
+            'loginName': 'asc',
+            'id': 'asc'
+        },
+                              policy='reject')
+        User.query.apply_sort({'userName': 'asc'},
+                              allowed=['userName'],
+                              policy='reject')
+
+    def test_unknown_field(self, users):
+        with pytest.raises(RequestError):
+            User.query.apply_sort({'unknown': 'asc'})
+
+
+class TestPaginate:
+
+    def _login_names(self, pagination):
+        return [u.login_name for u in pagination.items]
+
+    def test_has_next(self, app, users):
+        pagination = User.query.order_by(User.id).paginate(if_page=True,
+                                                           page=3,
+                                                           per_page=4,
+                                                           has_next=True)
+        assert self._login_names(pagination) == ['user8', 'user9']
+        assert pagination.has_next is False
+        assert pagination.total is None
+        assert pagination.pages is None
+
+        pagination = User.query.paginate(if_page=True,
+                                         page=1,
+                                         per_page=4,
+                                         has_next=True)
+        assert pagination.has_next is True
+
+    def test_keyset(self, app, users):
+        pages, cursor = [], None
+        while True:
+            pagination = User.query.apply_where({
+                'status': True
+            }).paginate(if_page=True,
+                        per_page=2,
+                        keyset=True,
+                        cursor=cursor,
+                        sort={'createTime': 'desc'})
+            pages.append(self._login_names(pagination))
+            cursor = pagination.next_cursor
+            if not pagination.has_next:
+                break
+        assert pages == [['user9', 'user7'], ['user5', 'user3'], ['user1']]
+        assert cursor is None
+
+    def test_keyset_mixed_directions(self, app, db, users):
+        db.session.add(
+            User(login_name='user10',
+                 status=True,
+                 create_time=datetime(2021, 1, 10)))
+        db.session.commit()
+        sort = 'createTime desc,loginName asc'
+        names, cursor = [], None
+        for _ in range(11):
+            pagination = User.query.paginate(if_page=True,
+                                             per_page=1,
+                                             keyset=True,
+                                             cursor=cursor,
+                                             sort=sort)
+            names.extend(self._login_names(pagination))
+            cursor = pagination.next_cursor
+        assert names[:3] == ['user10', 'user9', 'user8']
+        assert len(names) == len(set(names)) == 11
+        assert cursor is None
+
+    def test_request_cursor(self, app, users):
+        first = User.query.paginate(if_page=True,
+                                    per_page=3,
+                                    keyset=True,
+                                    sort='id')
+        with app.test_request_context(query_string={
+                'cursor': first.next_cursor,
+                'pageSize': 3,
+                'sort': 'id'
+        }):
+            pagination = User.query.paginate(keyset=True)
+            assert self._login_names(pagination) == ['user3', 'user4', 'user5']
+
+    def test_keyset_nullable(self, app, users):
+        # user_name存在空值
+        with pytest.raises(RequestError):
+            User.query.paginate(if_page=True,
+                                per_page=1,
+                                keyset=True,
+                                sort={'userName': 'asc'})
+        # 非游标分页不受影响
+        assert User.query.apply_sort({
+            'userName': 'asc'
+        }).paginate(if_page=True, per_page=1).total == 10
+
+    @pytest.mark.parametrize('cursor', ['not a cursor', 'WzFd', 'WzEsMiwzXQ'])
+    def test_invalid_cursor(self, app, users, cursor):
+        with pytest.raises(RequestError):
+            User.query.paginate(if_page=True,
+                                keyset=True,
+                                cursor=cursor,
+                                sort='createTime desc')
+
+
+class TestCountStrategy:
+
+    def _paginate(self, strategy, **kwargs):
+        return User.query.apply_where(kwargs.pop('where', None)).paginate(
+            if_page=True, page=1, per_page=2, count_strategy=strategy, **kwargs)
+
+    def test_exact(self, users):
+        pagination = self._paginate('exact')
+        assert pagination.total == 10
+        assert pagination.meta == {
+            'total': 10,
+            'approximate': False,
+            'hasNext': True,
+            'nextCursor': None
+        }
+
+    def test_cached(self, app, db, users):
+        app.config['CACHE_TYPE'] = 'SimpleCache'
+        ca.init_app(app)
+        assert self._paginate('cached', where={'status': True}).total == 5
+        db.session.add(User(login_name='user10', status=True))
+        db.session.commit()
+        assert self._paginate('cached', where={'status': True}).total == 5
+        assert self._paginate('cached', where={'status': False}).total == 5
+        assert self._paginate('exact', where={'status': True}).total == 6
+
+    def test_estimated(self, users, monkeypatch):
+        # sqlite不支持估算, 改为精确COUNT
+        pagination = self._paginate('estimated')
+        assert (pagination.total, pagination.approximate) == (10, False)
+
+        monkeypatch.setattr(alchemy, 'estimate_count', lambda query: 20000)
+        pagination = self._paginate('estimated')
+        assert (pagination.total, pagination.approximate) == (20000, True)
+        assert pagination.meta['approximate'] is True
+
+        monkeypatch.setattr(alchemy, 'estimate_count', lambda query: 100)
+        assert self._paginate('estimated').total == 10
+
+    def test_none(self, users):
+        pagination = self._paginate('none')
+        assert pagination.total is None
+        assert pagination.has_next is True
+
+    def test_explain(self, users):
+        query = User.query.filter_by(status=True)
+        statement = alchemy._Explain(query.statement)
+        assert str(statement.compile(
+            dialect=mysql.dialect())).startswith('EXPLAIN SELECT')
+
+    def test_invalid(self, users):
+        with pytest.raises(ValueError):
+            self._paginate('unknown')
+
+
+class TestCountQuery:
+
+    def _sql(self, query):
+        return ' '.join(str(alchemy.build_count_query(query).statement).split())
+
+    def test_primary_key(self, users):
+        query = User.query.options(load_only('login_name')).apply_where({
+            'status': True
+        }).order_by(User.login_name)
+        assert self._sql(query) == (
+            'SELECT count(*) AS count_1 '
+            'FROM "user" WHERE "user".status = :where_0')
+        assert alchemy.build_count_query(query).scalar() == 5
+        assert self._sql(User.query) == 'SELECT count(*) AS count_1 FROM "user"'
+
+    def test_join(self, db, users):
+        db.session.add_all([UserExt(user_id=1), UserExt(user_id=1)])
+        db.session.commit()
+        query = User.query.join(UserExt, UserExt.user_id == User.id)
+        assert self._sql(query).startswith(
+            'SELECT count(*) AS count_1 FROM (SELECT "user".id')
+        assert alchemy.build_count_query(query).scalar() == query.count() == 2
+
+    def test_fallback(self, users):
+        query = User.query.with_entities(User.status).distinct()
+        assert alchemy.build_count_query(query).scalar() == query.count() == 2
+        query = User.query.with_entities(User.status,
+                                         func.count()).group_by(User.status)
+        assert alchemy.build_count_query(query).scalar() == 2
+
+    def test_parallel(self, app, tmp_path):
+        config = type(
+            'Config', (), {
+                'TESTING': True,
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/test.db'
+            })
+        file_app = LesoonFlask(__name__, config=config)
+        file_app.logger.setLevel(logging.CRITICAL)
+        with file_app.test_request_context():
+            file_app.db.create_all()
+            file_app.db.session.add_all(
+                [User(login_name=f'user{i}') for i in range(5)])
+            file_app.db.session.commit()
+            pagination = User.query.paginate(if_page=True,
+                                             page=1,
+                                             per_page=2,
+                                             parallel_count=True)
+            assert pagination.total == 5
+            assert len(pagination.items) == 2
+            file_app.db.session.remove()
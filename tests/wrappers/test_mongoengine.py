@@ -0,0 +1,296 @@
+from datetime import datetime
+
+import mongoengine
+import pytest
+from bson import ObjectId
+from bson import DBRef
+from mongoengine import Document
+from mongoengine import fields
+from mongoengine.queryset.base import BaseQuerySet
+
+from lesoon_common.exceptions import RequestError
+from lesoon_common.model.mongoengine import MongoCamelAutoSchema
+from lesoon_common.utils.filter import encode_cursor
+from lesoon_common.wrappers import LesoonQuerySet
+from lesoon_common.wrappers.mongoengine import dereference
+
+
+class Customer(Document):
+    name = fields.StringField()
+
+    meta = {'auto_create_index': False}
+
+
+class Bill(Document):
+    bill_no = fields.StringField(db_field='no')
+    amount = fields.IntField()
+    ref_id = fields.ObjectIdField()
+    create_time = fields.DateTimeField(required=True)
+    customer = fields.ReferenceField(Customer)
+    followers = fields.ListField(fields.ReferenceField(Customer, dbref=True))
+
+    meta = {
+        'queryset_class': LesoonQuerySet,
+        'auto_create_index': False,
+        'indexes': ['bill_no', 'create_time']
+    }
+
+
+class BillSchema(MongoCamelAutoSchema):
+
+    class Meta(MongoCamelAutoSchema.Meta):
+        model = Bill
+
+
+@pytest.fixture(scope='module', autouse=True)
+def connection():
+    # 仅构造查询, 不会实际连接数据库
+    mongoengine.disconnect()
+    mongoengine.connect('lesoon_test', connect=False)
+    yield
+    mongoengine.disconnect()
+
+
+class TestApplyWhere:
+
+    def test_query(self):
+        ref_id = '5f1d7f3c8c1b2a0001a1b2c3'
+        queryset = Bill.objects.apply_where({
+            'billNo': {
+                '$like': 'SO.1'
+            },
+            'amount': {
+                '$gte': 1,
+                '$in': [1, 2]
+            },
+            'refId': ref_id,
+            'createTime': {
+                '$range': ['2021-01-01', None],
+                '$gt': '2021-01-01 08:00:00'
+            },
+        })
+        assert queryset._query == {
+            'no': {
+                '$regex': r'^SO\.1'
+            },
+            'amount': {
+                '$gte': 1,
+                '$in': [1, 2]
+            },
+            'ref_id': {
+                '$eq': ObjectId(ref_id)
+            },
+            'create_time': {
+                '$gte': datetime(2021, 1, 1),
+                '$gt': datetime(2021, 1, 1, 8)
+            },
+        }
+
+    def test_null_and_duplicate_ops(self):
+        queryset = Bill.objects.apply_where({
+            'bill_no': None,
+            'amount': {
+                '$range': [1, 10],
+                '$lte': 5
+            }
+        })
+        assert queryset._query == {
+            'no': {
+                '$eq': None
+            },
+            'amount': {
+                '$lte': 5,
+                '$gte': 1
+            },
+            '$and': [{
+                'amount': {
+                    '$lte': 10
+                }
+            }]
+        }
+
+    def test_schema_mapping(self):
+        queryset = Bill.objects.apply_where({'billNo': 'SO1'},
+                                            schema=BillSchema())
+        assert queryset._query == {'no': {'$eq': 'SO1'}}
+        with pytest.raises(RequestError):
+            Bill.objects.apply_where({'bill_no': 'SO1'}, schema=BillSchema())
+
+    def test_schema_instance(self):
+        Bill.objects.apply_where({'amount': 1}, schema=BillSchema())
+        Bill.objects.apply_sort('amount',
+                                schema=BillSchema(),
+                                allowed=['amount'])
+        # 相同schema类的实例, 排除的字段不能用于过滤及排序
+        schema = BillSchema(exclude=['amount'])
+        with pytest.raises(RequestError):
+            Bill.objects.apply_where({'amount': 1}, schema=schema)
+        with pytest.raises(RequestError):
+            Bill.objects.apply_sort('amount', schema=schema, allowed=['amount'])
+
+    def test_plan_cached(self):
+        LesoonQuerySet.where_plans.clear()
+        Bill.objects.apply_where({'amount': {'$in': [1]}})
+        Bill.objects.apply_where({'amount': {'$in': [2, 3]}})
+        assert LesoonQuerySet.where_plans.stats()['hits'] == 1
+
+    @pytest.mark.parametrize('where', [{
+        'unknown': 1
+    }, {
+        'createTime': {
+            '$gt': 'not a date'
+        }
+    }, {
+        'amount': 'abc'
+    }, {
+        'refId': 'zzz'
+    }, {
+        'amount': {
+            '$in': ['1', 'x']
+        }
+    }])
+    def test_invalid(self, where):
+        with pytest.raises(RequestError):
+            Bill.objects.apply_where(where)
+
+
+class TestApplySort:
+
+    def test_sort(self):
+        queryset = Bill.objects.apply_sort({'createTime': 'desc'},
+                                           policy='reject')
+        assert queryset._ordering == [('create_time', -1), ('_id', 1)]
+
+        queryset = Bill.objects.apply_sort('billNo asc')
+        assert queryset._ordering == [('no', 1), ('_id', 1)]
+
+        queryset = Bill.objects.apply_sort('id desc', policy='reject')
+        assert queryset._ordering == [('_id', -1)]
+
+    def test_index_policy(self):
+        with pytest.raises(RequestError):
+            Bill.objects.apply_sort({'amount': 'asc'}, policy='reject')
+        Bill.objects.apply_sort({'amount': 'asc'},
+                                allowed=['amount'],
+                                policy='reject')
+
+
+class TestSeek:
+
+    def test_first_page(self):
+        queryset = Bill.objects.seek(sort={'createTime': 'desc'})
+        assert queryset._ordering == [('create_time', -1), ('_id', 1)]
+        assert queryset._query == {}
+
+    def test_cursor(self):
+        bill_id = ObjectId()
+        cursor = encode_cursor([datetime(2021, 1, 1, 8), bill_id])
+        queryset = Bill.objects.apply_where({
+            'amount': 1
+        }).seek(cursor, sort='createTime desc')
+        assert queryset._query == {
+            '$and': [{
+                'amount': {
+                    '$eq': 1
+                }
+            }, {
+                'create_time': {
+                    '$lte': datetime(2021, 1, 1, 8)
+                },
+                '$or': [{
+                    'create_time': {
+                        '$lt': datetime(2021, 1, 1, 8)
+                    }
+                }, {
+                    'create_time': datetime(2021, 1, 1, 8),
+                    '_id': {
+                        '$gt': bill_id
+                    }
+                }]
+            }]
+        }
+
+        cursor = encode_cursor([bill_id])
+        queryset = Bill.objects.seek(cursor, sort='id desc')
+        assert queryset._query == {'_id': {'$lt': bill_id}}
+
+    def test_optional_field(self):
+        # amount, bill_no可能缺失或为null
+        with pytest.raises(RequestError):
+            Bill.objects.seek(sort={'amount': 'asc'})
+        with pytest.raises(RequestError):
+            Bill.objects.seek(sort='createTime desc,billNo asc')
+        # 非游标分页不受影响
+        Bill.objects.apply_sort({'amount': 'asc'}, allowed=['amount'])
+
+    @pytest.mark.parametrize('cursor', [
+        'not a cursor', 'WzFd',
+        encode_cursor(['2021-01-01', 'zzz']),
+        encode_cursor(['not a date', str(ObjectId())])
+    ])
+    def test_invalid_cursor(self, cursor):
+        with pytest.raises(RequestError):
+            Bill.objects.seek(cursor, sort='createTime desc')
+
+
+class TestDereference:
+
+    @pytest.fixture
+    def customers(self, monkeypatch):
+        customers = {
+            customer.id: customer for customer in
+            [Customer(id=ObjectId(), name=f'c{i}') for i in range(3)]
+        }
+        calls = []
+
+        def in_bulk(queryset, object_ids):
+            calls.append((queryset._document, sorted(object_ids)))
+            return {i: customers[i] for i in object_ids if i in customers}
+
+        monkeypatch.setattr(BaseQuerySet, 'in_bulk', in_bulk)
+        return list(customers.values()), calls
+
+    def test_batched(self, customers):
+        (c0, c1, c2), calls = customers
+        missing = ObjectId()
+        bills = [
+            Bill._from_son({
+                '_id':
+                    ObjectId(),
+                'customer':
+                    c0.id,
+                'followers': [
+                    DBRef('customer', c1.id),
+                    DBRef('customer', c2.id)
+                ]
+            }),
+            Bill._from_son({
+                '_id': ObjectId(),
+                'customer': c1.id
+            }),
+            Bill._from_son({
+                '_id': ObjectId(),
+                'customer': missing
+            }),
+        ]
+        dereference(bills)
+        assert calls == [(Customer, sorted([c0.id, c1.id, c2.id, missing]))]
+        assert bills[0].customer is c0
+        assert list(bills[0].followers) == [c1, c2]
+        assert bills[1].customer is c1
+        assert bills[2]._data['customer'].id == missing
+
+        # 已加载的引用不再查询
+        dereference(bills[:2])
+        assert len(calls) == 1
+
+    def test_fields(self, customers):
+        (c0, c1, _), calls = customers
+        bill = Bill._from_son({
+            '_id': ObjectId(),
+            'customer': c0.id,
+            'followers': [DBRef('customer', c1.id)]
+        })
+        dereference([bill], fields=['customer'])
+        assert calls == [(Customer, [c0.id])]
+        assert bill._data['followers'] == [DBRef('customer', c1.id)]